@@ -9,6 +9,8 @@ import logging
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from Chat_history import init_chat_history, render_chat_history
+from Figure_cache import cached_figure
 
 # ... (keep all the existing imports and functions)
 
@@ -17,30 +19,22 @@ def generate_chart(df, chart_recommendation):
     # ... (paste the entire generate_chart function here)
 
 # Update the add_to_chat_history function
-def add_to_chat_history(question, sql_query, result_df):
-    chart = generate_chart(result_df, None)
-    st.session_state['chat_history'].append({
-        'question': question,
-        'sql_query': sql_query,
-        'result_df': result_df,
-        'chart': chart
-    })
+def add_to_chat_history(question, sql_query, result_df, chart=None):
+    # Reuse the figure already built for display instead of rendering it twice
+    if chart is None:
+        chart = cached_figure(__name__, result_df, None, lambda: generate_chart(result_df, None))
+    st.session_state['chat_history'].add(question, sql_query, result_df, chart)
 
 # Update the main function
 def main():
     init_app()
+    # Old sessions' history directories are pruned when this one is created
+    init_chat_history()
 
     # ... (keep all the existing code up to the chat history display)
 
     # Display chat history
-    for entry in st.session_state['chat_history']:
-        with st.chat_message(name="user", avatar="user"):
-            st.markdown(entry['question'])
-        with st.chat_message(name="assistant", avatar="assistant"):
-            st.code(entry['sql_query'], language="sql")
-            st.dataframe(entry['result_df'])
-            if entry['chart'] is not None:
-                st.plotly_chart(entry['chart'], use_container_width=True)
+    render_chat_history(st.session_state['chat_history'])
 
     with st.chat_message(name="user", avatar="user"):
         user_input_placeholder = st.empty()
@@ -66,12 +60,12 @@ def main():
                     bot_response_2_placeholder.dataframe(result_df)
                     
                     # Generate and display chart
-                    chart = generate_chart(result_df, None)
+                    chart = cached_figure(__name__, result_df, None, lambda: generate_chart(result_df, None))
                     if chart is not None:
                         bot_response_3_placeholder.plotly_chart(chart, use_container_width=True)
                     
                     handle_interaction(user_input, sql_response)
-                    add_to_chat_history(user_input, sql_response, result_df)
+                    add_to_chat_history(user_input, sql_response, result_df, chart)
                 except Exception as e:
                     logging.error(f"Error processing query: {str(e)}")
                     st.error("An error occurred while processing your query. Please try again.")
@@ -1,4 +1,6 @@
 elif chart_type == 'grouped bar':
+    from Chart_aggregation import ChartAggregation
+
     # Identify numeric columns for y-axis
     numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
     
@@ -10,8 +12,8 @@ elif chart_type == 'grouped bar':
         st.table(df)
         return None
     
-    # Perform grouping operation
-    grouped_df = df.groupby(group_columns)[numeric_cols].sum().reset_index()
+    # The result rows are already here, so one pandas groupby (NULL keys kept, as in SQL)
+    grouped_df = ChartAggregation(group_columns, list(numeric_cols)).apply(df)
     
     # Create the grouped bar chart
     fig = px.bar(grouped_df, 
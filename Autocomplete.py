@@ -1,7 +1,14 @@
+import os
+import json
+import hashlib
+import logging
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 import streamlit as st
+from Faiss_index import create_faiss_index, set_search_params
+
+logger = logging.getLogger(__name__)
 
 # Load the sentence transformer model
 @st.cache_resource
@@ -10,64 +17,175 @@ def load_model():
 
 model = load_model()
 
-def create_faiss_index(embeddings):
-    """Create a FAISS index for the given embeddings."""
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings.astype('float32'))
-    return index
+# Where the prebuilt indexes and their metadata live between runs
+INDEX_DIR = "faiss_indexes"
+
+# Index used for categorical values: 'flat' (exact), 'ivf_flat', 'ivf_pq' or 'hnsw'
+VALUE_INDEX_BACKEND = "flat"
+VALUE_INDEX_PARAMS = {'nprobe': 32, 'ef_search': 128}
+
+# Indexes already loaded in this process, keyed by schema hash
+_loaded_indexes = {}
 
 def search_faiss_index(index, query_embedding, k=5):
     """Search the FAISS index for the k most similar embeddings."""
     distances, indices = index.search(query_embedding.astype('float32'), k)
     return indices[0]
 
+def stable_id(text):
+    """64-bit id that stays the same for the same text across runs."""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') & 0x7FFFFFFFFFFFFFFF
+
+def schema_content_hash(schema):
+    """Hash of the schema contents; a changed hash means the indexes need syncing."""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode('utf-8')).hexdigest()
+
 def process_categorical_schema(schema):
-    """Process the categorical columns in the schema and create FAISS indices."""
-    column_names = []
-    column_values = []
-    value_to_column = {}
-    
-    for column, values in schema.items():
-        column_names.append(column)
-        for value in values:
-            column_values.append(value)
-            value_to_column[value] = column
-    
-    # Create embeddings
-    column_name_embeddings = model.encode(column_names)
-    column_value_embeddings = model.encode(column_values)
-    
-    # Create FAISS indices
-    column_name_index = create_faiss_index(column_name_embeddings)
-    column_value_index = create_faiss_index(column_value_embeddings)
-    
-    return column_name_index, column_value_index, column_names, column_values, value_to_column
+    """Map every column name and categorical value in the schema to a stable id."""
+    columns = {}
+    values = {}
+    for column, column_values in schema.items():
+        columns[stable_id(column)] = column
+        for value in column_values:
+            values[stable_id(f"{column}\0{value}")] = (column, value)
+    return columns, values
+
+def build_index(entries, text_of, backend='flat', **params):
+    """Embed every entry and build an ID-mapped index from scratch."""
+    ids = list(entries)
+    if ids:
+        embeddings = model.encode([text_of(entries[i]) for i in ids])
+    else:
+        embeddings = np.empty((0, model.get_sentence_embedding_dimension()), dtype='float32')
+    return create_faiss_index(embeddings, backend=backend, ids=ids, **params)
+
+def sync_index(index, old_entries, new_entries, text_of):
+    """Remove ids that disappeared and embed only the ids that are new.
+
+    Returns None if the index type can't remove entries (HNSW) and must be rebuilt.
+    """
+    removed = [i for i in old_entries if i not in new_entries]
+    added = [i for i in new_entries if i not in old_entries]
+    if removed:
+        try:
+            index.remove_ids(np.array(removed, dtype='int64'))
+        except RuntimeError:
+            return None
+    if added:
+        embeddings = model.encode([text_of(new_entries[i]) for i in added])
+        index.add_with_ids(embeddings.astype('float32'), np.array(added, dtype='int64'))
+    return len(added), len(removed)
+
+def save_indexes(index_dir, schema_hash, backend, column_name_index, column_value_index, columns, values):
+    os.makedirs(index_dir, exist_ok=True)
+    faiss.write_index(column_name_index, os.path.join(index_dir, "column_names.index"))
+    faiss.write_index(column_value_index, os.path.join(index_dir, "column_values.index"))
+    metadata = {
+        'schema_hash': schema_hash,
+        'backend': backend,
+        'columns': {str(i): column for i, column in columns.items()},
+        'values': {str(i): list(entry) for i, entry in values.items()},
+    }
+    with open(os.path.join(index_dir, "metadata.json"), 'w') as f:
+        json.dump(metadata, f)
+
+def load_indexes(index_dir, mmap=True):
+    """Load saved indexes and metadata as a dict, or return None if nothing has been saved yet."""
+    metadata_path = os.path.join(index_dir, "metadata.json")
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    flags = faiss.IO_FLAG_MMAP if mmap else 0
+    column_name_index = faiss.read_index(os.path.join(index_dir, "column_names.index"), flags)
+    column_value_index = faiss.read_index(os.path.join(index_dir, "column_values.index"), flags)
+    return {
+        'schema_hash': metadata['schema_hash'],
+        'backend': metadata.get('backend', 'flat'),
+        'column_name_index': column_name_index,
+        'column_value_index': column_value_index,
+        'columns': {int(i): column for i, column in metadata['columns'].items()},
+        'values': {int(i): tuple(entry) for i, entry in metadata['values'].items()},
+    }
+
+def load_or_build_indexes(schema, index_dir=INDEX_DIR):
+    """Return the column name/value indexes for the schema, building or syncing them only when it changed."""
+    schema_hash = schema_content_hash(schema)
+    if schema_hash in _loaded_indexes:
+        return _loaded_indexes[schema_hash]
+
+    columns, values = process_categorical_schema(schema)
+    saved = load_indexes(index_dir)
+    if saved is not None and saved['backend'] != VALUE_INDEX_BACKEND:
+        saved = None
+    if saved is not None and saved['schema_hash'] == schema_hash:
+        # Unchanged schema: the memory-mapped indexes are ready to search
+        column_name_index, column_value_index = saved['column_name_index'], saved['column_value_index']
+        columns, values = saved['columns'], saved['values']
+        set_search_params(column_value_index, **VALUE_INDEX_PARAMS)
+    else:
+        if saved is not None:
+            # Reload without mmap since the indexes are about to be modified
+            saved = load_indexes(index_dir, mmap=False)
+            column_name_index, column_value_index = saved['column_name_index'], saved['column_value_index']
+            sync_index(column_name_index, saved['columns'], columns, lambda column: column)
+            synced = sync_index(column_value_index, saved['values'], values, lambda entry: entry[1])
+        else:
+            column_name_index = build_index(columns, lambda column: column)
+            synced = None
+        if synced is None:
+            column_value_index = build_index(values, lambda entry: entry[1], VALUE_INDEX_BACKEND, **VALUE_INDEX_PARAMS)
+            logger.info(f"Built {VALUE_INDEX_BACKEND} categorical value index with {len(values)} values")
+        else:
+            set_search_params(column_value_index, **VALUE_INDEX_PARAMS)
+            logger.info(f"Synced categorical value index: {synced[0]} added, {synced[1]} removed")
+        save_indexes(index_dir, schema_hash, VALUE_INDEX_BACKEND, column_name_index, column_value_index, columns, values)
+
+    _loaded_indexes.clear()
+    _loaded_indexes[schema_hash] = (column_name_index, column_value_index, columns, values, build_value_lookup(values))
+    return _loaded_indexes[schema_hash]
+
+def build_value_lookup(values):
+    """Sorted id arrays so search results can be joined to columns with NumPy instead of dict lookups."""
+    value_ids = np.array(sorted(values), dtype='int64')
+    value_column_ids = np.array([stable_id(values[i][0]) for i in value_ids], dtype='int64')
+    value_columns = np.array([values[i][0] for i in value_ids], dtype=object)
+    value_texts = np.array([values[i][1] for i in value_ids], dtype=object)
+    return value_ids, value_column_ids, value_columns, value_texts
+
+def answer_questions(questions, schema, k=5, batch_size=256):
+    """Answer many questions at once: one encode call, one search per index, a vectorized join."""
+    column_name_index, column_value_index, _, _, lookup = load_or_build_indexes(schema)
+    value_ids, value_column_ids, value_columns, value_texts = lookup
+    if len(questions) == 0 or len(value_ids) == 0:
+        return [{} for _ in questions]
+
+    question_embeddings = model.encode(questions, batch_size=batch_size).astype('float32')
+    _, column_hits = column_name_index.search(question_embeddings, k)
+    _, value_hits = column_value_index.search(question_embeddings, k)
+
+    # Position of every hit in the sorted lookup arrays (-1 hits are masked out)
+    positions = np.searchsorted(value_ids, value_hits).clip(max=len(value_ids) - 1)
+    found = (value_hits != -1) & (value_ids[positions] == value_hits)
+    hit_columns = np.where(found, value_column_ids[positions], -1)
+
+    # Keep values whose column is also among the question's relevant columns...
+    keep = found & (hit_columns[:, :, None] == column_hits[:, None, :]).any(axis=2)
+    # ...and only the best-ranked value for each column
+    earlier = np.tril(np.ones((k, k), dtype=bool), -1)
+    duplicate = ((hit_columns[:, :, None] == hit_columns[:, None, :]) & earlier & keep[:, None, :]).any(axis=2)
+    keep &= ~duplicate
+
+    results = [{} for _ in questions]
+    for row, rank in zip(*np.nonzero(keep)):
+        position = positions[row, rank]
+        results[row][value_columns[position]] = value_texts[position]
+    return results
 
 def answer_question(question, schema):
     """Answer the question based on the categorical schema."""
-    # Process schema and create indices
-    column_name_index, column_value_index, column_names, column_values, value_to_column = process_categorical_schema(schema)
-    
-    # Encode the question
-    question_embedding = model.encode([question])
-    
-    # Search for similar column names
-    column_indices = search_faiss_index(column_name_index, question_embedding)
-    relevant_columns = [column_names[i] for i in column_indices]
-    
-    # Search for similar values
-    value_indices = search_faiss_index(column_value_index, question_embedding)
-    relevant_values = [column_values[i] for i in value_indices]
-    
-    # Combine results
-    result = {}
-    for value in relevant_values:
-        column = value_to_column[value]
-        if column in relevant_columns and column not in result:
-            result[column] = value
-    
-    return result
+    return answer_questions([question], schema)[0]
 
 # Streamlit app
 def main():
@@ -0,0 +1,85 @@
+import threading
+import queue
+import time
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """Collect prompts from many sessions and run them through one generate_batch call.
+
+    With workers > 1 several batches are in flight at once, which is what a
+    Generator with inter_threads > 1 needs to run them in parallel.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10, workers=1, **generate_kwargs):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.generate_kwargs = generate_kwargs
+        self._queue = queue.Queue()
+        self._depth = 0
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._run, name=f"batch-scheduler-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def queue_depth(self):
+        """Number of prompts waiting for (or currently in) a generate_batch call."""
+        with self._lock:
+            return self._depth
+
+    def submit(self, input_tokens):
+        """Queue a tokenized prompt and return a Future for its GenerationResult."""
+        future = Future()
+        with self._lock:
+            self._depth += 1
+        self._queue.put((input_tokens, future))
+        return future
+
+    def generate(self, input_tokens, timeout=None):
+        """Blocking helper: submit a prompt and wait for its own result."""
+        return self.submit(input_tokens).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                self._generate(batch)
+            except Exception as e:
+                # The worker must survive anything, or every later future would hang
+                logger.error(f"Batched generation failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._depth -= len(batch)
+
+    def _generate(self, batch):
+        live = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not live:
+            return
+        # Sort by token length so similar-sized prompts share padding
+        live.sort(key=lambda item: len(item[0]))
+        results = self.model.generate_batch([tokens for tokens, _ in live], **self.generate_kwargs)
+        for (_, future), result in zip(live, results):
+            future.set_result(result)
@@ -0,0 +1,361 @@
+"""Benchmarks for the question-to-chart hot paths.
+
+    python Benchmark.py                              # 1k/100k/1M rows, print results
+    python Benchmark.py --sizes 1000 10000000        # pick sizes (10M needs a lot of RAM)
+    python Benchmark.py --only chart --repeat 10     # cases whose name contains "chart"
+    python Benchmark.py --save main                  # write benchmarks/main.json
+    python Benchmark.py --compare main               # exit 1 if any case got slower than the baseline
+
+Every case runs on synthetic data from a fixed seed, with warmup runs before
+the timed ones. The model is replaced by StubSqlModel, so the pipeline case
+measures everything after generation.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib
+import statistics
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SIZES = (1000, 100000, 1000000, 10000000)
+DEFAULT_SIZES = (1000, 100000, 1000000)
+WARMUP_RUNS = 1
+REPEAT_RUNS = 5
+SEED = 0
+BASELINE_DIR = "benchmarks"
+# A case regresses when its median is this much slower than the baseline median...
+REGRESSION_THRESHOLD = 0.15
+# ...and by more than this, so sub-millisecond noise never fails a run
+NOISE_FLOOR_SECONDS = 0.002
+
+
+# Synthetic data
+
+def make_result(n_rows, shape='category', seed=SEED):
+    """A query result of n_rows with the column layout each chart type expects."""
+    rng = np.random.default_rng(seed)
+    if shape == 'category':
+        # Lower-case so a question asking 'by category' names the column the insights group on
+        return pd.DataFrame({'category': rng.choice([f"cat_{i}" for i in range(50)], n_rows),
+                             'Value': rng.random(n_rows) * 100})
+    if shape == 'grouped':
+        return pd.DataFrame({'Category': rng.choice([f"cat_{i}" for i in range(20)], n_rows),
+                             'Group': rng.choice(['P', 'Q', 'R'], n_rows),
+                             'Value': rng.random(n_rows) * 100})
+    if shape == 'timeseries':
+        return pd.DataFrame({'Date': pd.date_range('2020-01-01', periods=n_rows, freq='min'),
+                             'Metric1': rng.random(n_rows).cumsum(),
+                             'Metric2': rng.integers(50, 150, n_rows)})
+    if shape == 'scatter':
+        x = rng.random(n_rows)
+        return pd.DataFrame({'x': x, 'y': x * 2 + rng.normal(0, 0.1, n_rows)})
+    raise ValueError(f"Unknown result shape: {shape}")
+
+
+QUESTION_TEMPLATES = [
+    "Show total sales from {start} to {end} as a bar chart",
+    "How did revenue change between {start} and {end}?",
+    "Which region sold the most last quarter?",
+    "Plot a line graph of orders per day",
+    "Compare categories in a grouped bar chart",
+    "What is the distribution of order values?",
+]
+
+
+def make_questions(n, seed=SEED):
+    rng = np.random.default_rng(seed)
+    months = ['January', 'March', 'June', 'October', 'December']
+    templates = rng.integers(0, len(QUESTION_TEMPLATES), n)
+    starts = rng.integers(0, len(months), n)
+    return [QUESTION_TEMPLATES[t].format(start=f"{months[s]} 1, 2023", end=f"{months[(s + 1) % len(months)]} 2023")
+            for t, s in zip(templates, starts)]
+
+
+# Names the category column, so the pipeline case runs the grouping insights rather than their error path
+PIPELINE_QUESTION = "What is the total value by category?"
+
+
+class StubSqlModel:
+    """Stand-in for the SQL model: returns a canned answer in the real response format.
+
+    delay_per_token simulates decode time; pass any callable with the same
+    generate(question) signature to benchmark a real model instead.
+    """
+
+    def __init__(self, chart_recommendation="Bar", delay_per_token=0.0, n_tokens=60):
+        self.chart_recommendation = chart_recommendation
+        self.delay_per_token = delay_per_token
+        self.n_tokens = n_tokens
+
+    def generate(self, question):
+        if self.delay_per_token:
+            time.sleep(self.delay_per_token * self.n_tokens)
+        return ("```sql\nSELECT category, SUM(Value) AS Value FROM sales GROUP BY category ORDER BY Value DESC\n```\n"
+                f"Chart recommendation: {self.chart_recommendation}\n")
+
+
+# Cases
+
+class Case:
+    """One benchmark: make(size) builds the inputs (untimed), run(inputs) is what gets timed."""
+
+    def __init__(self, name, make, run, sizes=SIZES, setup=None):
+        self.name = name
+        self.make = make
+        self.run = run
+        self.sizes = sizes
+        # Called before every run, e.g. to empty the figure cache so each run builds the chart
+        self.setup = setup
+
+
+def _clear_figure_cache():
+    from Figure_cache import figure_cache
+    figure_cache.clear()
+
+
+# Snippets written to be pasted into a Streamlit app: they use an st they don't import
+PASTE_IN_MODULES = {'Faalback', '2dgraph'}
+# generate_chart variants that can't be imported on their own at all
+FRAGMENT_MODULES = {
+    '2': "app skeleton whose generate_chart body is a placeholder comment; does not compile",
+    '30': "app skeleton whose generate_chart body is a placeholder comment; does not compile",
+    'Fallback_advanced': "chart branches meant to be pasted into another generate_chart; does not compile",
+}
+
+
+def _chart_variants():
+    """Every generate_chart variant that imports in this environment, as (name, fn(df, recommendation))."""
+    variants = {
+        'Improved_chart': lambda module: lambda df, rec: module.generate_chart(df, "SELECT * FROM t", rec),
+        'Fallback_22': lambda module: module.generate_chart,
+        'Faalback': lambda module: module.generate_chart,
+        '2dgraph': lambda module: module.generate_chart,
+        'Streamlit': lambda module: module.build_chart,
+    }
+    found = []
+    skipped = [f"{module_name} ({reason})" for module_name, reason in FRAGMENT_MODULES.items()]
+    for module_name, adapt in variants.items():
+        try:
+            module = importlib.import_module(module_name)
+            if module_name in PASTE_IN_MODULES:
+                module.st = importlib.import_module('streamlit')
+            found.append((module_name, adapt(module)))
+        except Exception as e:
+            skipped.append(f"{module_name} ({type(e).__name__}: {e})")
+    return found, skipped
+
+
+def build_cases():
+    from Description import analyze_query_results
+    from Fromto import contains_date_range
+    from Chart import get_chart_type, extract_chart_intent
+    import plotly.express as px
+    import plotly.io as pio
+
+    cases, skipped = [], []
+    chart_shapes = {'bar': 'category', 'grouped bar': 'grouped', 'line': 'timeseries', 'scatter': 'scatter'}
+
+    for shape, question, recommendation in [
+            ('category', PIPELINE_QUESTION, "Bar"),
+            ('timeseries', "How does the value change by month?", "Line chart")]:
+        cases.append(Case(
+            f"analyze_query_results[{shape}]",
+            lambda n, shape=shape: make_result(n, shape),
+            lambda df, question=question, recommendation=recommendation: analyze_query_results(
+                df, question, "SELECT * FROM t ORDER BY Value DESC", recommendation)))
+
+    variants, skipped_variants = _chart_variants()
+    skipped += skipped_variants
+    for module_name, generate in variants:
+        for chart_type, shape in chart_shapes.items():
+            cases.append(Case(
+                f"generate_chart[{module_name}:{chart_type}]",
+                lambda n, shape=shape: make_result(n, shape),
+                lambda df, generate=generate, chart_type=chart_type: generate(df, chart_type),
+                sizes=SIZES[:3], setup=_clear_figure_cache))
+
+    for shape, build in [('line', lambda df: px.line(df, x='Date', y=['Metric1', 'Metric2'])),
+                         ('scatter', lambda df: px.scatter(df, x='x', y='y', render_mode='webgl'))]:
+        cases.append(Case(
+            f"figure_to_json[{shape}]",
+            lambda n, shape=shape, build=build: build(make_result(n, 'timeseries' if shape == 'line' else 'scatter')),
+            lambda fig: pio.to_json(fig, validate=False),
+            sizes=SIZES[:3]))
+
+    # Sizes are numbers of questions for the text cases
+    cases.append(Case("contains_date_range", make_questions,
+                      lambda questions: sum(map(contains_date_range, questions)), sizes=SIZES[:3]))
+    cases.append(Case("get_chart_type", make_questions,
+                      lambda questions: [get_chart_type(q) for q in questions], sizes=SIZES[:3]))
+
+    # The vector search answer_question does for each question, over size indexed values
+    try:
+        from Faiss_index import create_faiss_index
+
+        def make_index(n, dimension=384, n_queries=100):
+            rng = np.random.default_rng(SEED)
+            index = create_faiss_index(rng.random((n, dimension), dtype='float32'))
+            return index, rng.random((n_queries, dimension), dtype='float32')
+
+        cases.append(Case("faiss_lookup", make_index,
+                          lambda inputs: [inputs[0].search(inputs[1][i:i + 1], 5) for i in range(len(inputs[1]))],
+                          sizes=SIZES[:3]))
+    except ImportError as e:
+        skipped.append(f"faiss_lookup ({e})")
+    try:
+        from Autocomplete import answer_questions
+        schema = {f"column_{c}": [f"value_{c}_{v}" for v in range(20)] for c in range(10)}
+        cases.append(Case("answer_question", make_questions,
+                          lambda questions: answer_questions(questions, schema), sizes=SIZES[:2]))
+    except Exception as e:
+        skipped.append(f"answer_question ({type(e).__name__}: {e})")
+
+    # Everything after the model: parse the answer, then insights and chart on the result
+    model = StubSqlModel()
+    improved = dict(variants).get('Improved_chart')
+
+    def pipeline(df):
+        response = model.generate(PIPELINE_QUESTION)
+        intent = extract_chart_intent(response, require_prefix=True)
+        sql = response.split("```sql\n")[1].split("\n```")[0]
+        analyze_query_results(df, PIPELINE_QUESTION, sql, intent)
+        if improved is not None:
+            improved(df, intent.chart_type)
+
+    cases.append(Case("question_to_chart[stub model]", lambda n: make_result(n, 'category'), pipeline,
+                      sizes=SIZES[:3], setup=_clear_figure_cache))
+    return cases, skipped
+
+
+# Running and comparing
+
+def time_case(case, inputs, warmup=WARMUP_RUNS, repeat=REPEAT_RUNS):
+    for _ in range(warmup):
+        if case.setup:
+            case.setup()
+        case.run(inputs)
+    times = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        case.run(inputs)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {'median': statistics.median(times), 'min': times[0], 'max': times[-1],
+            'mean': statistics.fmean(times), 'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'runs': len(times)}
+
+
+def run_benchmarks(cases, sizes=DEFAULT_SIZES, warmup=WARMUP_RUNS, repeat=REPEAT_RUNS, only=None):
+    results = {}
+    for case in cases:
+        if only and not any(pattern in case.name for pattern in only):
+            continue
+        for size in sizes:
+            if size not in case.sizes:
+                continue
+            key = f"{case.name}@{size}"
+            try:
+                inputs = case.make(size)
+                results[key] = time_case(case, inputs, warmup, repeat)
+            except MemoryError:
+                print(f"{key:<60} skipped: out of memory")
+                continue
+            except Exception as e:
+                results[key] = {'error': f"{type(e).__name__}: {e}"}
+                print(f"{key:<60} error: {results[key]['error']}")
+                continue
+            finally:
+                inputs = None
+            stats = results[key]
+            print(f"{key:<60} median {stats['median'] * 1000:10.2f}ms  min {stats['min'] * 1000:10.2f}ms  "
+                  f"stdev {stats['stdev'] * 1000:8.2f}ms")
+    return results
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'timestamp': datetime.now().isoformat(timespec='seconds')}
+
+
+def baseline_path(name, baseline_dir=BASELINE_DIR):
+    return name if name.endswith('.json') else os.path.join(baseline_dir, f"{name}.json")
+
+
+def save_baseline(results, name, settings, baseline_dir=BASELINE_DIR):
+    path = baseline_path(name, baseline_dir)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'settings': settings, 'results': results}, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD, noise_floor=NOISE_FLOOR_SECONDS):
+    """Rows of (key, baseline median, current median, change, status) and whether anything regressed."""
+    rows, regressed = [], False
+    for key, current in sorted(results.items()):
+        before = baseline.get(key)
+        if before is None or 'median' not in before or 'median' not in current:
+            rows.append((key, None, current.get('median'), None, 'new' if before is None else 'error'))
+            continue
+        change = current['median'] / before['median'] - 1 if before['median'] else 0.0
+        if change > threshold and current['median'] - before['median'] > noise_floor:
+            status, regressed = 'REGRESSION', True
+        elif change < -threshold and before['median'] - current['median'] > noise_floor:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((key, before['median'], current['median'], change, status))
+    return rows, regressed
+
+
+def print_comparison(rows):
+    for key, before, after, change, status in rows:
+        before_text = f"{before * 1000:10.2f}ms" if before is not None else f"{'-':>12}"
+        after_text = f"{after * 1000:10.2f}ms" if after is not None else f"{'-':>12}"
+        change_text = f"{change:+7.1%}" if change is not None else f"{'':>7}"
+        print(f"{key:<60} {before_text} -> {after_text} {change_text}  {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--only', nargs='+', help="run cases whose name contains any of these")
+    parser.add_argument('--warmup', type=int, default=WARMUP_RUNS)
+    parser.add_argument('--repeat', type=int, default=REPEAT_RUNS)
+    parser.add_argument('--save', metavar='NAME', help=f"store results as {BASELINE_DIR}/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="compare against a stored baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    cases, skipped = build_cases()
+    for reason in skipped:
+        print(f"skipped {reason}")
+    results = run_benchmarks(cases, args.sizes, args.warmup, args.repeat, args.only)
+
+    if args.save:
+        settings = {'sizes': args.sizes, 'warmup': args.warmup, 'repeat': args.repeat, 'only': args.only}
+        print(f"Saved baseline to {save_baseline(results, args.save, settings)}")
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} ({baseline['environment'].get('timestamp')}, "
+              f"{baseline['environment'].get('platform')}):")
+        rows, regressed = compare(results, baseline['results'], args.threshold)
+        print_comparison(rows)
+        if regressed:
+            print(f"\nSlower than the baseline by more than {args.threshold:.0%}.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,91 @@
- import re
+import re
+from collections import namedtuple
+
+# Priority order: when several chart types are mentioned the earliest one in this list wins
+CHART_KEYWORDS = ['grouped bar', 'bar', 'line', 'scatter', 'histogram', 'pie', 'heatmap', 'box']
+
+ChartIntent = namedtuple('ChartIntent', ['chart_type', 'modifiers'])
+
+# One alternation for every keyword, longest first so "grouped bar" wins over "bar" at the same
+# position; words may be joined by spaces, hyphens or nothing ("grouped-bar", "GroupedBar").
+# An optional "chart/graph/plot" and a parenthesised modifier list may follow.
+CHART_INTENT_PATTERN = re.compile(
+    r'\b(?P<chart_type>'
+    + '|'.join(r'[\s\-]*'.join(map(re.escape, keyword.split()))
+               for keyword in sorted(CHART_KEYWORDS, key=len, reverse=True))
+    + r')(?:[\s\-]*(?:chart|graph|plot))?\b(?:\s*\((?P<modifiers>[^()]*)\))?',
+    re.IGNORECASE,
+)
+RECOMMENDATION_PREFIX = 'chart recommendation:'
+
+_keyword_rank = {keyword: rank for rank, keyword in enumerate(CHART_KEYWORDS)}
+# "Grouped-Bar", "grouped  bar" and "groupedbar" all map back to "grouped bar"
+_keyword_by_letters = {keyword.replace(' ', ''): keyword for keyword in CHART_KEYWORDS}
+
+
+def extract_chart_intent(text, require_prefix=False):
+    """ChartIntent(chart_type, modifiers) for the chart named in text, or None.
+
+    A "Chart recommendation:" line, when present, is the only part searched
+    (with require_prefix=True, text without one gives None).
+    Modifiers are the comma-separated words in brackets after the chart name,
+    e.g. "Bar (horizontal, stacked)" -> ('horizontal', 'stacked').
+    """
+    if not text:
+        return None
+    start = text.lower().find(RECOMMENDATION_PREFIX)
+    if start != -1:
+        end = text.find('\n', start)
+        text = text[start + len(RECOMMENDATION_PREFIX):end if end != -1 else len(text)]
+    elif require_prefix:
+        return None
+
+    best = None
+    for match in CHART_INTENT_PATTERN.finditer(text):
+        chart_type = _keyword_by_letters[re.sub(r'[\s\-]', '', match.group('chart_type').lower())]
+        if best is None or _keyword_rank[chart_type] < _keyword_rank[best[0]]:
+            best = (chart_type, match.group('modifiers'))
+    if best is None:
+        return None
+    modifiers = tuple(m.strip().lower() for m in (best[1] or '').split(',') if m.strip())
+    return ChartIntent(best[0], modifiers)
+
+
+def chart_intent(chart_recommendation):
+    """ChartIntent from a recommendation string (or an existing ChartIntent) for the generate_chart variants.
+
+    Unknown chart names are kept as written so callers can report them.
+    """
+    if chart_recommendation is None or isinstance(chart_recommendation, ChartIntent):
+        return chart_recommendation
+    intent = extract_chart_intent(chart_recommendation)
+    if intent is None:
+        intent = ChartIntent(chart_recommendation.split('(')[0].strip().lower(), ())
+    return intent
+
 
 def get_chart_type(sentence):
-    keywords = ['grouped bar', 'bar', 'line', 'scatter', 'histogram', 'pie']
-    
-    # Convert the input sentence to lowercase
-    sentence_lower = sentence.lower()
-    
-    # Create regex patterns for each keyword
-    patterns = [
-        r'\b' + re.escape(keyword).replace(r'\ ', r'\s+') + r'\b'
-        for keyword in keywords
+    intent = extract_chart_intent(sentence)
+    return intent.chart_type if intent else None  # Return None if no keyword matches
+
+
+if __name__ == "__main__":
+    # Example usage
+    sentences = [
+        "I think a Bar chart would be good for this data.",
+        "A Grouped Bar chart might show the comparison better.",
+        "Let's use a line graph to show the trend.",
+        "A pie chart isn't suitable for this dataset.",
+        "We should visualize this with a histogram.",
+        "This data doesn't fit any of our chart types.",
+        "A scatter plot would work well here.",
+        "Maybe a GROUPED-BAR chart?",
+        "How about a BAR-CHART?",
+        "A Line-Graph could show the trend.",
+        "A simple bar graph will suffice.",
+        "SQL: ...\nChart recommendation: Grouped Bar (horizontal, stacked)",
     ]
-    
-    # Search for each pattern in the lowercase sentence
-    for keyword, pattern in zip(keywords, patterns):
-        if re.search(pattern, sentence_lower):
-            return keyword
-    
-    return None  # Return None if no keyword matches
-
-# Example usage
-sentences = [
-    "I think a Bar chart would be good for this data.",
-    "A Grouped Bar chart might show the comparison better.",
-    "Let's use a line graph to show the trend.",
-    "A pie chart isn't suitable for this dataset.",
-    "We should visualize this with a histogram.",
-    "This data doesn't fit any of our chart types.",
-    "A scatter plot would work well here.",
-    "Maybe a GROUPED-BAR chart?",
-    "How about a BAR-CHART?",
-    "A Line-Graph could show the trend.",
-    "A simple bar graph will suffice."
-]
-
-for sentence in sentences:
-    print(f"Sentence: {sentence}")
-    print(f"Chart type: {get_chart_type(sentence)}\n")
+
+    for sentence in sentences:
+        print(f"Sentence: {sentence}")
+        print(f"Chart type: {get_chart_type(sentence)}  {extract_chart_intent(sentence)}\n")
@@ -0,0 +1,27 @@
+import pandas as pd
+
+AGGREGATES = ('sum', 'mean', 'count', 'min', 'max')
+
+
+class ChartAggregation:
+    """Grouping and aggregation a chart needs, e.g. SUM(value) by category and division."""
+
+    def __init__(self, group_by, measures, agg='sum'):
+        self.group_by = list(group_by)
+        # measures is a list of columns (all using agg) or a {column: agg} dict
+        if isinstance(measures, dict):
+            self.measures = dict(measures)
+        else:
+            self.measures = {col: agg for col in measures}
+        for col, func in self.measures.items():
+            if func not in AGGREGATES:
+                raise ValueError(f"Unsupported chart aggregation '{func}' for column {col}")
+
+    def apply(self, df):
+        """The same aggregation as one pandas groupby over df; NULL keys form a group, as in SQL GROUP BY."""
+        return df.groupby(self.group_by, observed=True, dropna=False).agg(self.measures).reset_index()
+
+
+def partition(df, column):
+    """Split df by column in one pass, keeping first-appearance order of the keys (NULL included)."""
+    return {key: part for key, part in df.groupby(column, sort=False, observed=True, dropna=False)}
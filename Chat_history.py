@@ -0,0 +1,194 @@
+import os
+import time
+import shutil
+import logging
+
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = "chat_history"
+# Rows of each result kept in memory for the collapsed view
+PREVIEW_ROWS = 10
+# Entries that keep a preview in memory; older ones read it back from disk when opened
+MAX_PREVIEWS = 20
+# Newest entries shown open; older ones are collapsed and load nothing until asked
+RECENT_ENTRIES = 3
+# Collapsed entries shown per "Show older" click, so a rerun never walks the whole chat
+OLDER_PAGE_SIZE = 10
+# Session directories untouched for this long are removed when a new session starts
+SESSION_TTL_SECONDS = 24 * 3600
+# Beyond this, the least recently used session directories are removed as well
+MAX_HISTORY_BYTES = 2 * 1024 ** 3
+
+
+def _session_usage(session_dir):
+    """(last_modified, total_bytes) of the files in one session directory."""
+    last_modified, total_bytes = os.path.getmtime(session_dir), 0
+    for entry in os.scandir(session_dir):
+        if entry.is_file():
+            stat = entry.stat()
+            last_modified = max(last_modified, stat.st_mtime)
+            total_bytes += stat.st_size
+    return last_modified, total_bytes
+
+
+def prune_sessions(history_dir=HISTORY_DIR, ttl_seconds=SESSION_TTL_SECONDS, max_bytes=MAX_HISTORY_BYTES, keep=()):
+    """Remove session directories older than ttl_seconds, then the oldest ones until the rest fit in max_bytes.
+
+    Directories named in keep are never removed. Returns the number removed.
+    """
+    if not os.path.isdir(history_dir):
+        return 0
+    sessions = []
+    for entry in os.scandir(history_dir):
+        if entry.is_dir() and entry.name not in keep:
+            try:
+                sessions.append((*_session_usage(entry.path), entry.path))
+            except OSError:
+                # Removed by another session's cleanup in the meantime
+                continue
+    sessions.sort()
+    total_bytes = sum(size for _, size, _ in sessions)
+    now = time.time()
+    removed = 0
+    for last_modified, size, path in sessions:
+        if now - last_modified <= ttl_seconds and total_bytes <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total_bytes -= size
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} old chat history sessions from {history_dir}")
+    return removed
+
+
+class ChatHistory:
+    """Chat history that spills results and figures to disk and keeps only metadata and small previews in memory."""
+
+    def __init__(self, session_id, history_dir=HISTORY_DIR, preview_rows=PREVIEW_ROWS, max_previews=MAX_PREVIEWS):
+        self.session_dir = os.path.join(history_dir, str(session_id))
+        self.preview_rows = preview_rows
+        self.max_previews = max_previews
+        self.entries = []
+        try:
+            prune_sessions(history_dir, keep={str(session_id)})
+        except Exception as e:
+            logger.error(f"Error pruning chat history: {str(e)}")
+        os.makedirs(self.session_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def _path(self, number, suffix):
+        return os.path.join(self.session_dir, f"{number:05d}{suffix}")
+
+    def _write_result(self, number, result_df):
+        path = self._path(number, ".parquet")
+        try:
+            # Parquet needs string column names
+            result_df.rename(columns=str).to_parquet(path, index=False)
+        except Exception as e:
+            logger.error(f"Could not write result as Parquet, storing it pickled: {str(e)}")
+            path = self._path(number, ".pkl")
+            result_df.to_pickle(path)
+        return path
+
+    def add(self, question, sql_query, result_df, chart=None):
+        number = len(self.entries)
+        entry = {
+            'question': question,
+            'sql_query': sql_query,
+            'rows': 0 if result_df is None else len(result_df),
+            'columns': [] if result_df is None else [str(col) for col in result_df.columns],
+            'preview': None if result_df is None else result_df.head(self.preview_rows).copy(),
+            'result_path': None if result_df is None else self._write_result(number, result_df),
+            'chart_path': None,
+        }
+        self.entries.append(entry)
+        if chart is not None:
+            self.set_chart(number, chart)
+        # Only the newest entries keep their preview in memory
+        if len(self.entries) > self.max_previews:
+            self.entries[-self.max_previews - 1]['preview'] = None
+        return entry
+
+    def set_chart(self, index, chart):
+        number = index % len(self.entries)
+        path = self._path(number, ".json")
+        pio.write_json(chart, path)
+        self.entries[number]['chart_path'] = path
+
+    def load_result(self, index):
+        path = self.entries[index]['result_path']
+        if path is None:
+            return None
+        return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+
+    def load_preview(self, index):
+        entry = self.entries[index]
+        if entry['preview'] is not None:
+            return entry['preview']
+        result = self.load_result(index)
+        return None if result is None else result.head(self.preview_rows)
+
+    def load_chart(self, index):
+        path = self.entries[index]['chart_path']
+        return pio.read_json(path) if path else None
+
+    def clear(self):
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+        os.makedirs(self.session_dir, exist_ok=True)
+        self.entries = []
+
+
+def init_chat_history():
+    """Create this session's ChatHistory once; needs st.session_state['session_id'] set."""
+    if 'chat_history' not in st.session_state:
+        st.session_state['chat_history'] = ChatHistory(st.session_state['session_id'])
+    return st.session_state['chat_history']
+
+
+def _render_entry(history, index, expanded):
+    entry = history[index]
+    st.code(entry['sql_query'], language="sql")
+    st.caption(f"{entry['rows']:,} rows, {len(entry['columns'])} columns")
+    if expanded:
+        st.dataframe(history.load_preview(index))
+        chart = history.load_chart(index)
+        if chart is not None:
+            st.plotly_chart(chart, use_container_width=True)
+        return
+    # Collapsed entries only touch disk when the user asks for the data
+    if st.toggle("Show result", key=f"history_result_{index}"):
+        st.dataframe(history.load_result(index))
+    if entry['chart_path'] and st.toggle("Show chart", key=f"history_chart_{index}"):
+        st.plotly_chart(history.load_chart(index), use_container_width=True)
+
+
+def render_chat_history(history, recent_entries=RECENT_ENTRIES, page_size=OLDER_PAGE_SIZE):
+    """Render the newest entries in full and a bounded page of older ones collapsed."""
+    total = len(history)
+    first_recent = max(total - recent_entries, 0)
+    shown_older = st.session_state.setdefault('history_older_shown', page_size)
+    first_older = max(first_recent - shown_older, 0)
+
+    if first_older > 0 and st.button(f"Show older messages ({first_older} hidden)", key="history_show_older"):
+        st.session_state['history_older_shown'] = shown_older + page_size
+        first_older = max(first_recent - st.session_state['history_older_shown'], 0)
+
+    for index in range(first_older, total):
+        entry = history[index]
+        with st.chat_message(name="user", avatar="user"):
+            st.markdown(entry['question'])
+        with st.chat_message(name="assistant", avatar="assistant"):
+            if index >= first_recent:
+                _render_entry(history, index, expanded=True)
+            else:
+                with st.expander("Answer", expanded=False):
+                    _render_entry(history, index, expanded=False)
@@ -0,0 +1,104 @@
+import hashlib
+import weakref
+from functools import cached_property
+
+import pandas as pd
+
+# Profiles already computed in this process, keyed by id(df)
+_profiles = {}
+
+
+class ColumnProfile:
+    """Column classification and per-column statistics for one result DataFrame.
+
+    Dtype classes are computed up front; the statistics that need a pass over
+    the data are computed on first use and then kept.
+    """
+
+    def __init__(self, df):
+        self._df_ref = weakref.ref(df)
+        self.total_rows = len(df)
+        self.total_cols = len(df.columns)
+        self.date_cols = []
+        self.numeric_cols = []
+        self.categorical_cols = []
+        for col, dtype in df.dtypes.items():
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                self.date_cols.append(col)
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                self.numeric_cols.append(col)
+            elif isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) \
+                    or pd.api.types.is_string_dtype(dtype):
+                self.categorical_cols.append(col)
+
+    @property
+    def df(self):
+        return self._df_ref()
+
+    @cached_property
+    def null_counts(self):
+        return self.df.isna().sum().to_dict()
+
+    @cached_property
+    def cardinality(self):
+        return self.df.nunique().to_dict()
+
+    @cached_property
+    def minimums(self):
+        cols = self.numeric_cols + self.date_cols
+        return self.df[cols].min().to_dict() if cols else {}
+
+    @cached_property
+    def maximums(self):
+        cols = self.numeric_cols + self.date_cols
+        return self.df[cols].max().to_dict() if cols else {}
+
+    @cached_property
+    def sortedness(self):
+        """'ascending', 'descending' or None for every numeric and date column."""
+        result = {}
+        for col in self.numeric_cols + self.date_cols:
+            series = self.df[col]
+            if series.is_monotonic_increasing:
+                result[col] = 'ascending'
+            elif series.is_monotonic_decreasing:
+                result[col] = 'descending'
+            else:
+                result[col] = None
+        return result
+
+
+def frame_fingerprint(df):
+    """Content hash of values, index, column names and dtypes.
+
+    Computed on every call: frame_version can't see values edited in place, so
+    a hash kept with the profile could outlive the data it describes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes))).encode('utf-8'))
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # Unhashable cells such as lists or dicts
+        row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    digest.update(row_hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def frame_version(df):
+    """Cheap version stamp: changes when columns, dtypes or length change, or when df.attrs['version'] is bumped."""
+    return (df.shape, tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes), df.attrs.get('version', 0))
+
+
+def profile_dataframe(df):
+    """Return the ColumnProfile for df, computing it only once per frame and version."""
+    key = id(df)
+    version = frame_version(df)
+    cached = _profiles.get(key)
+    if cached is not None and cached[0] == version and cached[1].df is df:
+        return cached[1]
+    profile = ColumnProfile(df)
+    if key not in _profiles:
+        weakref.finalize(df, _profiles.pop, key, None)
+    _profiles[key] = (version, profile)
+    return profile
@@ -1,13 +1,28 @@
-      import pandas as pd
+import pandas as pd
 import numpy as np
 import re
-from scipy import stats
+import calendar
+from Column_profile import profile_dataframe
+from Chart import chart_intent
+from Stats_kernel import compute_numeric_stats, pareto_count
 
-def analyze_query_results(df, question, sql_query, chart_recommendation):
+def analyze_query_results(df, question, sql_query, chart_recommendation, profile=None):
     insights = []
+
+    # Classify columns once; every section below reads from the same profile
+    if profile is None:
+        profile = profile_dataframe(df)
+
+    # All numeric statistics the rules below need, computed in one vectorized sweep
+    try:
+        time_col = profile.date_cols[0] if profile.date_cols else None
+        stats = compute_numeric_stats(df, profile.numeric_cols, time_col)
+    except Exception as e:
+        print(f"Error computing statistics: {e}")
+        stats = None
     
     try:
-        chart_type = chart_recommendation.split('(')[0].strip().lower() if chart_recommendation else determine_chart_type(df)
+        chart_type = chart_intent(chart_recommendation).chart_type if chart_recommendation else determine_chart_type(df)
     except Exception as e:
         print(f"Error determining chart type: {e}")
         chart_type = "unknown"
@@ -46,21 +61,17 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
             
             # Calculate percentage change
             if time_based_grouping:
+                # Derive the time key as a Series; the caller's frame is never modified
+                dates = pd.to_datetime(df.iloc[:, 0])
                 if time_unit in ['week', 'weeks']:
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    df['week'] = df['date'].dt.to_period('W')
-                    grouped = df.groupby('week').sum().reset_index()
+                    time_key = dates.dt.to_period('W').rename('week')
                 elif time_unit in ['day', 'days']:
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    grouped = df.groupby('date').sum().reset_index()
+                    time_key = dates.rename('date')
                 elif time_unit in ['month', 'months']:
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    df['month'] = df['date'].dt.to_period('M')
-                    grouped = df.groupby('month').sum().reset_index()
+                    time_key = dates.dt.to_period('M').rename('month')
                 else:  # year, years
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    df['year'] = df['date'].dt.year
-                    grouped = df.groupby('year').sum().reset_index()
+                    time_key = dates.dt.year.rename('year')
+                grouped = df[profile.numeric_cols].groupby(time_key).sum().reset_index()
                 
                 for col in grouped.columns[1:]:
                     if pd.api.types.is_numeric_dtype(grouped[col]):
@@ -77,7 +88,8 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
             
             else:
                 # Non-time-based grouping
-                grouped = df.groupby(grouping_column).sum().reset_index()
+                value_cols = [col for col in profile.numeric_cols if col != grouping_column]
+                grouped = df.groupby(grouping_column)[value_cols].sum().reset_index()
                 for col in grouped.columns[1:]:
                     if pd.api.types.is_numeric_dtype(grouped[col]):
                         max_value = grouped[col].max()
@@ -94,54 +106,51 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
 
     # Time-based analysis
     try:
-        time_cols = df.select_dtypes(include=['datetime64']).columns
+        time_cols = profile.date_cols
         if len(time_cols) > 0:
             time_col = time_cols[0]
             time_range = df[time_col].max() - df[time_col].min()
             insights.append(f"The data covers a period of {time_range.days} days.")
             
             # Trend analysis
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
+            numeric_cols = profile.numeric_cols
             for col in numeric_cols:
-                correlation = df[time_col].corr(df[col])
+                correlation = stats['time_corr'][col]
                 if abs(correlation) > 0.7:
                     trend = "upward" if correlation > 0 else "downward"
                     insights.append(f"There's a strong {trend} trend for {col} over time.")
             
             # Seasonality check
             if len(df) >= 12:
-                df['month'] = df[time_col].dt.month
+                monthly_avgs = df[numeric_cols].groupby(df[time_col].dt.month.rename('month')).mean()
                 for col in numeric_cols:
-                    monthly_avg = df.groupby('month')[col].mean()
+                    monthly_avg = monthly_avgs[col]
                     if monthly_avg.max() / monthly_avg.min() > 1.5:
                         peak_month = monthly_avg.idxmax()
-                        insights.append(f"{col} shows seasonal patterns with peaks typically in {peak_month:%B}.")
+                        insights.append(f"{col} shows seasonal patterns with peaks typically in {calendar.month_name[peak_month]}.")
     except Exception as e:
         print(f"Error in time-based analysis: {e}")
 
     # Distribution analysis
     try:
-        for col in df.select_dtypes(include=[np.number]).columns:
-            if df[col].nunique() > 5:
-                skewness = df[col].skew()
+        for col in profile.numeric_cols:
+            if profile.cardinality[col] > 5:
+                skewness = stats['skew'][col]
                 if abs(skewness) > 1:
                     skew_direction = "higher" if skewness > 0 else "lower"
                     insights.append(f"The distribution of {col} is skewed, with more {skew_direction} values than expected.")
                 
-                # Outlier detection
-                q1 = df[col].quantile(0.25)
-                q3 = df[col].quantile(0.75)
-                iqr = q3 - q1
-                outliers = df[(df[col] < q1 - 1.5 * iqr) | (df[col] > q3 + 1.5 * iqr)]
-                if len(outliers) > 0:
-                    insights.append(f"There are {len(outliers)} potential outliers in {col}, which may warrant further investigation.")
+                # Outlier detection (IQR fences computed in the stats sweep)
+                outliers = stats['outliers'][col]
+                if outliers > 0:
+                    insights.append(f"There are {outliers} potential outliers in {col}, which may warrant further investigation.")
     except Exception as e:
         print(f"Error in distribution analysis: {e}")
 
     # Correlation analysis
     try:
-        if len(df.select_dtypes(include=[np.number]).columns) > 1:
-            corr_matrix = df.select_dtypes(include=[np.number]).corr()
+        if len(profile.numeric_cols) > 1:
+            corr_matrix = stats['corr']
             high_corr = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool)).stack()
             high_corr = high_corr[abs(high_corr) > 0.7]
             for (col1, col2), corr in high_corr.items():
@@ -154,29 +163,27 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
     try:
         if chart_type in ['bar', 'grouped bar']:
             x_col = df.columns[0]
-            y_cols = df.columns[1:]
+            y_cols = [col for col in df.columns[1:] if col in stats['mean']]
             
             for y_col in y_cols:
-                top_category = df.nlargest(1, y_col).iloc[0]
-                bottom_category = df.nsmallest(1, y_col).iloc[0]
-                insights.append(f"{top_category[x_col]} leads in {y_col} with {top_category[y_col]:.2f}, while {bottom_category[x_col]} lags at {bottom_category[y_col]:.2f}.")
+                top_label = df[x_col].iloc[stats['argmax'][y_col]]
+                bottom_label = df[x_col].iloc[stats['argmin'][y_col]]
+                insights.append(f"{top_label} leads in {y_col} with {stats['max'][y_col]:.2f}, while {bottom_label} lags at {stats['min'][y_col]:.2f}.")
             
+            total_sum = stats['sum'][y_cols[0]]
             if len(df) > 5:
-                top_5_sum = df.nlargest(5, y_cols[0])[y_cols[0]].sum()
-                total_sum = df[y_cols[0]].sum()
+                top_5_sum = stats['top5_sum'][y_cols[0]]
                 insights.append(f"The top 5 {x_col}s drive {(top_5_sum/total_sum)*100:.1f}% of total {y_cols[0]}.")
             
             # Pareto analysis
             if len(df) > 1:
-                df_sorted = df.sort_values(y_cols[0], ascending=False)
-                cumulative_sum = df_sorted[y_cols[0]].cumsum()
-                pareto_index = (cumulative_sum / total_sum >= 0.8).idxmax()
-                insights.append(f"The top {pareto_index + 1} {x_col}s account for 80% of the total {y_cols[0]}, suggesting a Pareto distribution.")
+                pareto_size = pareto_count(df[y_cols[0]].dropna().to_numpy())
+                insights.append(f"The top {pareto_size} {x_col}s account for 80% of the total {y_cols[0]}, suggesting a Pareto distribution.")
             
             # Variance analysis
             if len(df) > 2:
-                variance = df[y_cols[0]].var()
-                cv = df[y_cols[0]].std() / df[y_cols[0]].mean()
+                variance = stats['var'][y_cols[0]]
+                cv = stats['std'][y_cols[0]] / stats['mean'][y_cols[0]]
                 insights.append(f"There's a variance of {variance:.2f} in {y_cols[0]} across {x_col}s, with a coefficient of variation of {cv:.2f}, indicating {'high' if cv > 1 else 'moderate' if cv > 0.5 else 'low'} relative variability.")
             
             if chart_type == 'grouped bar':
@@ -194,15 +201,15 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
                 insights.append(f"{most_consistent} shows the most consistent performance across all {category_col}s.")
         
         elif chart_type == 'line':
-            for col in df.columns[1:]:
+            for col in [col for col in df.columns[1:] if col in stats['mean']]:
                 start_value = df[col].iloc[0]
                 end_value = df[col].iloc[-1]
                 change_pct = ((end_value - start_value) / start_value) * 100
                 direction = "grew" if change_pct > 0 else "declined"
                 insights.append(f"{col} {direction} by {abs(change_pct):.1f}% from {start_value:.2f} to {end_value:.2f}.")
                 
-                peak = df[col].max()
-                trough = df[col].min()
+                peak = stats['max'][col]
+                trough = stats['min'][col]
                 insights.append(f"{col} peaked at {peak:.2f} and bottomed at {trough:.2f}.")
                 
                 # Volatility analysis
@@ -210,10 +217,9 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
                 avg_volatility = rolling_std.mean()
                 insights.append(f"The average volatility (standard deviation) of {col} over time is {avg_volatility:.2f}.")
                 
-                # Trend strength
-                x = np.arange(len(df))
-                slope, _, r_value, _, _ = stats.linregress(x, df[col])
-                trend_strength = r_value ** 2
+                # Trend strength (least-squares fit against row position)
+                slope = stats['trend_slope'][col]
+                trend_strength = stats['trend_r'][col] ** 2
                 trend_direction = "upward" if slope > 0 else "downward"
                 insights.append(f"{col} shows a {trend_direction} trend with a strength of {trend_strength:.2f} (R-squared).")
                 
@@ -227,16 +233,17 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
         
         elif chart_type == 'pie':
             values_col = df.columns[1]
-            total = df[values_col].sum()
-            top_category = df.nlargest(1, values_col).iloc[0]
-            insights.append(f"'{top_category.iloc[0]}' dominates with {(top_category[values_col]/total)*100:.1f}% of the total {values_col}.")
+            total = stats['sum'][values_col]
+            top_label = df.iloc[stats['argmax'][values_col], 0]
+            top_value = stats['top1'][values_col]
+            insights.append(f"'{top_label}' dominates with {(top_value/total)*100:.1f}% of the total {values_col}.")
             
             if len(df) > 3:
-                other_pct = (df.nsmallest(len(df)-3, values_col)[values_col].sum() / total) * 100
+                other_pct = ((total - stats['top3_sum'][values_col]) / total) * 100
                 insights.append(f"The smaller categories collectively represent {other_pct:.1f}% of the total, indicating a long tail distribution.")
             
             # Concentration analysis
-            herfindahl_index = ((df[values_col] / total) ** 2).sum()
+            herfindahl_index = stats['sum_squares'][values_col] / total ** 2
             if herfindahl_index < 0.15:
                 concentration = "highly diverse"
             elif herfindahl_index < 0.25:
@@ -247,15 +254,16 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
             
             # Relative comparisons
             if len(df) > 1:
-                second_largest = df.nlargest(2, values_col).iloc[1]
-                ratio = top_category[values_col] / second_largest[values_col]
-                insights.append(f"The leading category '{top_category.iloc[0]}' is {ratio:.1f} times larger than the second-largest category '{second_largest.iloc[0]}'.")
+                second_value = stats['top2'][values_col]
+                second_label = df.iloc[stats['second_argmax'][values_col], 0]
+                ratio = top_value / second_value
+                insights.append(f"The leading category '{top_label}' is {ratio:.1f} times larger than the second-largest category '{second_label}'.")
             
             # Identify underperformers
-            average = total / len(df)
-            underperformers = df[df[values_col] < average]
-if not underperformers.empty:
-                insights.append(f"{len(underperformers)} categories are performing below the average of {average:.2f}, potentially indicating areas for improvement.")
+            average = stats['mean'][values_col]
+            underperformers = stats['below_mean'][values_col]
+            if underperformers > 0:
+                insights.append(f"{underperformers} categories are performing below the average of {average:.2f}, potentially indicating areas for improvement.")
     except Exception as e:
         print(f"Error in chart-specific analysis: {e}")
 
@@ -271,21 +279,21 @@ if not underperformers.empty:
                 insights.append(f"The top three contenders command {top_three_share:.1f}% of the total, highlighting a concentration at the top.")
 
         elif 'average' in question.lower() or 'mean' in question.lower():
-            for col in df.select_dtypes(include=[np.number]).columns:
-                mean_val = df[col].mean()
+            for col in profile.numeric_cols:
+                mean_val = stats['mean'][col]
                 insights.append(f"On average, {col} stands at {mean_val:.2f}.")
                 
                 # Compare to overall average if there's a grouping
                 if len(df) > 1:
-                    above_average = df[df[col] > mean_val]
-                    insights.append(f"{len(above_average)} items outperform the average {col}, suggesting room for improvement in others.")
+                    above_average = stats['above_mean'][col]
+                    insights.append(f"{above_average} items outperform the average {col}, suggesting room for improvement in others.")
     except Exception as e:
         print(f"Error in question-specific analysis: {e}")
 
     # Overall trend for time series
     try:
-        time_cols = df.select_dtypes(include=['datetime64']).columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        time_cols = profile.date_cols
+        numeric_cols = profile.numeric_cols
         if len(time_cols) > 0 and len(numeric_cols) > 0:
             first_value = df[numeric_cols[0]].iloc[0]
             last_value = df[numeric_cols[0]].iloc[-1]
@@ -352,6 +360,8 @@ def main():
                     })
 
                 if not result_df.empty:
+                    # Profile the result once for both the chart and the insights
+                    profile = profile_dataframe(result_df)
                     col1, col2 = st.columns(2)
 
                     with col1:
@@ -363,7 +373,7 @@ def main():
                         generate_chart(result_df, chart_recommendation)
 
                     st.subheader("Key Insights:")
-                    analysis = analyze_query_results(result_df, question, sql_query, chart_recommendation)
+                    analysis = analyze_query_results(result_df, question, sql_query, chart_recommendation, profile)
                     st.write(analysis)
                 else:
                     st.warning("No results found for the given query.")
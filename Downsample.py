@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+# Maximum points sent to the browser per chart; keeps the Plotly JSON in the low-MB range
+POINT_BUDGET = 5000
+
+
+def _as_float(series):
+    """Numeric or datetime Series as a float64 array, or None for anything else."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    return None
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: positions of n_out points that keep the visual shape of (x, y).
+
+    x must be sorted ascending. The first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 inner buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype('int64')
+    valid = ~np.isnan(y)
+    y_filled = np.where(valid, y, 0.0)
+    x_sums = np.concatenate([[0.0], np.cumsum(np.where(valid, x, 0.0))])
+    y_sums = np.concatenate([[0.0], np.cumsum(y_filled)])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bucket_counts = counts[edges[1:]] - counts[edges[:-1]]
+        mean_x = (x_sums[edges[1:]] - x_sums[edges[:-1]]) / bucket_counts
+        mean_y = (y_sums[edges[1:]] - y_sums[edges[:-1]]) / bucket_counts
+
+    selected = np.empty(n_out, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < n_out - 2 and bucket_counts[bucket + 1] > 0:
+            next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        else:
+            next_x, next_y = x[n - 1], y_filled[n - 1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[anchor] - next_x) * (y_filled[start:end] - y_filled[anchor])
+                      - (x[anchor] - x[start:end]) * (next_y - y_filled[anchor]))
+        area[~valid[start:end]] = -1.0
+        anchor = start + int(np.argmax(area))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def downsample_line(df, x_col, y_cols, budget=POINT_BUDGET, group_col=None):
+    """Reduce df to about budget rows for a line chart of y_cols over x_col using LTTB.
+
+    Each y column gets its share of the budget and the union of the chosen rows
+    is returned in x order, so peaks and dips of every series survive. With
+    group_col (a chart's color column) every group is its own line and is
+    reduced separately.
+    """
+    if isinstance(y_cols, str):
+        y_cols = [y_cols]
+    y_cols = list(y_cols)
+    if len(df) <= budget or not y_cols:
+        return df
+    if group_col is not None:
+        groups = [group for _, group in df.groupby(group_col, sort=False, dropna=False)]
+        per_group = max(budget // len(groups), 3)
+        return pd.concat([downsample_line(group, x_col, y_cols, per_group) for group in groups])
+
+    x = _as_float(df[x_col])
+    if x is None or np.isnan(x).any():
+        # Categorical axis: nothing to measure areas against, keep evenly spaced rows
+        positions = np.unique(np.linspace(0, len(df) - 1, budget).astype('int64'))
+        return df.iloc[positions]
+
+    order = None
+    if not (np.diff(x) >= 0).all():
+        order = np.argsort(x, kind='stable')
+        x = x[order]
+
+    per_column = max(budget // len(y_cols), 3)
+    positions = []
+    for col in y_cols:
+        y = _as_float(df[col])
+        if y is None:
+            continue
+        if order is not None:
+            y = y[order]
+        positions.append(lttb_indices(x, y, per_column))
+    if not positions:
+        return df
+    positions = np.unique(np.concatenate(positions))
+    if order is not None:
+        positions = order[positions]
+    return df.iloc[positions]
+
+
+def downsample_scatter(df, x_col, y_col, budget=POINT_BUDGET, seed=0):
+    """Reduce df to at most budget rows for a scatter of y_col against x_col by grid binning.
+
+    The plot area is split into a square grid of about budget cells and one row
+    is kept per occupied cell, so the covered area and the outliers are preserved
+    while dense regions are thinned out.
+    """
+    if len(df) <= budget:
+        return df
+
+    x, y = _as_float(df[x_col]), _as_float(df[y_col])
+    if x is None or y is None:
+        positions = np.random.default_rng(seed).choice(len(df), budget, replace=False)
+        return df.iloc[np.sort(positions)]
+
+    side = max(int(np.sqrt(budget)), 1)
+
+    def cell(values):
+        low, high = np.nanmin(values), np.nanmax(values)
+        span = high - low if high > low else 1.0
+        return np.clip(((values - low) / span * side).astype('int64'), 0, side - 1)
+
+    valid = ~(np.isnan(x) | np.isnan(y))
+    cells = np.where(valid, cell(np.where(valid, x, np.nanmin(x))) * side
+                     + cell(np.where(valid, y, np.nanmin(y))), -1)
+    _, positions = np.unique(cells, return_index=True)
+    positions = positions[valid[positions]]
+    return df.iloc[np.sort(positions)]
+
+
+def title_with_note(title, original_rows, shown_rows):
+    """Append a note to the chart title when fewer rows are drawn than were returned."""
+    if shown_rows >= original_rows:
+        return title
+    return f"{title} (downsampled to {shown_rows:,} of {original_rows:,} points)"
+
+
+if __name__ == "__main__":
+    import time
+    import plotly.express as px
+
+    n = 2000000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=n, freq='min'),
+        'Value': np.cumsum(rng.standard_normal(n)),
+        'Other': rng.standard_normal(n),
+    })
+
+    start = time.perf_counter()
+    line_df = downsample_line(df, 'Date', ['Value'])
+    line_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    scatter_df = downsample_scatter(df, 'Value', 'Other')
+    scatter_seconds = time.perf_counter() - start
+
+    for name, full, reduced, seconds, plot in [
+        ('line', df, line_df, line_seconds, lambda d: px.line(d, x='Date', y='Value')),
+        ('scatter', df, scatter_df, scatter_seconds, lambda d: px.scatter(d, x='Value', y='Other')),
+    ]:
+        reduced_size = len(plot(reduced).to_json()) / 1e6
+        print(f"{name:<8} {len(full):,} -> {len(reduced):,} rows in {seconds * 1000:.0f}ms, "
+              f"figure JSON {reduced_size:.2f} MB")
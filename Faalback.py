@@ -1,24 +1,33 @@
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from Column_profile import profile_dataframe
+from Figure_cache import chart_key, figure_cache
+from Chart import chart_intent
+from Downsample import downsample_line, downsample_scatter, title_with_note
+from Render_mode import render_mode, scatter_trace
 
 def generate_chart(df, chart_recommendation):
     def fallback_chart(df):
         # Determine column types
-        date_cols = df.select_dtypes(include=['datetime64']).columns
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+        profile = profile_dataframe(df)
+        date_cols, numeric_cols, categorical_cols = profile.date_cols, profile.numeric_cols, profile.categorical_cols
 
         if len(date_cols) > 0 and len(numeric_cols) > 0:
             # Time series plot
             fig = make_subplots(rows=len(numeric_cols), cols=1, shared_xaxes=True, vertical_spacing=0.05)
+            shown_rows = len(df)
             for i, col in enumerate(numeric_cols, 1):
-                fig.add_trace(go.Scatter(x=df[date_cols[0]], y=df[col], mode='lines+markers', name=col), row=i, col=1)
+                plot_df = downsample_line(df, date_cols[0], [col])
+                shown_rows = min(shown_rows, len(plot_df))
+                fig.add_trace(scatter_trace(x=plot_df[date_cols[0]], y=plot_df[col], mode='lines+markers', name=col), row=i, col=1)
                 fig.update_yaxes(title_text=col, row=i, col=1)
-            fig.update_layout(title_text="Time Series Plot", height=300*len(numeric_cols))
+            fig.update_layout(title_text=title_with_note("Time Series Plot", len(df), shown_rows),
+                              height=300*len(numeric_cols))
         elif len(numeric_cols) >= 2:
             # Scatter plot matrix
-            fig = px.scatter_matrix(df[numeric_cols], title="Scatter Matrix Plot")
+            plot_df = downsample_scatter(df, numeric_cols[0], numeric_cols[1])
+            fig = px.scatter_matrix(plot_df[numeric_cols], title=title_with_note("Scatter Matrix Plot", len(df), len(plot_df)))
         elif len(categorical_cols) > 0 and len(numeric_cols) > 0:
             # Bar chart
             fig = px.bar(df, x=categorical_cols[0], y=numeric_cols[0], title=f"Bar Chart: {numeric_cols[0]} by {categorical_cols[0]}")
@@ -34,7 +43,14 @@ def generate_chart(df, chart_recommendation):
         if chart_recommendation is None:
             chart_type = determine_chart_type(df)
         else:
-            chart_type = chart_recommendation.split('(')[0].strip().lower()
+            chart_type = chart_intent(chart_recommendation).chart_type
+
+        # Same result and chart spec as an earlier call: reuse the serialized figure
+        key = chart_key(__name__, df, chart_type)
+        cached = figure_cache.get(key)
+        if cached is not None:
+            st.plotly_chart(cached, use_container_width=True)
+            return
 
         x_column = df.columns[0]
         y_columns = df.columns[1:]
@@ -52,9 +68,10 @@ def generate_chart(df, chart_recommendation):
             fig.update_layout(xaxis_title=x_column, yaxis_title=y_columns[0])
 
         elif chart_type == 'line':
-            fig = px.line(df, x=x_column, y=y_columns,
-                          title=f"{', '.join(y_columns)} over {x_column}",
-                          template="plotly_white", markers=True)
+            plot_df = downsample_line(df, x_column, y_columns)
+            fig = px.line(plot_df, x=x_column, y=y_columns,
+                          title=title_with_note(f"{', '.join(y_columns)} over {x_column}", len(df), len(plot_df)),
+                          template="plotly_white", markers=True, render_mode=render_mode(len(plot_df)))
             fig.update_layout(xaxis_title=x_column, yaxis_title="Values")
 
         elif chart_type == 'pie':
@@ -63,9 +80,10 @@ def generate_chart(df, chart_recommendation):
                          template="plotly_white")
 
         elif chart_type == 'scatter':
-            fig = px.scatter(df, x=x_column, y=y_columns[0],
-                             title=f"{y_columns[0]} vs {x_column}",
-                             template="plotly_white")
+            plot_df = downsample_scatter(df, x_column, y_columns[0])
+            fig = px.scatter(plot_df, x=x_column, y=y_columns[0],
+                             title=title_with_note(f"{y_columns[0]} vs {x_column}", len(df), len(plot_df)),
+                             template="plotly_white", render_mode=render_mode(len(plot_df)))
             fig.update_layout(xaxis_title=x_column, yaxis_title=y_columns[0])
 
         elif chart_type == 'histogram':
@@ -79,6 +97,7 @@ def generate_chart(df, chart_recommendation):
 
         if fig:
             fig.update_layout(plot_bgcolor="rgba(0,0,0,0)")
+            figure_cache.put(key, fig)
             st.plotly_chart(fig, use_container_width=True)
         
     except Exception as e:
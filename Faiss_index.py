@@ -0,0 +1,127 @@
+import time
+import numpy as np
+import faiss
+
+# Below this many vectors a flat scan is already fast and approximate indexes can't train well
+MIN_VECTORS_FOR_ANN = 10000
+
+BACKENDS = ['flat', 'ivf_flat', 'ivf_pq', 'hnsw']
+
+
+def default_nlist(n_vectors):
+    """Roughly 4 * sqrt(n) lists, keeping at least 39 training points per centroid."""
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+
+
+def training_sample(embeddings, sample_size, seed=0):
+    if len(embeddings) <= sample_size:
+        return embeddings
+    rng = np.random.default_rng(seed)
+    return embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply query-time recall/latency knobs to an IVF or HNSW index (wrapped or not)."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if nprobe is not None and isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe
+    if ef_search is not None and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+    return index
+
+
+def create_faiss_index(embeddings, backend='flat', ids=None, nlist=None, pq_m=16, pq_bits=8,
+                       hnsw_m=32, ef_construction=200, nprobe=16, ef_search=64, train_sample=100000):
+    """Create a FAISS index for the given embeddings.
+
+    backend is one of 'flat' (exact), 'ivf_flat', 'ivf_pq' or 'hnsw'. Approximate
+    backends fall back to flat for small inputs. Pass ids to get an index that
+    supports add_with_ids/remove_ids.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n_vectors, dimension = embeddings.shape
+    if backend != 'flat' and n_vectors < MIN_VECTORS_FOR_ANN:
+        backend = 'flat'
+
+    if backend == 'flat':
+        index = faiss.IndexFlatL2(dimension)
+    elif backend == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    elif backend in ('ivf_flat', 'ivf_pq'):
+        quantizer = faiss.IndexFlatL2(dimension)
+        nlist = nlist or default_nlist(n_vectors)
+        if backend == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits)
+        index.train(training_sample(embeddings, train_sample))
+    else:
+        raise ValueError(f"Unknown FAISS index backend: {backend}")
+
+    # IVF indexes store ids natively; flat and HNSW need the IDMap wrapper
+    if ids is not None and not isinstance(index, faiss.IndexIVF):
+        index = faiss.IndexIDMap(index)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+
+    if ids is None:
+        index.add(embeddings)
+    else:
+        index.add_with_ids(embeddings, np.asarray(ids, dtype='int64'))
+    return index
+
+
+def synthetic_catalogue(n_values, dimension=384, n_clusters=2000, seed=0):
+    """Clustered, L2-normalized vectors that look more like sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype('float32')
+    embeddings = centers[rng.integers(0, n_clusters, n_values)]
+    embeddings += 0.15 * rng.standard_normal((n_values, dimension)).astype('float32')
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+
+def benchmark_backends(n_values=1000000, dimension=384, n_queries=1000, k=5, configs=None):
+    """Recall@k and per-query latency of each backend against the exact flat index."""
+    # Queries come from the same distribution as the catalogue, like real questions do
+    embeddings = synthetic_catalogue(n_values + n_queries, dimension)
+    embeddings, queries = embeddings[:n_values], embeddings[n_values:]
+
+    if configs is None:
+        configs = [
+            ('flat', {}),
+            ('ivf_flat', {'nprobe': 16}),
+            ('ivf_flat', {'nprobe': 64}),
+            ('ivf_pq', {'nprobe': 32, 'pq_m': 48}),
+            ('hnsw', {'ef_search': 64}),
+            ('hnsw', {'ef_search': 128}),
+        ]
+
+    exact = faiss.IndexFlatL2(dimension)
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for backend, params in configs:
+        start = time.perf_counter()
+        index = create_faiss_index(embeddings, backend=backend, **params)
+        build_seconds = time.perf_counter() - start
+
+        # One query at a time, the way answer_question searches
+        start = time.perf_counter()
+        found = np.vstack([index.search(queries[i:i + 1], k)[1] for i in range(n_queries)])
+        latency_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+        recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(n_queries)])
+        results.append({'backend': backend, 'params': params, 'build_seconds': build_seconds,
+                        'latency_ms': latency_ms, f'recall@{k}': recall})
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    n_values = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    for row in benchmark_backends(n_values):
+        print(f"{row['backend']:<9} {str(row['params']):<30} build {row['build_seconds']:7.1f}s  "
+              f"query {row['latency_ms']:6.2f}ms  recall@5 {row['recall@5']:.3f}")
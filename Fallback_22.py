@@ -3,21 +3,34 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 import pandas as pd
+from Column_profile import profile_dataframe
+from Figure_cache import chart_key, figure_cache
+from Chart import chart_intent
+from Downsample import downsample_line, downsample_scatter, title_with_note
+from Render_mode import scatter_trace
+
+def generate_chart(df, chart_recommendation=None, profile=None):
+    # Classify the columns once and share it between chart selection and fallbacks
+    if profile is None:
+        profile = profile_dataframe(df)
 
-def generate_chart(df, chart_recommendation=None):
     def fallback_chart(df):
-        date_cols = df.select_dtypes(include=['datetime64']).columns
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+        date_cols, numeric_cols, categorical_cols = analyze_df(df)
 
         if len(date_cols) > 0 and len(numeric_cols) > 0:
             fig = make_subplots(rows=len(numeric_cols), cols=1, shared_xaxes=True, vertical_spacing=0.05)
+            shown_rows = len(df)
             for i, col in enumerate(numeric_cols, 1):
-                fig.add_trace(go.Scatter(x=df[date_cols[0]], y=df[col], mode='lines+markers', name=col), row=i, col=1)
+                plot_df = downsample_line(df, date_cols[0], [col])
+                shown_rows = min(shown_rows, len(plot_df))
+                fig.add_trace(scatter_trace(x=plot_df[date_cols[0]], y=plot_df[col], mode='lines+markers', name=col), row=i, col=1)
                 fig.update_yaxes(title_text=col, row=i, col=1)
-            fig.update_layout(title_text="Time Series Plot", height=300*len(numeric_cols))
+            fig.update_layout(title_text=title_with_note("Time Series Plot", len(df), shown_rows),
+                              height=300*len(numeric_cols))
         elif len(numeric_cols) >= 2:
-            fig = px.scatter_matrix(df[numeric_cols], title="Scatter Matrix Plot")
+            # scatter_matrix draws a WebGL splom already; only the row count needs capping
+            plot_df = downsample_scatter(df, numeric_cols[0], numeric_cols[1])
+            fig = px.scatter_matrix(plot_df[numeric_cols], title=title_with_note("Scatter Matrix Plot", len(df), len(plot_df)))
         elif len(categorical_cols) > 0 and len(numeric_cols) > 0:
             fig = px.bar(df, x=categorical_cols[0], y=numeric_cols[0], title=f"Bar Chart: {numeric_cols[0]} by {categorical_cols[0]}")
         else:
@@ -28,11 +41,7 @@ def generate_chart(df, chart_recommendation=None):
         return fig
 
     def analyze_df(df):
-        date_cols = df.select_dtypes(include=['datetime64']).columns
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-
-        return date_cols, numeric_cols, categorical_cols
+        return profile.date_cols, profile.numeric_cols, profile.categorical_cols
 
     def determine_chart_type(df):
         date_cols, numeric_cols, categorical_cols = analyze_df(df)
@@ -70,7 +79,14 @@ def generate_chart(df, chart_recommendation=None):
         if chart_recommendation is None:
             chart_type = determine_chart_type(df)
         else:
-            chart_type = chart_recommendation.split('(')[0].strip().lower()
+            chart_type = chart_intent(chart_recommendation).chart_type
+
+        # Same result and chart spec as an earlier call: reuse the serialized figure
+        key = chart_key(__name__, df, chart_type)
+        cached = figure_cache.get(key)
+        if cached is not None:
+            st.plotly_chart(cached, use_container_width=True)
+            return
 
         trace_combinations = create_trace_combinations(date_cols, categorical_cols, numeric_cols, chart_type)
 
@@ -79,6 +95,7 @@ def generate_chart(df, chart_recommendation=None):
             fig = fallback_chart(df)
         else:
             fig = go.Figure()
+            shown_rows = len(df)
 
             for combination in trace_combinations:
                 if chart_type == 'grouped bar' and len(combination) == 3:
@@ -95,13 +112,17 @@ def generate_chart(df, chart_recommendation=None):
                     fig.add_trace(go.Bar(x=df[x_col], y=df[y_col], name=y_col, hoverinfo="x+y+name"))
                 elif chart_type == 'line' and len(combination) == 2:
                     x_col, y_col = combination
-                    fig.add_trace(go.Scatter(x=df[x_col], y=df[y_col], mode='lines+markers', name=y_col))
+                    plot_df = downsample_line(df, x_col, [y_col])
+                    shown_rows = min(shown_rows, len(plot_df))
+                    fig.add_trace(scatter_trace(x=plot_df[x_col], y=plot_df[y_col], mode='lines+markers', name=y_col))
                 elif chart_type == 'pie' and len(combination) == 2:
                     x_col, y_col = combination
                     fig.add_trace(go.Pie(labels=df[x_col], values=df[y_col], name=y_col))
                 elif chart_type == 'scatter' and len(combination) == 2:
                     x_col, y_col = combination
-                    fig.add_trace(go.Scatter(x=df[x_col], y=df[y_col], mode='markers', name=f"{x_col} vs {y_col}"))
+                    plot_df = downsample_scatter(df, x_col, y_col)
+                    shown_rows = min(shown_rows, len(plot_df))
+                    fig.add_trace(scatter_trace(x=plot_df[x_col], y=plot_df[y_col], mode='markers', name=f"{x_col} vs {y_col}"))
 
             # Final layout adjustment based on chart type
             if chart_type == 'grouped bar':
@@ -109,14 +130,15 @@ def generate_chart(df, chart_recommendation=None):
             elif chart_type == 'bar':
                 fig.update_layout(title="Bar Chart", xaxis_title="Categories", yaxis_title="Values")
             elif chart_type == 'line':
-                fig.update_layout(title="Line Chart", xaxis_title="Date", yaxis_title="Values")
+                fig.update_layout(title=title_with_note("Line Chart", len(df), shown_rows), xaxis_title="Date", yaxis_title="Values")
             elif chart_type == 'pie':
                 fig.update_layout(title="Pie Chart")
             elif chart_type == 'scatter':
-                fig.update_layout(title="Scatter Plot", xaxis_title=x_col, yaxis_title=y_col)
+                fig.update_layout(title=title_with_note("Scatter Plot", len(df), shown_rows), xaxis_title=x_col, yaxis_title=y_col)
 
         if fig:
             fig.update_layout(plot_bgcolor="rgba(0,0,0,0)")
+            figure_cache.put(key, fig)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("No chart could be generated. Displaying data in table format:")
@@ -1,25 +1,34 @@
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from Column_profile import profile_dataframe
+from Figure_cache import chart_key, figure_cache
+from Chart import chart_intent
+from Downsample import downsample_line, downsample_scatter, title_with_note
+from Render_mode import render_mode, scatter_trace
 import pandas as pd
 
 def generate_chart(df, chart_recommendation):
     def fallback_chart(df):
         # Determine column types
-        date_cols = df.select_dtypes(include=['datetime64']).columns
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+        profile = profile_dataframe(df)
+        date_cols, numeric_cols, categorical_cols = profile.date_cols, profile.numeric_cols, profile.categorical_cols
 
         if len(date_cols) > 0 and len(numeric_cols) > 0:
             # Time series plot
             fig = make_subplots(rows=len(numeric_cols), cols=1, shared_xaxes=True, vertical_spacing=0.05)
+            shown_rows = len(df)
             for i, col in enumerate(numeric_cols, 1):
-                fig.add_trace(go.Scatter(x=df[date_cols[0]], y=df[col], mode='lines+markers', name=col), row=i, col=1)
+                plot_df = downsample_line(df, date_cols[0], [col])
+                shown_rows = min(shown_rows, len(plot_df))
+                fig.add_trace(scatter_trace(x=plot_df[date_cols[0]], y=plot_df[col], mode='lines+markers', name=col), row=i, col=1)
                 fig.update_yaxes(title_text=col, row=i, col=1)
-            fig.update_layout(title_text="Time Series Plot", height=300*len(numeric_cols))
+            fig.update_layout(title_text=title_with_note("Time Series Plot", len(df), shown_rows),
+                              height=300*len(numeric_cols))
         elif len(numeric_cols) >= 2:
             # Scatter plot matrix
-            fig = px.scatter_matrix(df[numeric_cols], title="Scatter Matrix Plot")
+            plot_df = downsample_scatter(df, numeric_cols[0], numeric_cols[1])
+            fig = px.scatter_matrix(plot_df[numeric_cols], title=title_with_note("Scatter Matrix Plot", len(df), len(plot_df)))
         elif len(categorical_cols) > 0 and len(numeric_cols) > 0:
             # Bar chart
             fig = px.bar(df, x=categorical_cols[0], y=numeric_cols[0], title=f"Bar Chart: {numeric_cols[0]} by {categorical_cols[0]}")
@@ -35,10 +44,18 @@ def generate_chart(df, chart_recommendation):
         if chart_recommendation is None:
             chart_type = determine_chart_type(df)
         else:
-            chart_type = chart_recommendation.split('(')[0].strip().lower()
+            chart_type = chart_intent(chart_recommendation).chart_type
 
-        categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
+        # Same result and chart spec as an earlier call: reuse the serialized figure
+        key = chart_key(__name__, df, chart_type)
+        cached = figure_cache.get(key)
+        if cached is not None:
+            st.plotly_chart(cached, use_container_width=True)
+            return
+
+        profile = profile_dataframe(df)
+        categorical_cols = profile.categorical_cols
+        numeric_cols = profile.numeric_cols
 
         if chart_type in ['grouped bar', 'bar']:
             if len(categorical_cols) > 0 and len(numeric_cols) > 0:
@@ -75,9 +92,10 @@ def generate_chart(df, chart_recommendation):
                 else:
                     x_column = df.columns[0]
                 y_columns = numeric_cols
-                fig = px.line(df, x=x_column, y=y_columns,
-                              title=f"{', '.join(y_columns)} over {x_column}",
-                              template="plotly_white", markers=True)
+                plot_df = downsample_line(df, x_column, y_columns)
+                fig = px.line(plot_df, x=x_column, y=y_columns,
+                              title=title_with_note(f"{', '.join(y_columns)} over {x_column}", len(df), len(plot_df)),
+                              template="plotly_white", markers=True, render_mode=render_mode(len(plot_df)))
                 fig.update_layout(xaxis_title=x_column, yaxis_title="Values")
             else:
                 st.write("No numeric columns found for line chart. Falling back to alternative visualization.")
@@ -98,9 +116,10 @@ def generate_chart(df, chart_recommendation):
             if len(numeric_cols) >= 2:
                 x_column = numeric_cols[0]
                 y_column = numeric_cols[1]
-                fig = px.scatter(df, x=x_column, y=y_column,
-                                 title=f"{y_column} vs {x_column}",
-                                 template="plotly_white")
+                plot_df = downsample_scatter(df, x_column, y_column)
+                fig = px.scatter(plot_df, x=x_column, y=y_column,
+                                 title=title_with_note(f"{y_column} vs {x_column}", len(df), len(plot_df)),
+                                 template="plotly_white", render_mode=render_mode(len(plot_df)))
                 fig.update_layout(xaxis_title=x_column, yaxis_title=y_column)
             else:
                 st.write("Insufficient numeric columns for scatter plot. Falling back to alternative visualization.")
@@ -122,6 +141,7 @@ def generate_chart(df, chart_recommendation):
 
         if fig:
             fig.update_layout(plot_bgcolor="rgba(0,0,0,0)")
+            figure_cache.put(key, fig)
             st.plotly_chart(fig, use_container_width=True)
         
     except Exception as e:
@@ -167,7 +187,7 @@ elif chart_type == 'pie':
 elif chart_type == 'line':
     if len(numeric_cols) > 0:
         # Identify the date column (assuming there's only one date column)
-        date_cols = df.select_dtypes(include=['datetime', 'datetime64']).columns.tolist()
+        date_cols = profile_dataframe(df).date_cols
         
         if len(date_cols) > 0:
             x_column = date_cols[0]  # Use the date column for the x-axis
@@ -182,14 +202,16 @@ elif chart_type == 'line':
         y_columns = numeric_cols
         
         # Create a line chart with color differentiation based on the categorical column
+        plot_df = downsample_line(df, x_column, y_columns, group_col=category_column)
         if category_column:
-            fig = px.line(df, x=x_column, y=y_columns, color=category_column,
-                          title=f"{', '.join(y_columns)} over {x_column} grouped by {category_column}",
-                          template="plotly_white", markers=True)
+            fig = px.line(plot_df, x=x_column, y=y_columns, color=category_column,
+                          title=title_with_note(f"{', '.join(y_columns)} over {x_column} grouped by {category_column}",
+                                                len(df), len(plot_df)),
+                          template="plotly_white", markers=True, render_mode=render_mode(len(plot_df)))
         else:
-            fig = px.line(df, x=x_column, y=y_columns,
-                          title=f"{', '.join(y_columns)} over {x_column}",
-                          template="plotly_white", markers=True)
+            fig = px.line(plot_df, x=x_column, y=y_columns,
+                          title=title_with_note(f"{', '.join(y_columns)} over {x_column}", len(df), len(plot_df)),
+                          template="plotly_white", markers=True, render_mode=render_mode(len(plot_df)))
         
         # Customize layout and hover information
         fig.update_layout(
@@ -0,0 +1,213 @@
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_DB = "feedback.db"
+# Background writer wakes up at least this often, or as soon as a batch is full
+FLUSH_INTERVAL_SECONDS = 1.0
+FLUSH_BATCH_SIZE = 500
+# Events held in memory before new ones are dropped (and counted) rather than blocking a request
+MAX_PENDING_EVENTS = 100000
+# Compaction keeps raw events this long and rolls older ones up into daily_feedback
+RAW_RETENTION_DAYS = 30
+
+COLUMNS = ['timestamp', 'event', 'question', 'result', 'upvote', 'downvote', 'session_id']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback_events (
+    timestamp REAL NOT NULL,
+    event TEXT NOT NULL,
+    question TEXT,
+    result TEXT,
+    upvote INTEGER NOT NULL DEFAULT 0,
+    downvote INTEGER NOT NULL DEFAULT 0,
+    session_id TEXT
+);
+CREATE INDEX IF NOT EXISTS feedback_events_timestamp ON feedback_events (timestamp);
+CREATE TABLE IF NOT EXISTS daily_feedback (
+    day TEXT NOT NULL,
+    question TEXT,
+    questions INTEGER NOT NULL,
+    upvotes INTEGER NOT NULL,
+    downvotes INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (day, question)
+);
+"""
+
+
+def connect(db_path=FEEDBACK_DB):
+    """Connection in WAL mode, so readers never block the writer and several processes can append."""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class FeedbackSink:
+    """Records feedback events in memory and appends them to SQLite in batches from a background thread.
+
+    record() only builds a tuple and appends it to a deque, so the request path
+    pays microseconds; the file I/O happens in the writer thread.
+    """
+
+    def __init__(self, db_path=FEEDBACK_DB, flush_interval=FLUSH_INTERVAL_SECONDS,
+                 batch_size=FLUSH_BATCH_SIZE, max_pending=MAX_PENDING_EVENTS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.stats = {'recorded': 0, 'written': 0, 'dropped': 0, 'flushes': 0, 'errors': 0}
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._conn = connect(db_path)
+        self._worker = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def record(self, event, question='', result='', session_id=None, upvote=0, downvote=0):
+        if len(self._pending) >= self.max_pending:
+            self.stats['dropped'] += 1
+            return
+        self._pending.append((time.time(), event, question, result, upvote, downvote, session_id))
+        self.stats['recorded'] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every pending event in one transaction."""
+        with self._flush_lock:
+            batch = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+            if not batch:
+                return 0
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO feedback_events ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+                self.stats['written'] += len(batch)
+                self.stats['flushes'] += 1
+            except sqlite3.Error as e:
+                # Put the batch back so the next flush retries it
+                self._pending.extendleft(reversed(batch))
+                self.stats['errors'] += 1
+                logger.error(f"Error writing feedback events: {str(e)}")
+                return 0
+            return len(batch)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._worker.join(timeout=5)
+        self.flush()
+        self._conn.close()
+
+
+def read_feedback(db_path=FEEDBACK_DB, since=None, until=None, session_id=None):
+    """Raw feedback events as a DataFrame, optionally limited to a time range or one session."""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("timestamp >= ?")
+        params.append(pd.Timestamp(since).timestamp())
+    if until is not None:
+        clauses.append("timestamp < ?")
+        params.append(pd.Timestamp(until).timestamp())
+    if session_id is not None:
+        clauses.append("session_id = ?")
+        params.append(session_id)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = connect(db_path)
+    try:
+        df = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM feedback_events{where} ORDER BY timestamp",
+                               conn, params=params)
+    finally:
+        conn.close()
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+    return df
+
+
+def compact(db_path=FEEDBACK_DB, retention_days=RAW_RETENTION_DAYS, now=None):
+    """Roll raw events older than the retention window into daily_feedback and reclaim the space.
+
+    The cutoff is rounded down to a UTC midnight so every day is rolled up in
+    one compaction and its distinct session count is exact. Only events written
+    for a day that was already compacted are added to its row, and then
+    sessions is an upper bound.
+    """
+    cutoff = (now or time.time()) - retention_days * 86400
+    cutoff -= cutoff % 86400
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("""
+                INSERT INTO daily_feedback (day, question, questions, upvotes, downvotes, sessions)
+                SELECT date(timestamp, 'unixepoch') AS day, question,
+                       SUM(event = 'question'), SUM(upvote), SUM(downvote), COUNT(DISTINCT session_id)
+                FROM feedback_events WHERE timestamp < ?
+                GROUP BY day, question
+                ON CONFLICT (day, question) DO UPDATE SET
+                    questions = questions + excluded.questions,
+                    upvotes = upvotes + excluded.upvotes,
+                    downvotes = downvotes + excluded.downvotes,
+                    sessions = sessions + excluded.sessions
+            """, (cutoff,))
+            removed = conn.execute("DELETE FROM feedback_events WHERE timestamp < ?", (cutoff,)).rowcount
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if removed:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    logger.info(f"Compacted {removed} feedback events older than {datetime.fromtimestamp(cutoff):%Y-%m-%d}")
+    return removed
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    n_events = 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = FeedbackSink(os.path.join(tmp, "feedback.db"))
+        start = time.perf_counter()
+        for i in range(n_events):
+            sink.record('question', question=f"question {i % 100}", result="SELECT 1", session_id=str(i % 10))
+        record_us = (time.perf_counter() - start) * 1e6 / n_events
+        sink.close()
+        print(f"record(): {record_us:.2f} us per event, {sink.stats['written']:,} written "
+              f"in {sink.stats['flushes']} flushes")
+
+        # The per-event CSV append it replaces
+        csv_path = os.path.join(tmp, "feedback.csv")
+        n_csv = 2000
+        start = time.perf_counter()
+        for i in range(n_csv):
+            pd.DataFrame({'timestamp': [datetime.now()], 'question': [f"question {i}"], 'result': ["SELECT 1"],
+                          'upvote': [0], 'downvote': [0], 'session_id': ["0"]}).to_csv(
+                csv_path, mode='a', header=False, index=False)
+        print(f"append_to_csv: {(time.perf_counter() - start) * 1e6 / n_csv:.0f} us per event")
+
+        start = time.perf_counter()
+        events = read_feedback(os.path.join(tmp, "feedback.db"))
+        print(f"read_feedback: {len(events):,} events in {(time.perf_counter() - start) * 1000:.0f}ms")
+        removed = compact(os.path.join(tmp, "feedback.db"), retention_days=0, now=time.time() + 86400)
+        print(f"compact: rolled up {removed:,} events")
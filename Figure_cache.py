@@ -0,0 +1,97 @@
+import threading
+import logging
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from Chart import chart_intent
+from Column_profile import frame_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Total size of cached figure JSON kept in memory
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_chart_type(chart_type):
+    """'Bar (horizontal)', ' bar ' and None -> ('bar', ('horizontal',)), ('bar', ()), ('auto', ())."""
+    intent = chart_intent(chart_type) if chart_type else None
+    if intent is None or not intent.chart_type:
+        return 'auto', ()
+    return intent.chart_type, intent.modifiers
+
+
+def chart_key(namespace, df, chart_type, columns=None, extra=None):
+    """Cache key from the builder's namespace (its module name), the result's content hash and the chart spec.
+
+    Builders draw different figures for the same result and spec, so the
+    namespace keeps them from serving each other's figures.
+    """
+    columns = tuple(df.columns) if columns is None else tuple(columns)
+    return (namespace, frame_fingerprint(df), normalize_chart_type(chart_type), columns, extra)
+
+
+class FigureCache:
+    """LRU cache of serialized Plotly figures, bounded by total JSON size."""
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._entries = OrderedDict()  # key -> (figure JSON, meta)
+        self._lock = threading.Lock()
+
+    def get_entry(self, key):
+        """(figure, meta) stored under key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+        payload, meta = entry
+        return pio.from_json(payload), meta
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def put(self, key, fig, meta=None):
+        """Serialize and store fig with meta (whatever else the builder returned); returns the JSON size in bytes."""
+        payload = pio.to_json(fig, validate=False)
+        size = len(payload)
+        if size > self.max_bytes:
+            logger.info(f"Figure of {size / 1e6:.1f} MB is larger than the figure cache, not caching it")
+            return size
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= len(self._entries.pop(key)[0])
+            while self._entries and self.total_bytes + size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.stats['evictions'] += 1
+            self._entries[key] = (payload, meta)
+            self.total_bytes += size
+        return size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+# Shared by every generate_chart variant in this process
+figure_cache = FigureCache()
+
+
+def cached_figure(namespace, df, chart_type, build_fn, columns=None, extra=None, cache=None):
+    """Return the cached figure for this builder, result and chart spec, or build it with build_fn() and cache it."""
+    cache = figure_cache if cache is None else cache
+    key = chart_key(namespace, df, chart_type, columns, extra)
+    fig = cache.get(key)
+    if fig is None:
+        fig = build_fn()
+        if fig is not None:
+            cache.put(key, fig)
+    return fig
@@ -1,106 +1,209 @@
 import re
+from datetime import date
+from itertools import islice
 
-def contains_date_range(question):
-    # Patterns to match various date formats
-    date_patterns = [
-        r'\b(\d{1,2})[\/\-\s](\d{1,2})[\/\-\s](\d{2,4})\b',  # DD/MM/YYYY or similar
-        r'\b(\d{1,2})(?:st|nd|rd|th)?[ ]*(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)[ ]*(\d{4})?\b',  # 3rd March 2024 or 3 March
-        r'\b(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)[ ]*(\d{1,2})(?:st|nd|rd|th)?[ ]*(\d{4})?\b',  # March 3rd, 2024 or March 3
-        r'\b(\d{4})[\/\-](\d{1,2})[\/\-](\d{1,2})\b',  # YYYY-MM-DD or YYYY/MM/DD
-        r'\b(\d{4})(\d{2})(\d{2})\b',  # YYYYMMDD or similar
-        r'\b(\d{2})(\d{2})(\d{4})\b',  # DDMMYYYY or similar
-    ]
+MONTHS = {name: number for number, names in enumerate([
+    (), ('jan', 'january'), ('feb', 'february'), ('mar', 'march'), ('apr', 'april'), ('may',),
+    ('jun', 'june'), ('jul', 'july'), ('aug', 'august'), ('sep', 'sept', 'september'),
+    ('oct', 'october'), ('nov', 'november'), ('dec', 'december')]) for name in names}
+ORDINALS = {'st', 'nd', 'rd', 'th'}
+RANGE_STARTS = {'from', 'between'}
+RANGE_CONNECTORS = {'to', 'and', '-'}
+DATE_SEPARATORS = {'/', '.', '-'}
 
-    # Regex to match 'from date to date' or 'between date and date'
-    range_pattern = re.compile(
-        r'(from|between)\s+(' + '|'.join(date_patterns) + r')\s+(to|and)\s+(' + '|'.join(date_patterns) + r')',
-        re.IGNORECASE
-    )
-
-    if range_pattern.search(question):
-        return True
-    else:
-        return False
-
-# Test the utility
-questions = [
-    "Can you schedule a meeting from 3 March to 4 March 2024?",
-    "Please book the venue between 06/07/2024 and 10/07/2024.",
-    "I need the report from March 3 to March 4.",
-    "What are the available dates between 2024-08-15 and 2024-08-18?",
-    "We have meetings from 15082024 to 18082024.",
-    "Arrange the interview from June 15 to June 20, 2024.",
-    "Check availability between 15th July 2024 and 20th July 2024.",
-    "Is there any event between 20231205 and 20231208?",
-    "Let's block dates from 06-12-2024 to 10-12-2024.",
-    "Can you find the slot between 05122023 and 08122023?",
-    "Does this include dates from 3rd March to 4th March?",
-    "Is there anything between April 1 and April 2?",
-]
-
-for q in questions:
-    print(f"Question: '{q}' -> Contains date range: {contains_date_range(q)}")
+# Each alternative is a single character class with no nesting, so tokenizing is
+# one linear pass; whitespace of any length simply separates tokens. ASCII only:
+# characters like '²' or '①' count as digits for str.isdecimal() but not for int()
+TOKEN_PATTERN = re.compile(r'\d+|[^\W\d_]+|[/.\-,]', re.ASCII)
+RANGE_START_PATTERN = re.compile(r'\b(?:from|between)\b', re.IGNORECASE)
+# Longest range is two 'the <day> <ordinal> of <month> , <year>' dates around a connector
+MAX_RANGE_TOKENS = 16
 
 
+def _number(tokens, i, lengths):
+    if i < len(tokens) and tokens[i].isdecimal() and len(tokens[i]) in lengths:
+        return int(tokens[i]), i + 1
+    return None, i
 
-import re
 
-import re
+def _skip(tokens, i, words):
+    return i + 1 if i < len(tokens) and tokens[i] in words else i
 
-import re
 
-import re
+def _numeric_date(tokens, i):
+    """DD/MM/YYYY, YYYY-MM-DD, YYYYMMDD or DDMMYYYY (any separator or just spaces)."""
+    token = tokens[i]
+    if not token.isdecimal():
+        return None
+    if len(token) == 8:
+        if 1900 <= int(token[:4]) <= 2100:
+            return (int(token[:4]), int(token[4:6]), int(token[6:])), i + 1, False
+        return (int(token[4:]), int(token[2:4]), int(token[:2])), i + 1, True
+    if len(token) == 4:
+        year = int(token)
+        month, j = _number(tokens, _skip(tokens, i + 1, DATE_SEPARATORS), (1, 2))
+        day, j = _number(tokens, _skip(tokens, j, DATE_SEPARATORS), (1, 2))
+        if month is None or day is None:
+            return None
+        return (year, month, day), j, False
+    if len(token) <= 2:
+        day = int(token)
+        j = _skip(tokens, _skip(tokens, i + 1, ORDINALS), DATE_SEPARATORS)
+        month, j = _number(tokens, j, (1, 2))
+        if month is None:
+            return None
+        j = _skip(tokens, _skip(tokens, j, ORDINALS), DATE_SEPARATORS)
+        year, j = _number(tokens, j, (2, 4))
+        if year is None:
+            return None
+        return (year + 2000 if year < 100 else year, month, day), j, True
+    return None
+
+
+def _day_month(tokens, i):
+    """3 March, 3rd of March 2024, 3 Mar, 2024."""
+    day, j = _number(tokens, i, (1, 2))
+    if day is None:
+        return None
+    j = _skip(tokens, _skip(tokens, j, ORDINALS), {'of'})
+    if j >= len(tokens) or tokens[j] not in MONTHS:
+        return None
+    month = MONTHS[tokens[j]]
+    year, j = _number(tokens, _skip(tokens, j + 1, {','}), (4,))
+    return (year, month, day), j, False
+
+
+def _month_day(tokens, i):
+    """March 3, March 3rd, 2024."""
+    if tokens[i] not in MONTHS:
+        return None
+    month = MONTHS[tokens[i]]
+    day, j = _number(tokens, i + 1, (1, 2))
+    if day is None:
+        return None
+    year, j = _number(tokens, _skip(tokens, _skip(tokens, j, ORDINALS), {','}), (4,))
+    return (year, month, day), j, False
+
+
+def _parse_date(tokens, i):
+    """(year or None, month, day), next position and whether day/month may be swapped, or None.
+
+    Looks at a bounded number of tokens, which is what keeps the scan linear.
+    """
+    if i >= len(tokens):
+        return None
+    return _numeric_date(tokens, i) or _day_month(tokens, i) or _month_day(tokens, i)
+
+
+def _to_date(year, month, day, swappable):
+    for m, d in ((month, day), (day, month)) if swappable else ((month, day),):
+        try:
+            return date(year, m, d)
+        except ValueError:
+            continue
+    return None
+
+
+def find_date_range(question, default_year=None):
+    """(start, end) dates for the first 'from X to Y' / 'between X and Y' in the question, or None.
+
+    A missing year is taken from the other date, then default_year, then the current year.
+    """
+    question = question.lower()
+    for keyword in RANGE_START_PATTERN.finditer(question):
+        # Only a bounded window after each keyword is tokenized, so the whole scan stays linear
+        tokens = list(map(re.Match.group, islice(TOKEN_PATTERN.finditer(question, keyword.end()), MAX_RANGE_TOKENS)))
+        start = _parse_date(tokens, _skip(tokens, 0, {'the'}))
+        if start is None:
+            continue
+        j = start[1]
+        if j >= len(tokens) or tokens[j] not in RANGE_CONNECTORS:
+            continue
+        end = _parse_date(tokens, _skip(tokens, j + 1, {'the'}))
+        if end is None:
+            continue
+        (start_year, start_month, start_day), _, start_swappable = start
+        (end_year, end_month, end_day), _, end_swappable = end
+        end_year = end_year or start_year or default_year or date.today().year
+        start_year = start_year or end_year
+        start_date = _to_date(start_year, start_month, start_day, start_swappable)
+        end_date = _to_date(end_year, end_month, end_day, end_swappable)
+        if start_date is not None and end_date is not None:
+            return start_date, end_date
+    return None
+
 
 def contains_date_range(question):
-    # Patterns to match various date formats with flexible spacing
-    date_patterns = [
-        r'\b(\d{1,2})\s*(?:st|nd|rd|th)?\s*[\/\.\-\s]\s*(\d{1,2})\s*(?:st|nd|rd|th)?\s*[\/\.\-\s]\s*(\d{2,4})\b',  # DD/MM/YYYY or similar
-        r'\b(\d{1,2})\s*(?:st|nd|rd|th)?\s*(?:of)?\s*(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s*(?:,?\s*(\d{4}))?\b',  # 3rd March 2024 or 3 March
-        r'\b(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s*(\d{1,2})\s*(?:st|nd|rd|th)?\s*(?:,?\s*(\d{4}))?\b',  # March 3rd, 2024 or March 3
-        r'\b(\d{4})\s*[\/\.\-\s]\s*(\d{1,2})\s*[\/\.\-\s]\s*(\d{1,2})\b',  # YYYY-MM-DD or YYYY/MM/DD
-        r'\b(\d{4})\s*(\d{2})\s*(\d{2})\b',  # YYYYMMDD or similar
-        r'\b(\d{2})\s*(\d{2})\s*(\d{4})\b',  # DDMMYYYY or similar
+    return find_date_range(question) is not None
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    # Test the utility
+    questions = [
+        "Can you schedule a meeting from 3 March to 4 March 2024?",
+        "Please book the venue between 06/07/2024 and 10/07/2024.",
+        "I need the report from March 3 to March 4.",
+        "What are the available dates between 2024-08-15 and 2024-08-18?",
+        "We have meetings from 15082024 to 18082024.",
+        "Arrange the interview from June 15 to June 20, 2024.",
+        "Check availability between 15th July 2024 and 20th July 2024.",
+        "Is there any event between 20231205 and 20231208?",
+        "Let's block dates from 06-12-2024 to 10-12-2024.",
+        "Can you find the slot between 05122023 and 08122023?",
+        "Does this include dates from 3rd March to 4th March?",
+        "Is there anything between April 1 and April 2?",
+        "Can you schedule a meeting from   3 March    to     4 March 2024?",  # Extra spaces
+        "Please book the venue between 06/07/2024    and    10/07/2024.",     # Extra spaces
+        "Let's block dates from 06-12-2024  -  10-12-2024.",                  # Dash separator with spaces
+        "From 4th June to 5 th June 2024",                                    # Spaces in ordinal
+        "Between the 1st of May and the 3rd of June",                         # 'of' in date
+        "From 2023.06.01 to 2023.06.30",                                      # Dot as separator
+        "Between 1 Jan and 31 Dec 2024",                                      # Short month names without year in first date
+        "From 4 th   June to 5  th    June 2024",                             # Very weird spacing
+        "Between 15    08    2024 and 18   08   2024",                        # Spaces between date components
+        "From 2023  -  06  -  01 to 2023  -  06  -  30",                      # Spaces around separators
     ]
-    
-    # Join the patterns with more flexible spacing
-    date_pattern = '|'.join(f'(?:{pattern})' for pattern in date_patterns)
-    
-    # Regex to match 'from date to date' or 'between date and date' with very flexible spacing
-    range_pattern = re.compile(
-        r'(from|between)\s*(' + date_pattern + r')\s*(?:to|and|-)\s*(' + date_pattern + r')',
-        re.IGNORECASE | re.VERBOSE
-    )
-    
-    if range_pattern.search(question):
-        return True
-    else:
-        return False
-
-# Test the utility
-questions = [
-    "Can you schedule a meeting from 3 March to 4 March 2024?",
-    "Please book the venue between 06/07/2024 and 10/07/2024.",
-    "I need the report from March 3 to March 4.",
-    "What are the available dates between 2024-08-15 and 2024-08-18?",
-    "We have meetings from 15082024 to 18082024.",
-    "Arrange the interview from June 15 to June 20, 2024.",
-    "Check availability between 15th July 2024 and 20th July 2024.",
-    "Is there any event between 20231205 and 20231208?",
-    "Let's block dates from 06-12-2024 to 10-12-2024.",
-    "Can you find the slot between 05122023 and 08122023?",
-    "Does this include dates from 3rd March to 4th March?",
-    "Is there anything between April 1 and April 2?",
-    "Can you schedule a meeting from   3 March    to     4 March 2024?",  # Extra spaces
-    "Please book the venue between 06/07/2024    and    10/07/2024.",     # Extra spaces
-    "Let's block dates from 06-12-2024  -  10-12-2024.",                  # Dash separator with spaces
-    "From 4th June to 5 th June 2024",                                    # Spaces in ordinal
-    "Between the 1st of May and the 3rd of June",                         # 'of' in date
-    "From 2023.06.01 to 2023.06.30",                                      # Dot as separator
-    "Between 1 Jan and 31 Dec 2024",                                      # Short month names without year in first date
-    "From 4 th   June to 5  th    June 2024",                             # Very weird spacing
-    "Between 15    08    2024 and 18   08   2024",                        # Spaces between date components
-    "From 2023  -  06  -  01 to 2023  -  06  -  30",                      # Spaces around separators
-]
-
-for q in questions:
-    print(f"Question: '{q}' -> Contains date range: {contains_date_range(q)}")
+
+    for q in questions:
+        print(f"Question: '{q}' -> Contains date range: {contains_date_range(q)} {find_date_range(q) or ''}")
+
+    # The previous per-call regex, kept here only to compare against
+    month = r'(Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)'
+    legacy_patterns = [
+        r'\b(\d{1,2})\s*(?:st|nd|rd|th)?\s*[\/\.\-\s]\s*(\d{1,2})\s*(?:st|nd|rd|th)?\s*[\/\.\-\s]\s*(\d{2,4})\b',
+        r'\b(\d{1,2})\s*(?:st|nd|rd|th)?\s*(?:of)?\s*' + month + r'\s*(?:,?\s*(\d{4}))?\b',
+        r'\b' + month + r'\s*(\d{1,2})\s*(?:st|nd|rd|th)?\s*(?:,?\s*(\d{4}))?\b',
+        r'\b(\d{4})\s*[\/\.\-\s]\s*(\d{1,2})\s*[\/\.\-\s]\s*(\d{1,2})\b',
+        r'\b(\d{4})\s*(\d{2})\s*(\d{2})\b',
+        r'\b(\d{2})\s*(\d{2})\s*(\d{4})\b',
+    ]
+    legacy_date = '|'.join(f'(?:{pattern})' for pattern in legacy_patterns)
+
+    def legacy_contains_date_range(question):
+        return bool(re.compile(r'(from|between)\s*(' + legacy_date + r')\s*(?:to|and|-)\s*(' + legacy_date + r')',
+                               re.IGNORECASE | re.VERBOSE).search(question))
+
+    rng = random.Random(0)
+    filler = ["Show total sales by region for the last quarter", "Which providers had the most rules?",
+              "List the top 10 customers by revenue", "How many orders were shipped late?"]
+    corpus = [rng.choice(questions + filler) for _ in range(100000)]
+
+    for name, detector in [("legacy regex", legacy_contains_date_range), ("token scanner", contains_date_range)]:
+        start = time.perf_counter()
+        found = sum(detector(q) for q in corpus)
+        print(f"{name:<14} {len(corpus):,} questions in {time.perf_counter() - start:.2f}s ({found:,} ranges)")
+
+    # A digit followed by a long run of spaces makes the nested \s* groups backtrack cubically
+    print("\nAdversarial 'from 1' + spaces:")
+    for n_spaces in [100, 200, 400, 100000, 1000000]:
+        adversarial = "from 1" + " " * n_spaces + "x"
+        detectors = [("token scanner", contains_date_range)]
+        if n_spaces <= 400:
+            detectors.insert(0, ("legacy regex", legacy_contains_date_range))
+        for name, detector in detectors:
+            start = time.perf_counter()
+            detector(adversarial)
+            print(f"{name:<14} {n_spaces:>9,} spaces: {(time.perf_counter() - start) * 1000:9.1f}ms")
@@ -3,15 +3,14 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import re
+from Column_profile import profile_dataframe
+from Downsample import downsample_line, downsample_scatter, title_with_note
+from Render_mode import render_mode
+from Figure_cache import chart_key, figure_cache
+from Chart import chart_intent
 
 def analyze_dataframe(df):
-    return {
-        'date_cols': df.select_dtypes(include=['datetime64']).columns.tolist(),
-        'numeric_cols': df.select_dtypes(include=['int64', 'float64']).columns.tolist(),
-        'categorical_cols': df.select_dtypes(include=['object', 'category']).columns.tolist(),
-        'total_cols': len(df.columns),
-        'total_rows': len(df)
-    }
+    return profile_dataframe(df)
 
 def analyze_sql_query(sql_query):
     sql_lower = sql_query.lower()
@@ -22,33 +21,33 @@ def analyze_sql_query(sql_query):
         'order_by': 'order by' in sql_lower
     }
 
-def generate_chart(df, sql_query, chart_recommendation=None):
-    df_analysis = analyze_dataframe(df)
+def generate_chart(df, sql_query, chart_recommendation=None, profile=None):
+    df_analysis = profile if profile is not None else analyze_dataframe(df)
     sql_analysis = analyze_sql_query(sql_query)
 
     def create_pie_chart(df, analysis):
-        if len(analysis['numeric_cols']) == 1 and len(analysis['categorical_cols']) == 1:
-            return px.pie(df, values=analysis['numeric_cols'][0], names=analysis['categorical_cols'][0],
-                          title=f"Distribution of {analysis['numeric_cols'][0]}")
-        elif len(analysis['numeric_cols']) >= 2 and analysis['total_rows'] == 1:
-            return go.Figure(data=[go.Pie(labels=analysis['numeric_cols'], values=df.iloc[0][analysis['numeric_cols']])],
+        if len(analysis.numeric_cols) == 1 and len(analysis.categorical_cols) == 1:
+            return px.pie(df, values=analysis.numeric_cols[0], names=analysis.categorical_cols[0],
+                          title=f"Distribution of {analysis.numeric_cols[0]}")
+        elif len(analysis.numeric_cols) >= 2 and analysis.total_rows == 1:
+            return go.Figure(data=[go.Pie(labels=analysis.numeric_cols, values=df.iloc[0][analysis.numeric_cols])],
                              layout=dict(title="Distribution of Values"))
         return None
 
     def create_bar_chart(df, analysis, sql_analysis):
-        if len(analysis['categorical_cols']) >= 1 and len(analysis['numeric_cols']) >= 1:
-            x = analysis['categorical_cols'][0]
-            y = analysis['numeric_cols']
-            if len(analysis['categorical_cols']) == 1:
+        if len(analysis.categorical_cols) >= 1 and len(analysis.numeric_cols) >= 1:
+            x = analysis.categorical_cols[0]
+            y = analysis.numeric_cols
+            if len(analysis.categorical_cols) == 1:
                 return px.bar(df, x=x, y=y, title=f"{', '.join(y)} by {x}", 
                               barmode='group' if len(y) > 1 else None)
-            elif len(analysis['categorical_cols']) == 2:
-                color = analysis['categorical_cols'][1]
+            elif len(analysis.categorical_cols) == 2:
+                color = analysis.categorical_cols[1]
                 return px.bar(df, x=x, y=y[0], color=color, 
                               title=f"{y[0]} by {x} and {color}", barmode='group')
             else:  # 3 or more categorical columns
-                color = analysis['categorical_cols'][1]
-                facet_col = analysis['categorical_cols'][2]
+                color = analysis.categorical_cols[1]
+                facet_col = analysis.categorical_cols[2]
                 fig = px.bar(df, x=x, y=y[0], color=color, facet_col=facet_col,
                              title=f"{y[0]} by {x}, {color}, and {facet_col}", barmode='group')
                 for annotation in fig.layout.annotations:
@@ -57,43 +56,48 @@ def generate_chart(df, sql_query, chart_recommendation=None):
         return None
 
     def create_line_chart(df, analysis):
-        if len(analysis['date_cols']) == 1 and len(analysis['numeric_cols']) >= 1:
-            return px.line(df, x=analysis['date_cols'][0], y=analysis['numeric_cols'], markers=True,
-                           title=f"Trend of {', '.join(analysis['numeric_cols'])}")
-        elif len(analysis['numeric_cols']) >= 2:
-            return px.line(df, x=analysis['numeric_cols'][0], y=analysis['numeric_cols'][1:], markers=True,
-                           title=f"Trend of {', '.join(analysis['numeric_cols'][1:])}")
+        if len(analysis.date_cols) == 1 and len(analysis.numeric_cols) >= 1:
+            plot_df = downsample_line(df, analysis.date_cols[0], analysis.numeric_cols)
+            return px.line(plot_df, x=analysis.date_cols[0], y=analysis.numeric_cols, markers=True,
+                           render_mode=render_mode(len(plot_df)),
+                           title=title_with_note(f"Trend of {', '.join(analysis.numeric_cols)}", len(df), len(plot_df)))
+        elif len(analysis.numeric_cols) >= 2:
+            plot_df = downsample_line(df, analysis.numeric_cols[0], analysis.numeric_cols[1:])
+            return px.line(plot_df, x=analysis.numeric_cols[0], y=analysis.numeric_cols[1:], markers=True,
+                           render_mode=render_mode(len(plot_df)),
+                           title=title_with_note(f"Trend of {', '.join(analysis.numeric_cols[1:])}", len(df), len(plot_df)))
         return None
 
     def create_scatter_chart(df, analysis):
-        if len(analysis['numeric_cols']) >= 2:
-            x, y = analysis['numeric_cols'][:2]
-            color = analysis['categorical_cols'][0] if analysis['categorical_cols'] else None
-            size = analysis['numeric_cols'][2] if len(analysis['numeric_cols']) > 2 else None
-            return px.scatter(df, x=x, y=y, color=color, size=size,
-                              title=f"{y} vs {x}")
+        if len(analysis.numeric_cols) >= 2:
+            x, y = analysis.numeric_cols[:2]
+            color = analysis.categorical_cols[0] if analysis.categorical_cols else None
+            size = analysis.numeric_cols[2] if len(analysis.numeric_cols) > 2 else None
+            plot_df = downsample_scatter(df, x, y)
+            return px.scatter(plot_df, x=x, y=y, color=color, size=size, render_mode=render_mode(len(plot_df)),
+                              title=title_with_note(f"{y} vs {x}", len(df), len(plot_df)))
         return None
 
     def create_heatmap(df, analysis):
-        if len(analysis['numeric_cols']) == 1 and len(analysis['categorical_cols']) >= 2:
-            pivot = df.pivot(index=analysis['categorical_cols'][0], columns=analysis['categorical_cols'][1], 
-                             values=analysis['numeric_cols'][0])
-            return px.imshow(pivot, title=f"Heatmap of {analysis['numeric_cols'][0]}")
-        elif len(analysis['numeric_cols']) >= 3:
-            corr = df[analysis['numeric_cols']].corr()
+        if len(analysis.numeric_cols) == 1 and len(analysis.categorical_cols) >= 2:
+            pivot = df.pivot(index=analysis.categorical_cols[0], columns=analysis.categorical_cols[1], 
+                             values=analysis.numeric_cols[0])
+            return px.imshow(pivot, title=f"Heatmap of {analysis.numeric_cols[0]}")
+        elif len(analysis.numeric_cols) >= 3:
+            corr = df[analysis.numeric_cols].corr()
             return px.imshow(corr, title="Correlation Heatmap")
         return None
 
     def create_box_plot(df, analysis):
-        if len(analysis['categorical_cols']) >= 1 and len(analysis['numeric_cols']) >= 1:
-            return px.box(df, x=analysis['categorical_cols'][0], y=analysis['numeric_cols'][0],
-                          title=f"Distribution of {analysis['numeric_cols'][0]} by {analysis['categorical_cols'][0]}")
+        if len(analysis.categorical_cols) >= 1 and len(analysis.numeric_cols) >= 1:
+            return px.box(df, x=analysis.categorical_cols[0], y=analysis.numeric_cols[0],
+                          title=f"Distribution of {analysis.numeric_cols[0]} by {analysis.categorical_cols[0]}")
         return None
 
     def create_histogram(df, analysis):
-        if len(analysis['numeric_cols']) >= 1:
-            return px.histogram(df, x=analysis['numeric_cols'][0], 
-                                title=f"Distribution of {analysis['numeric_cols'][0]}")
+        if len(analysis.numeric_cols) >= 1:
+            return px.histogram(df, x=analysis.numeric_cols[0], 
+                                title=f"Distribution of {analysis.numeric_cols[0]}")
         return None
 
     chart_functions = {
@@ -106,13 +110,18 @@ def generate_chart(df, sql_query, chart_recommendation=None):
         'histogram': create_histogram
     }
 
-    fig = None
+    # The bar builder also looks at the SQL, so it is part of the cache key
+    key = chart_key(__name__, df, chart_recommendation, extra=' '.join(sql_query.lower().split()))
+    cached = figure_cache.get_entry(key)
+    if cached is not None:
+        # Figures are cached with the error flag of the build that made them
+        return cached
     error_flag = False
 
     # Try recommended chart first
     if chart_recommendation:
         try:
-            chart_type = chart_recommendation.lower()
+            chart_type = chart_intent(chart_recommendation).chart_type
             if chart_type in chart_functions:
                 if chart_type == 'bar':
                     fig = chart_functions[chart_type](df, df_analysis, sql_analysis)
@@ -139,6 +148,7 @@ def generate_chart(df, sql_query, chart_recommendation=None):
     # Update layout if figure was created
     if fig:
         fig.update_layout(plot_bgcolor="rgba(0,0,0,0)")
+        figure_cache.put(key, fig, meta=error_flag)
     
     return fig, error_flag
 
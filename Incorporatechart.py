@@ -1,6 +1,37 @@
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from Sql_cache import SqlCache, cached_generate_sql
+from Prompt_cache import schema_hash
+from Autocomplete import load_model as load_embedding_model
+from Chat_history import init_chat_history, render_chat_history
+from Query_engine import create_backend
+from Result_cache import ResultCache, cached_execute
+
+
+# Shared question -> SQL cache so repeated and sample questions skip the 8B model
+@st.cache_resource
+def load_sql_cache():
+    return SqlCache(load_embedding_model(), max_entries=1000, ttl_seconds=3600, max_distance=0.1)
+
+
+def get_sql_cache():
+    sql_cache = load_sql_cache()
+    # Cached SQL is only valid for the tables and columns it was generated against
+    sql_cache.set_schema_hash(schema_hash(load_query_backend().schema_text()))
+    return sql_cache
+
+
+# Local DuckDB/SQLite engine over the Parquet/CSV files in Query_engine.DATA_DIR
+@st.cache_resource
+def load_query_backend():
+    return create_backend()
+
+
+# Repeated and sample questions produce the same SQL; serve those results without re-running them
+@st.cache_resource
+def load_result_cache():
+    return ResultCache()
 
 
 # Add this after bot_response_2_placeholder.dataframe(result_df)
@@ -8,8 +39,8 @@ chart_placeholder = st.empty()
 
 # Modify the execute_query function to return both the dataframe and a chart recommendation
 def execute_query(sql):
-    # This is a mock implementation. Replace with actual query execution.
-    df = pd.DataFrame({'Column1': ['Data1', 'Data2'], 'Column2': [1, 2]})
+    df, source, seconds = cached_execute(load_result_cache(), load_query_backend(), sql)
+    logging.info(f"Query served from {source} in {seconds * 1000:.0f}ms")
     chart_recommendation = "bar"  # This should be determined by your SQL generation logic
     return df, chart_recommendation
 
@@ -34,22 +65,14 @@ except Exception as e:
 
 
 def add_to_chat_history(question, sql_query, result, chart):
-    st.session_state['chat_history'].append({
-        'question': question,
-        'sql_query': sql_query,
-        'result': result,
-        'chart': chart
-    })
+    # Result and chart go to disk; only a preview and metadata stay in the session
+    st.session_state['chat_history'].add(question, sql_query, result, chart)
 
 
-for entry in st.session_state['chat_history']:
-    with st.chat_message(name="user", avatar="user"):
-        st.markdown(entry['question'])
-    with st.chat_message(name="assistant", avatar="assistant"):
-        st.code(entry['sql_query'], language="sql")
-        st.dataframe(entry['result'])
-        if entry['chart'] is not None:
-            st.plotly_chart(entry['chart'], use_container_width=True)
+# session_id comes from the app's init_app (not part of this snippet); old sessions' history
+# directories are pruned when this one is created
+init_chat_history()
+render_chat_history(st.session_state['chat_history'])
 
 
 
@@ -58,7 +81,7 @@ if st.button("🚀 Generate SQL", key="generate_sql", use_container_width=True):
         user_input_placeholder.markdown(user_input)
         try:
             with st.spinner("Generating SQL..."):
-                sql_response = generate_sql(user_input)
+                sql_response = cached_generate_sql(get_sql_cache(), user_input, generate_sql)
             bot_response_1_placeholder.code(sql_response, language="sql")
             result_df, chart_recommendation = execute_query(sql_response)
             bot_response_2_placeholder.dataframe(result_df)
@@ -84,7 +107,7 @@ if st.button(f"Ask", use_container_width=True, key=f'question{i}'):
     user_input_placeholder.markdown(question)
     try:
         with st.spinner("Generating SQL..."):
-            sql_response = generate_sql(question)
+            sql_response = cached_generate_sql(get_sql_cache(), question, generate_sql)
         bot_response_1_placeholder.code(sql_response, language="sql")
         result_df, chart_recommendation = execute_query(sql_response)
         bot_response_2_placeholder.dataframe(result_df)
@@ -108,8 +131,8 @@ if st.button(f"Ask", use_container_width=True, key=f'question{i}'):
 
 
 def execute_query(sql):
-    # This is a mock implementation. Replace with actual query execution.
-    df = pd.DataFrame({'Column1': ['Data1', 'Data2'], 'Column2': [1, 2]})
+    df, source, seconds = cached_execute(load_result_cache(), load_query_backend(), sql)
+    logging.info(f"Query served from {source} in {seconds * 1000:.0f}ms")
     chart_recommendation = determine_chart_type(df)
     return df, chart_recommendation
 
@@ -1,20 +1,27 @@
 import streamlit as st
-import ctranslate2
-import transformers
-from huggingface_hub import snapshot_download
+from Prompt_cache import schema_hash
+from Sql_cache import SqlCache
+from Model_server import ModelClient, ModelServerError, InProcessModel
+from Token_count import PromptTooLongError
+
+# Generate through the shared model server (python Model_server.py) instead of loading the model here
+USE_MODEL_SERVER = True
+
+# Nothing here blocks the first render: the client connects lazily, an in-process model loads in the background
+@st.cache_resource
+def load_llm():
+    return ModelClient() if USE_MODEL_SERVER else InProcessModel()
 
 @st.cache_resource
-def load_model_and_tokenizer():
-    model_id = "ByteForge/Defog_llama-3-sqlcoder-8b-ct2-int8_float16"
-    model_path = snapshot_download(model_id)
-    model = ctranslate2.Generator(model_path)
-    tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
-    return model, tokenizer
+def load_sql_cache():
+    # Autocomplete loads sentence-transformers when imported, so only import it once the cache is needed
+    from Autocomplete import load_model as load_embedding_model
+    return SqlCache(load_embedding_model(), max_entries=1000, ttl_seconds=3600, max_distance=0.1)
 
-model, tokenizer = load_model_and_tokenizer()
+llm = load_llm()
 
-# Define the prompt
-prompt = """
+# Static schema part of the prompt; only the question changes between calls
+schema_ddl = """
 CREATE TABLE stadium (
     stadium_id number,
     location text,
@@ -44,33 +51,67 @@ CREATE TABLE singer_in_concert (
     concert_id number,
     singer_id text
 )
--- Using valid SQLite, answer the following questions for the tables provided above.
--- What is the maximum, the average, and the minimum capacity of stadiums ? (Generate 1 Sql query. No explaination needed)
-answer:
 """
+question = "What is the maximum, the average, and the minimum capacity of stadiums ?"
+
+def get_sql_cache():
+    sql_cache = load_sql_cache()
+    # Cached SQL is only valid for the schema it was generated against
+    sql_cache.set_schema_hash(schema_hash(schema_ddl))
+    return sql_cache
 
-def generate_sql_query(prompt):
-    messages = [
-        {"role": "system", "content": "You are SQL Expert. Given a input question and schema, answer with correct sql query"},
-        {"role": "user", "content": prompt},
-    ]
-    input_ids = tokenizer.apply_chat_template(
-        messages, 
-        tokenize=False, 
-        add_generation_prompt=True
-    )
-    terminators = [
-        tokenizer.eos_token_id,
-        tokenizer.convert_tokens_to_ids("<|eot_id|>")
-    ]
-    input_tokens = tokenizer.convert_ids_to_tokens(tokenizer.encode(input_ids))
-    results = model.generate_batch([input_tokens], include_prompt_in_result=False, max_length=256, sampling_temperature=0.6, sampling_topp=0.9, end_token=terminators)
-    output = tokenizer.decode(results[0].sequences_ids[0])
-    return output
+# Upper bound for the answer; the model side lowers it to what the context window has left
+SQL_MAX_LENGTH = 256
+
+# The schema goes over as text; the model side trims it to the context window if needed, keeps it as
+# a cached static prompt and stops at the Llama 3 chat terminators (eos and <|eot_id|>)
+def generate_sql_query(question, stats=None):
+    return llm.generate(schema_ddl=schema_ddl, question=question, chat_terminators=True, stats=stats,
+                        max_length=SQL_MAX_LENGTH, sampling_temperature=0.6, sampling_topp=0.9)
+
+def generate_sql_query_stream(question, stats=None):
+    """Yield the SQL as it is decoded, stopping once the ```sql block is closed."""
+    yield from llm.stream(schema_ddl=schema_ddl, question=question, stop='sql_block', chat_terminators=True,
+                          stats=stats, max_length=SQL_MAX_LENGTH, sampling_temperature=0.6, sampling_topp=0.9)
 
 # Streamlit app
 st.title("SQL Query Generator")
 
+if llm.status == 'failed':
+    st.error("Failed to load model. Please check the logs for details.")
+    load_llm.clear()
+elif llm.status == 'unreachable':
+    st.warning(f"The model server isn't running at {llm.address}. Start it with `python Model_server.py`.")
+elif not llm.ready:
+    st.info(f"Model warming up ({llm.status})...")
+
 if st.button("Generate SQL Query"):
-    sql_query = generate_sql_query(prompt)
-    st.code(sql_query, language='sql')
+    sql_cache = get_sql_cache()
+    sql_placeholder = st.empty()
+    sql_query = sql_cache.get(question)
+    if sql_query is not None:
+        sql_placeholder.code(sql_query, language='sql')
+    else:
+        sql_query = ""
+        with st.spinner("Waiting for the model to finish loading..."):
+            model_ready = llm.ready or llm.wait()
+        if not model_ready:
+            st.error("The model is not available. Please check the logs for details.")
+            st.stop()
+        stats = {}
+        try:
+            for chunk in generate_sql_query_stream(question, stats):
+                sql_query += chunk
+                sql_placeholder.code(sql_query, language='sql')
+        except (ModelServerError, PromptTooLongError) as e:
+            # e.g. a question too long for the context window
+            st.error(f"Failed to generate the SQL query: {str(e)}")
+            st.stop()
+        sql_cache.put(question, sql_query)
+        if stats.get('dropped_tables'):
+            st.warning(f"The schema didn't fit the model's context window; {stats['dropped_tables']} tables "
+                       f"unrelated to the question were left out.")
+        if stats:
+            st.caption(f"Tokens: {stats['prompt_tokens']} prompt, {stats['completion_tokens']} completion "
+                       f"(max {stats['max_length']})")
+    st.caption(f"SQL cache hit rate: {sql_cache.hit_rate():.0%} ({sql_cache.stats})")
@@ -0,0 +1,123 @@
+import time
+import logging
+import threading
+
+from Tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# ctranslate2, transformers and huggingface_hub are imported inside the functions below:
+# together they take seconds to import, and the page can render before they are needed.
+MODEL_ID = "ByteForge/Defog_llama-3-sqlcoder-8b-ct2-int8_float16"
+# One short generation after loading so the first real request doesn't pay for kernel setup
+WARMUP_PROMPT = "SELECT"
+
+
+def local_model_path(model_id=MODEL_ID):
+    """Path of the model snapshot, from the local Hugging Face cache when it is there.
+
+    local_files_only skips the hub metadata request entirely; only a model that
+    has never been downloaded goes to the network.
+    """
+    from huggingface_hub import snapshot_download
+    try:
+        return snapshot_download(model_id, local_files_only=True)
+    except Exception as e:
+        logger.info(f"{model_id} not in the local cache ({type(e).__name__}), downloading it")
+        return snapshot_download(model_id)
+
+
+def load_tokenizer(model_id=MODEL_ID):
+    """Just the tokenizer, for callers that count or build tokens without generating."""
+    import transformers
+    try:
+        return transformers.AutoTokenizer.from_pretrained(model_id, local_files_only=True)
+    except OSError:
+        return transformers.AutoTokenizer.from_pretrained(model_id)
+
+
+def load_model(model_id=MODEL_ID, **generator_kwargs):
+    """Load the ctranslate2 Generator and its tokenizer (blocking).
+
+    generator_kwargs go to ctranslate2.Generator, e.g. inter_threads/intra_threads.
+    """
+    import ctranslate2
+    import transformers
+    with tracer.span("model_load", model_id=model_id):
+        model_path = local_model_path(model_id)
+        model = ctranslate2.Generator(model_path, **generator_kwargs)
+        # The converted snapshot ships the tokenizer files, so this is a local read too
+        tokenizer = transformers.AutoTokenizer.from_pretrained(model_path)
+    return model, tokenizer
+
+
+def warm_up(model, tokenizer, prompt=WARMUP_PROMPT):
+    with tracer.span("model_warmup"):
+        tokens = tokenizer.convert_ids_to_tokens(tokenizer.encode(prompt))
+        model.generate_batch([tokens], max_length=1)
+
+
+class ModelWarmup:
+    """Loads and warms the model in a background thread so the UI can render meanwhile.
+
+    status moves through 'pending' -> 'loading' -> 'warming' -> 'ready', or to 'failed'.
+    """
+
+    def __init__(self, model_id=MODEL_ID, loader=load_model, warm=warm_up):
+        self.model_id = model_id
+        self.status = 'pending'
+        self.error = None
+        self.seconds = None
+        self._loader = loader
+        self._warm = warm
+        self._result = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+
+    def start(self):
+        if self.status == 'pending':
+            self._thread.start()
+        return self
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.status = 'loading'
+            model, tokenizer = self._loader(self.model_id)
+            self.status = 'warming'
+            try:
+                self._warm(model, tokenizer)
+            except Exception as e:
+                # A failed warm-up only means the first request is slower
+                logger.error(f"Model warm-up generation failed: {str(e)}")
+            self._result = (model, tokenizer)
+            self.status = 'ready'
+        except Exception as e:
+            logger.error(f"Failed to load model: {str(e)}")
+            self.error = e
+            self.status = 'failed'
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def result(self, timeout=None):
+        """Block until loading finishes; returns (model, tokenizer), or (None, None) if it failed or timed out."""
+        if not self._done.wait(timeout):
+            return None, None
+        return self._result or (None, None)
+
+
+if __name__ == "__main__":
+    # Stand-in loader showing that start() returns at once and result() waits
+    def slow_loader(model_id):
+        time.sleep(1)
+        return "model", "tokenizer"
+
+    start = time.perf_counter()
+    warmup = ModelWarmup(loader=slow_loader, warm=lambda model, tokenizer: time.sleep(0.5)).start()
+    print(f"start() returned after {(time.perf_counter() - start) * 1000:.1f}ms, status {warmup.status}")
+    print(f"result() -> {warmup.result()} after {time.perf_counter() - start:.2f}s, status {warmup.status}")
@@ -0,0 +1,494 @@
+"""One SQL model per machine, shared by every Streamlit worker.
+
+    python Model_server.py                                  # unix:///tmp/sqlcoder.sock
+    python Model_server.py --address http://127.0.0.1:8765 --intra-threads 4
+
+The server holds the only ctranslate2 Generator. The apps talk to it through
+ModelClient, so memory stays flat no matter how many UI processes run. Set
+USE_MODEL_SERVER = False in an app to load the model in-process instead
+(InProcessModel has the same interface).
+"""
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import functools
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from Tracing import tracer
+from Sql_stream import stream_generate, chart_line_done, sql_block_closed
+from Batch_generator import BatchScheduler
+from Prompt_cache import generate_with_schema_prefix
+from Token_count import MAX_COMPLETION_TOKENS, PromptTooLongError, TokenBudget
+from Model_loader import MODEL_ID, ModelWarmup, load_model
+
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_ADDRESS = os.environ.get("SQL_MODEL_SERVER", "unix:///tmp/sqlcoder.sock")
+# Threads per batch; the rest of the cores become parallel batches (inter_threads)
+INTRA_THREADS = 4
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 10
+# Generation settings for plain prompts; these go through the micro-batching scheduler.
+# max_length is sized per request by Token_count.TokenBudget
+DEFAULT_GENERATE_KWARGS = {'sampling_topk': 10}
+# Clients re-check /health at most this often while the server is warming up
+HEALTH_CACHE_SECONDS = 2
+REQUEST_TIMEOUT_SECONDS = 300
+
+# Stop conditions a client can ask for by name (functions can't cross the socket)
+STOP_CONDITIONS = {'chart_line': chart_line_done, 'sql_block': sql_block_closed}
+
+
+def thread_layout(cores=None, intra_threads=INTRA_THREADS):
+    """(inter_threads, intra_threads) that use every core once: parallel batches x threads per batch."""
+    cores = cores or os.cpu_count() or 1
+    intra_threads = max(1, min(intra_threads, cores))
+    return max(1, cores // intra_threads), intra_threads
+
+
+class LocalModel:
+    """Text in, text out around a loaded Generator; what the server exposes and InProcessModel wraps."""
+
+    def __init__(self, model, tokenizer, workers=1, **generate_kwargs):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.generate_kwargs = generate_kwargs or dict(DEFAULT_GENERATE_KWARGS)
+        max_completion = self.generate_kwargs.pop('max_length', MAX_COMPLETION_TOKENS)
+        self.budget = TokenBudget(tokenizer, max_completion=max_completion)
+        # Batched requests share one max_length, so only prompts that get the full completion budget are batched;
+        # without the prompt in the result, max_length counts generated tokens only
+        self.scheduler = BatchScheduler(model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, workers=workers,
+                                        max_length=self.budget.max_completion, include_prompt_in_result=False,
+                                        **self.generate_kwargs)
+
+    def chat_terminators(self):
+        return [self.tokenizer.eos_token_id, self.tokenizer.convert_tokens_to_ids("<|eot_id|>")]
+
+    def _plan(self, prompt=None, schema_ddl=None, question=None, max_length=None):
+        """Tokens for a raw prompt, or a schema + question around the cached prefix, fitted to the context window."""
+        with tracer.span("tokenize") as span:
+            plan = self.budget.plan(prompt, schema_ddl, question, max_length)
+            span.set(input_tokens=plan.prompt_tokens, max_length=plan.max_length,
+                     dropped_tables=len(plan.dropped_tables))
+        return plan
+
+    def _kwargs(self, static_tokens, max_length, chat_terminators, kwargs):
+        kwargs['max_length'] = max_length
+        if static_tokens is not None:
+            kwargs.update(static_prompt=static_tokens, cache_static_prompt=True)
+        if chat_terminators:
+            kwargs['end_token'] = self.chat_terminators()
+        return kwargs
+
+    def generate(self, prompt=None, schema_ddl=None, question=None, chat_terminators=False, stats=None,
+                 max_length=None, **kwargs):
+        """max_length caps the completion; the budget lowers it to what the context window has left."""
+        start = time.perf_counter()
+        plan = self._plan(prompt, schema_ddl, question, max_length)
+        with tracer.span("generate") as span:
+            if plan.static_tokens is not None:
+                # Schema as a cached static prompt; only the question is tokenized and prefilled per call
+                kwargs = self._kwargs(None, plan.max_length, chat_terminators, {**self.generate_kwargs, **kwargs})
+                result = generate_with_schema_prefix(self.model, self.tokenizer, plan.schema_ddl, question,
+                                                     include_prompt_in_result=False, **kwargs)[0]
+            elif not chat_terminators and not kwargs and plan.max_length == self.budget.max_completion:
+                # Plain prompts from concurrent sessions share generate_batch calls. This is the only batched
+                # path: streams, schema prompts and per-request sampling settings decode one request at a time
+                result = self.scheduler.generate(plan.tokens)
+            else:
+                kwargs = self._kwargs(plan.static_tokens, plan.max_length, chat_terminators,
+                                      {**self.generate_kwargs, **kwargs})
+                result = self.model.generate_batch([plan.tokens], include_prompt_in_result=False, **kwargs)[0]
+            ids = result.sequences_ids[0]
+            seconds = time.perf_counter() - start
+            counts = self.budget.record(plan, len(ids))
+            span.set(output_tokens=len(ids), tokens_per_second=len(ids) / max(seconds, 1e-9), **counts)
+        if stats is not None:
+            stats.update(output_tokens=len(ids), seconds=seconds, **counts)
+        return self.tokenizer.decode(ids)
+
+    def stream(self, prompt=None, schema_ddl=None, question=None, stop=None, chat_terminators=False, stats=None,
+               max_length=None, **kwargs):
+        """Iterator of text deltas; stop is a key of STOP_CONDITIONS.
+
+        The prompt is planned before this returns, so PromptTooLongError is raised
+        here rather than on the first next().
+        """
+        plan = self._plan(prompt, schema_ddl, question, max_length)
+        kwargs = self._kwargs(plan.static_tokens, plan.max_length, chat_terminators, {**self.generate_kwargs, **kwargs})
+        return self._stream(plan, stop, stats, kwargs)
+
+    def _stream(self, plan, stop, stats, kwargs):
+        token_times = []
+        start = time.perf_counter()
+        with tracer.span("generate", input_tokens=plan.prompt_tokens) as span:
+            try:
+                yield from stream_generate(self.model, self.tokenizer, plan.tokens,
+                                           stop_condition=STOP_CONDITIONS.get(stop),
+                                           on_token=lambda step: token_times.append(time.perf_counter()), **kwargs)
+            finally:
+                # Recorded for stopped and abandoned streams too
+                counts = self.budget.record(plan, len(token_times))
+                span.set(**counts)
+            timing = {}
+            if token_times:
+                # Time to the first token is the prefill; the rest is decode
+                timing = {'output_tokens': len(token_times), 'prefill_seconds': token_times[0] - start,
+                          'decode_tokens_per_second':
+                              (len(token_times) - 1) / max(token_times[-1] - token_times[0], 1e-9)}
+                span.set(**timing)
+            if stats is not None:
+                stats.update(input_tokens=plan.prompt_tokens, **timing, **counts)
+
+
+class InProcessModel:
+    """Loads the model in this process (in the background) and serves it directly."""
+
+    def __init__(self, model_id=MODEL_ID, **generator_kwargs):
+        self._warmup = ModelWarmup(model_id, loader=functools.partial(load_model, **generator_kwargs)).start()
+        self._local = None
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        return self._warmup.status
+
+    @property
+    def ready(self):
+        return self._warmup.ready
+
+    def wait(self, timeout=None):
+        """Block until the model is loaded; True when it is usable."""
+        model, tokenizer = self._warmup.result(timeout)
+        if model is None:
+            return False
+        with self._lock:
+            if self._local is None:
+                self._local = LocalModel(model, tokenizer)
+        return True
+
+    def _model(self):
+        if not self.wait():
+            raise RuntimeError("The SQL model failed to load, see the logs for details")
+        return self._local
+
+    def generate(self, **request):
+        return self._model().generate(**request)
+
+    def stream(self, **request):
+        return self._model().stream(**request)
+
+
+# Server
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients reuse one connection for many requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload):
+        line = (json.dumps(payload) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def _write_deltas(self, chunks, stats):
+        """Write each text delta as a chunk; returns the closing message (the stats, or the generation error)."""
+        try:
+            for delta in chunks:
+                self._write_chunk({'delta': delta})
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming: {str(e)}")
+            return {'error': str(e)}
+        return {'done': True, **stats}
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            # Tokenize/generate spans recorded in this process, in Prometheus text format
+            body = tracer.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path != "/health":
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        warmup = self.server.warmup
+        self._send_json(200, {'status': warmup.status, 'model_id': warmup.model_id,
+                              'inter_threads': self.server.inter_threads, 'intra_threads': self.server.intra_threads,
+                              'queue_depth': self.server.model.scheduler.queue_depth if self.server.model else 0,
+                              'tokens': dict(self.server.model.budget.totals) if self.server.model else {}})
+
+    def do_POST(self):
+        if self.path not in ("/generate", "/stream"):
+            self._send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {'error': f"Invalid JSON: {str(e)}"})
+            return
+        model = self.server.local_model()
+        if model is None:
+            self._send_json(503, {'error': f"Model is {self.server.warmup.status}", 'status': self.server.warmup.status})
+            return
+        if self.path == "/generate":
+            try:
+                stats = {}
+                text = model.generate(stats=stats, **request)
+                self._send_json(200, {'text': text, **stats})
+            except PromptTooLongError as e:
+                self._send_json(413, {'error': str(e)})
+            except Exception as e:
+                logger.error(f"Error generating: {str(e)}")
+                self._send_json(500, {'error': str(e)})
+            return
+
+        stats = {}
+        try:
+            # Planned before any header is sent, so a prompt that doesn't fit still gets a 413
+            chunks = model.stream(stats=stats, **request)
+        except PromptTooLongError as e:
+            self._send_json(413, {'error': str(e)})
+            return
+        except Exception as e:
+            logger.error(f"Error streaming: {str(e)}")
+            self._send_json(500, {'error': str(e)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_chunk(self._write_deltas(chunks, stats))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away (e.g. the Streamlit run was stopped or gave up after an error chunk):
+            # stop decoding its request
+            logger.info("Client disconnected, cancelling generation")
+            chunks.close()
+            self.close_connection = True
+
+
+class _ModelServerMixin:
+    daemon_threads = True
+
+    def setup_model(self, warmup, inter_threads, intra_threads):
+        self.warmup = warmup
+        self.inter_threads = inter_threads
+        self.intra_threads = intra_threads
+        self.model = None
+        self._model_lock = threading.Lock()
+
+    def local_model(self):
+        if not self.warmup.ready:
+            return None
+        with self._model_lock:
+            if self.model is None:
+                model, tokenizer = self.warmup.result()
+                # One scheduler worker per parallel batch the Generator can run
+                self.model = LocalModel(model, tokenizer, workers=self.inter_threads)
+        return self.model
+
+
+class TCPModelServer(_ModelServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class UnixModelServer(_ModelServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+
+def create_server(address=MODEL_SERVER_ADDRESS, intra_threads=INTRA_THREADS, inter_threads=None,
+                  model_id=MODEL_ID, warmup=None):
+    """Bind the socket and start loading the model; serve_forever() answers 503 until it is ready."""
+    default_inter, intra_threads = thread_layout(intra_threads=intra_threads)
+    inter_threads = inter_threads or default_inter
+    if warmup is None:
+        loader = functools.partial(load_model, inter_threads=inter_threads, intra_threads=intra_threads)
+        warmup = ModelWarmup(model_id, loader=loader)
+    parts = urlsplit(address)
+    if parts.scheme == "unix":
+        if os.path.exists(parts.path):
+            os.remove(parts.path)
+        server = UnixModelServer(parts.path, ModelRequestHandler)
+    elif parts.scheme == "http":
+        server = TCPModelServer((parts.hostname or "127.0.0.1", parts.port or 8765), ModelRequestHandler)
+    else:
+        raise ValueError(f"Unsupported model server address: {address}")
+    server.setup_model(warmup.start(), inter_threads, intra_threads)
+    logger.info(f"Model server on {address}: inter_threads={inter_threads}, intra_threads={intra_threads}")
+    return server
+
+
+# Client
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=REQUEST_TIMEOUT_SECONDS):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ModelServerError(Exception):
+    pass
+
+
+class ModelClient:
+    """Thin client for the model server with one kept-alive connection per thread."""
+
+    def __init__(self, address=MODEL_SERVER_ADDRESS, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+        self._health = (0.0, {'status': 'unknown'})
+
+    def _new_connection(self):
+        parts = urlsplit(self.address)
+        if parts.scheme == "unix":
+            return UnixHTTPConnection(parts.path, self.timeout)
+        return http.client.HTTPConnection(parts.hostname or "127.0.0.1", parts.port or 8765, timeout=self.timeout)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._new_connection()
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                return conn.getresponse()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest) as e:
+                # A kept-alive connection the server has since closed: reconnect once
+                self._drop_connection()
+                if attempt:
+                    raise ModelServerError(f"Model server at {self.address} is not reachable: {str(e)}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection()
+                raise ModelServerError(f"Model server at {self.address} is not reachable: {str(e)}") from e
+
+    def _json(self, response):
+        payload = json.loads(response.read() or b"{}")
+        if response.status != 200:
+            raise ModelServerError(payload.get('error', f"HTTP {response.status}"))
+        return payload
+
+    def health(self):
+        try:
+            health = self._json(self._request("GET", "/health"))
+        except ModelServerError as e:
+            health = {'status': 'unreachable', 'error': str(e)}
+        self._health = (time.monotonic(), health)
+        return health
+
+    @property
+    def status(self):
+        checked_at, health = self._health
+        if health.get('status') != 'ready' and time.monotonic() - checked_at > HEALTH_CACHE_SECONDS:
+            health = self.health()
+        return health['status']
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def wait(self, timeout=None, poll_seconds=1.0):
+        """Poll /health until the server's model is ready; True when it is usable."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.health()['status']
+            if status == 'ready':
+                return True
+            if status in ('failed', 'unreachable') or (deadline is not None and time.monotonic() > deadline):
+                return False
+            time.sleep(poll_seconds)
+
+    def generate(self, stats=None, **request):
+        payload = self._json(self._request("POST", "/generate", request))
+        if stats is not None:
+            stats.update({key: value for key, value in payload.items() if key != 'text'})
+        return payload['text']
+
+    def stream(self, stats=None, **request):
+        response = self._request("POST", "/stream", request)
+        if response.status != 200:
+            self._json(response)
+        finished = False
+        try:
+            for line in response:
+                message = json.loads(line)
+                if 'delta' in message:
+                    yield message['delta']
+                elif 'error' in message:
+                    raise ModelServerError(message['error'])
+                elif message.get('done'):
+                    if stats is not None:
+                        stats.update({key: value for key, value in message.items() if key != 'done'})
+            finished = True
+        finally:
+            if not finished:
+                # Stopped mid-stream: closing the socket tells the server to stop decoding
+                self._drop_connection()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the SQL model to local Streamlit workers.")
+    parser.add_argument('--address', default=MODEL_SERVER_ADDRESS, help="unix:///path.sock or http://host:port")
+    parser.add_argument('--intra-threads', type=int, default=INTRA_THREADS)
+    parser.add_argument('--inter-threads', type=int, help="parallel batches (default: cores / intra-threads)")
+    parser.add_argument('--model-id', default=MODEL_ID)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = create_server(args.address, args.intra_threads, args.inter_threads, args.model_id)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if urlsplit(args.address).scheme == "unix" and os.path.exists(urlsplit(args.address).path):
+            os.remove(urlsplit(args.address).path)
+
+
+if __name__ == "__main__":
+    main()
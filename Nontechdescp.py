@@ -1,8 +1,16 @@
-def analyze_query_results(df, question, sql_query, chart_recommendation):
+import calendar
+from Column_profile import profile_dataframe
+from Chart import chart_intent
+
+def analyze_query_results(df, question, sql_query, chart_recommendation, profile=None):
     insights = []
+
+    # Classify columns once; every section below reads from the same profile
+    if profile is None:
+        profile = profile_dataframe(df)
     
     try:
-        chart_type = chart_recommendation.split('(')[0].strip().lower() if chart_recommendation else determine_chart_type(df)
+        chart_type = chart_intent(chart_recommendation).chart_type if chart_recommendation else determine_chart_type(df)
     except Exception as e:
         print(f"Error determining chart type: {e}")
         chart_type = "unknown"
@@ -41,21 +49,17 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
             
             # Calculate changes over time or across groups
             if time_based_grouping:
+                # Derive the time key as a Series; the caller's frame is never modified
+                dates = pd.to_datetime(df.iloc[:, 0])
                 if time_unit in ['week', 'weeks']:
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    df['week'] = df['date'].dt.to_period('W')
-                    grouped = df.groupby('week').sum().reset_index()
+                    time_key = dates.dt.to_period('W').rename('week')
                 elif time_unit in ['day', 'days']:
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    grouped = df.groupby('date').sum().reset_index()
+                    time_key = dates.rename('date')
                 elif time_unit in ['month', 'months']:
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    df['month'] = df['date'].dt.to_period('M')
-                    grouped = df.groupby('month').sum().reset_index()
+                    time_key = dates.dt.to_period('M').rename('month')
                 else:  # year, years
-                    df['date'] = pd.to_datetime(df.iloc[:, 0])
-                    df['year'] = df['date'].dt.year
-                    grouped = df.groupby('year').sum().reset_index()
+                    time_key = dates.dt.year.rename('year')
+                grouped = df[profile.numeric_cols].groupby(time_key).sum().reset_index()
                 
                 for col in grouped.columns[1:]:
                     if pd.api.types.is_numeric_dtype(grouped[col]):
@@ -72,7 +76,8 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
             
             else:
                 # Non-time-based grouping
-                grouped = df.groupby(grouping_column).sum().reset_index()
+                value_cols = [col for col in profile.numeric_cols if col != grouping_column]
+                grouped = df.groupby(grouping_column)[value_cols].sum().reset_index()
                 for col in grouped.columns[1:]:
                     if pd.api.types.is_numeric_dtype(grouped[col]):
                         max_value = grouped[col].max()
@@ -89,14 +94,14 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
 
     # Time-based analysis
     try:
-        time_cols = df.select_dtypes(include=['datetime64']).columns
+        time_cols = profile.date_cols
         if len(time_cols) > 0:
             time_col = time_cols[0]
             time_range = df[time_col].max() - df[time_col].min()
             insights.append(f"Our data covers a period of {time_range.days} days.")
             
             # Trend analysis
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
+            numeric_cols = profile.numeric_cols
             for col in numeric_cols:
                 correlation = df[time_col].corr(df[col])
                 if abs(correlation) > 0.7:
@@ -105,18 +110,18 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
             
             # Seasonality check
             if len(df) >= 12:
-                df['month'] = df[time_col].dt.month
+                monthly_avgs = df[numeric_cols].groupby(df[time_col].dt.month.rename('month')).mean()
                 for col in numeric_cols:
-                    monthly_avg = df.groupby('month')[col].mean()
+                    monthly_avg = monthly_avgs[col]
                     if monthly_avg.max() / monthly_avg.min() > 1.5:
                         peak_month = monthly_avg.idxmax()
-                        insights.append(f"We noticed that {col} tends to be highest in {peak_month:%B}. This seasonal pattern could help with planning and forecasting.")
+                        insights.append(f"We noticed that {col} tends to be highest in {calendar.month_name[peak_month]}. This seasonal pattern could help with planning and forecasting.")
     except Exception as e:
         print(f"Error in time-based analysis: {e}")
 
     # Distribution analysis
     try:
-        for col in df.select_dtypes(include=[np.number]).columns:
+        for col in profile.numeric_cols:
             if df[col].nunique() > 5:
                 skewness = df[col].skew()
                 if abs(skewness) > 1:
@@ -137,8 +142,8 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
 
     # Correlation analysis
     try:
-        if len(df.select_dtypes(include=[np.number]).columns) > 1:
-            corr_matrix = df.select_dtypes(include=[np.number]).corr()
+        if len(profile.numeric_cols) > 1:
+            corr_matrix = df[profile.numeric_cols].corr()
             high_corr = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool)).stack()
             high_corr = high_corr[abs(high_corr) > 0.7]
             for (col1, col2), corr in high_corr.items():
@@ -275,7 +280,7 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
                 insights.append(f"The top three items account for {top_three_share:.1f}% of the total. This shows how much impact the leaders have.")
 
         elif 'average' in question.lower() or 'mean' in question.lower():
-            for col in df.select_dtypes(include=[np.number]).columns:
+            for col in profile.numeric_cols:
                 mean_val = df[col].mean()
                 insights.append(f"The average {col} is {mean_val:.2f}. This gives us a general idea of what's typical.")
                 
@@ -288,8 +293,8 @@ def analyze_query_results(df, question, sql_query, chart_recommendation):
 
     # Overall trend for time series
     try:
-        time_cols = df.select_dtypes(include=['datetime64']).columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        time_cols = profile.date_cols
+        numeric_cols = profile.numeric_cols
         if len(time_cols) > 0 and len(numeric_cols) > 0:
             first_value = df[numeric_cols[0]].iloc[0]
             last_value = df[numeric_cols[0]].iloc[-1]
@@ -0,0 +1,131 @@
+import time
+import logging
+import threading
+import contextvars
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Threads shared by every session for the stages that run once the result frame exists
+STAGE_WORKERS = 8
+DEFAULT_STAGE_TIMEOUT_SECONDS = 30
+
+StageResult = namedtuple('StageResult', ['status', 'value', 'seconds'])  # status: done, error, timeout, cancelled
+
+
+class Stage:
+    """One independent unit of work and the placeholder that shows its result.
+
+    fn(cancel_event) runs in a worker thread and must not touch Streamlit;
+    long-running fns can check cancel_event.is_set() and return early.
+    render(placeholder, value) runs in the script thread once fn has finished.
+    """
+
+    def __init__(self, name, fn, placeholder, render, timeout=DEFAULT_STAGE_TIMEOUT_SECONDS):
+        self.name = name
+        self.fn = fn
+        self.placeholder = placeholder
+        self.render = render
+        self.timeout = timeout
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="pipeline-stage")
+
+
+def _timed(stage):
+    start = time.perf_counter()
+    value = stage.fn(stage.cancel_event)
+    return value, time.perf_counter() - start
+
+
+def run_stages(stages, executor=None):
+    """Run stages concurrently and render each one the moment it finishes.
+
+    Total wall time is roughly the slowest stage instead of the sum. A stage
+    still running at its timeout is cancelled: its placeholder shows a warning
+    and its result is discarded (Python threads can't be killed, so a fn that
+    ignores cancel_event keeps its worker until it returns).
+    Returns {name: StageResult}.
+    """
+    executor = _executor if executor is None else executor
+    start = time.perf_counter()
+    # Each worker runs in a copy of the caller's context so its spans join the caller's trace
+    futures = {executor.submit(contextvars.copy_context().run, _timed, stage): stage for stage in stages}
+    deadlines = {future: start + (stage.timeout or float('inf')) for future, stage in futures.items()}
+    results = {}
+
+    pending = set(futures)
+    while pending:
+        remaining = min(deadlines[future] for future in pending) - time.perf_counter()
+        done, pending = wait(pending, timeout=max(remaining, 0) if remaining != float('inf') else None,
+                             return_when=FIRST_COMPLETED)
+        for future in done:
+            stage = futures[future]
+            try:
+                value, seconds = future.result()
+            except Exception as e:
+                logger.error(f"Error in {stage.name} stage: {str(e)}")
+                stage.placeholder.error(f"Could not generate the {stage.name}.")
+                results[stage.name] = StageResult('error', e, time.perf_counter() - start)
+                continue
+            if stage.cancel_event.is_set():
+                results[stage.name] = StageResult('cancelled', None, seconds)
+                continue
+            try:
+                stage.render(stage.placeholder, value)
+                results[stage.name] = StageResult('done', value, seconds)
+            except Exception as e:
+                logger.error(f"Error rendering {stage.name} stage: {str(e)}")
+                stage.placeholder.error(f"Could not display the {stage.name}.")
+                results[stage.name] = StageResult('error', e, seconds)
+
+        now = time.perf_counter()
+        for future in [future for future in pending if deadlines[future] <= now]:
+            stage = futures[future]
+            stage.cancel()
+            future.cancel()
+            pending.discard(future)
+            logger.info(f"{stage.name} stage timed out after {stage.timeout}s")
+            stage.placeholder.warning(f"The {stage.name} took longer than {stage.timeout}s and was skipped.")
+            results[stage.name] = StageResult('timeout', None, now - start)
+    return results
+
+
+def format_timings(timings):
+    """'SQL 1.20s · query 3ms (memory cache) · chart 0.41s' from [(label, seconds, note), ...]."""
+    parts = []
+    for label, seconds, note in timings:
+        text = f"{label} {seconds * 1000:.0f}ms" if seconds < 1 else f"{label} {seconds:.2f}s"
+        parts.append(f"{text} ({note})" if note else text)
+    return " · ".join(parts)
+
+
+if __name__ == "__main__":
+    class Placeholder:
+        def __init__(self, name):
+            self.name = name
+
+        def __getattr__(self, method):
+            return lambda *args, **kwargs: print(f"{time.perf_counter() - start:5.2f}s  {self.name}.{method}{args}")
+
+    def sleeper(seconds, value):
+        def fn(cancel_event):
+            cancel_event.wait(seconds)
+            return value
+        return fn
+
+    def show(placeholder, value):
+        placeholder.write(value)
+
+    stages = [Stage('chart', sleeper(0.5, 'figure'), Placeholder('chart'), show),
+              Stage('insights', sleeper(0.8, 'insights'), Placeholder('insights'), show),
+              Stage('slow stage', sleeper(5, 'never shown'), Placeholder('slow'), show, timeout=1)]
+    start = time.perf_counter()
+    results = run_stages(stages)
+    print(f"wall {time.perf_counter() - start:.2f}s (sequential would be at least 1.30s plus the slow stage)")
+    print(format_timings([(name, result.seconds, result.status) for name, result in results.items()]))
@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_MESSAGE = "You are SQL Expert. Given a input question and schema, answer with correct sql query"
+INSTRUCTION = "-- Using valid SQLite, answer the following questions for the tables provided above.\n"
+QUESTION_TEMPLATE = "-- {question} (Generate 1 Sql query. No explaination needed)\nanswer:\n"
+
+# Marker used to find where the question goes once the chat template is applied
+QUESTION_SENTINEL = "<<QUESTION>>"
+
+# Time one full prefill against the cached prefix the first time a schema is seen. Off by default:
+# it runs three extra prefills inside that schema's first request
+MEASURE_PREFILL = False
+
+_prefix_cache = {}
+_prefix_lock = threading.Lock()
+_measured = set()
+
+
+def schema_hash(schema_ddl, system_message=SYSTEM_MESSAGE):
+    """Content hash of everything that makes up the static part of the prompt."""
+    return hashlib.sha256((system_message + "\0" + schema_ddl).encode('utf-8')).hexdigest()
+
+
+def split_chat_prompt(tokenizer, schema_ddl, system_message=SYSTEM_MESSAGE):
+    """Render the chat template once and split it into static prefix and per-question suffix text."""
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": schema_ddl + INSTRUCTION + QUESTION_SENTINEL},
+    ]
+    rendered = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    prefix_text, suffix_text = rendered.split(QUESTION_SENTINEL)
+    return prefix_text, suffix_text
+
+
+def get_schema_prefix(tokenizer, schema_ddl, system_message=SYSTEM_MESSAGE):
+    """Return (key, prefix_tokens, suffix_text), tokenizing the schema only on first use."""
+    key = schema_hash(schema_ddl, system_message)
+    with _prefix_lock:
+        entry = _prefix_cache.get(key)
+    if entry is None:
+        prefix_text, suffix_text = split_chat_prompt(tokenizer, schema_ddl, system_message)
+        prefix_tokens = tokenizer.convert_ids_to_tokens(tokenizer.encode(prefix_text, add_special_tokens=False))
+        entry = (prefix_tokens, suffix_text)
+        with _prefix_lock:
+            _prefix_cache[key] = entry
+        logger.info(f"Cached schema prefix {key[:12]} ({len(prefix_tokens)} tokens)")
+    return key, entry[0], entry[1]
+
+
+def build_prompt_tokens(tokenizer, schema_ddl, question, system_message=SYSTEM_MESSAGE):
+    """Return (static_tokens, question_tokens): only the question part is tokenized per call."""
+    _, prefix_tokens, suffix_text = get_schema_prefix(tokenizer, schema_ddl, system_message)
+    question_text = QUESTION_TEMPLATE.format(question=question) + suffix_text
+    question_tokens = tokenizer.convert_ids_to_tokens(tokenizer.encode(question_text, add_special_tokens=False))
+    return prefix_tokens, question_tokens
+
+
+def measure_prefill_saving(model, static_tokens, question_tokens):
+    """Log prefill time for the full prompt against the cached static prefix."""
+    def prefill(tokens, **kwargs):
+        start = time.perf_counter()
+        model.generate_batch([tokens], max_length=1, include_prompt_in_result=False, **kwargs)
+        return time.perf_counter() - start
+
+    full_time = prefill(static_tokens + question_tokens)
+    # First static call fills the prefix cache, the second one reuses it
+    prefill(question_tokens, static_prompt=static_tokens, cache_static_prompt=True)
+    cached_time = prefill(question_tokens, static_prompt=static_tokens, cache_static_prompt=True)
+    logger.info(f"Prefill for {len(static_tokens)} prefix + {len(question_tokens)} question tokens: "
+                f"{full_time * 1000:.0f}ms full, {cached_time * 1000:.0f}ms with cached prefix "
+                f"(saved {(full_time - cached_time) * 1000:.0f}ms)")
+    return full_time, cached_time
+
+
+def generate_with_schema_prefix(model, tokenizer, schema_ddl, question, system_message=SYSTEM_MESSAGE, **generate_kwargs):
+    """Run generate_batch with the schema passed as a cached ctranslate2 static prompt."""
+    key = schema_hash(schema_ddl, system_message)
+    static_tokens, question_tokens = build_prompt_tokens(tokenizer, schema_ddl, question, system_message)
+    if MEASURE_PREFILL:
+        # Check and add under the lock so concurrent first requests measure once
+        with _prefix_lock:
+            measure = key not in _measured
+            _measured.add(key)
+        if measure:
+            measure_prefill_saving(model, static_tokens, question_tokens)
+    return model.generate_batch([question_tokens], static_prompt=static_tokens, cache_static_prompt=True,
+                                **generate_kwargs)
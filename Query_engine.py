@@ -0,0 +1,337 @@
+import os
+import re
+import abc
+import glob
+import itertools
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Which backend the apps use and where its stand-in warehouse tables live
+QUERY_BACKEND = "duckdb"
+DATA_DIR = "warehouse"
+POOL_SIZE = 4
+BATCH_SIZE = 10000
+MAX_ROWS = 100000
+QUERY_TIMEOUT_SECONDS = 30
+
+# SQLite affinity rules, checked in this order, applied to a result column's declared type
+SQLITE_DECLARED_TYPES = [('INT', pa.int64()), ('CHAR', pa.string()), ('CLOB', pa.string()), ('TEXT', pa.string()),
+                         ('BLOB', pa.binary()), ('REAL', pa.float64()), ('FLOA', pa.float64()),
+                         ('DOUB', pa.float64())]
+SQLITE_VALUE_TYPES = {int: pa.int64(), float: pa.float64(), str: pa.string(), bytes: pa.binary()}
+
+
+class QueryTimeoutError(Exception):
+    pass
+
+
+def table_name(path):
+    """warehouse/Sales Data.parquet -> sales_data"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'\W+', '_', stem).strip('_').lower()
+
+
+def local_table_files(data_dir):
+    return sorted(glob.glob(os.path.join(data_dir, "*.parquet")) + glob.glob(os.path.join(data_dir, "*.csv")))
+
+
+class ConnectionPool:
+    """Up to size connections created on demand and handed out one caller at a time."""
+
+    def __init__(self, connect, size=POOL_SIZE):
+        self._connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._idle.get(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def limit_batches(batches, schema, max_rows):
+    """Pass record batches through until max_rows rows have been yielded; always yields at least one."""
+    remaining = max_rows
+    yielded = False
+    for batch in batches:
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            if batch.num_rows > remaining:
+                batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+        yielded = True
+        yield batch
+    if not yielded:
+        # Keep the column names of an empty result
+        yield pa.RecordBatch.from_pylist([], schema=schema)
+
+
+def declared_arrow_type(decltype):
+    """Arrow type for a SQLite declared column type, or None when only the values can tell (NUMERIC, expressions)."""
+    decltype = (decltype or '').upper()
+    for fragment, arrow_type in SQLITE_DECLARED_TYPES:
+        if fragment in decltype:
+            return arrow_type
+    return None
+
+
+def value_arrow_type(values):
+    """Arrow type for the non-null values SQLite returned for one column, or None if they are all NULL."""
+    types = {type(value) for value in values if value is not None}
+    if not types:
+        return None
+    if types <= {int, float}:
+        return pa.float64() if float in types else pa.int64()
+    # SQLite columns can mix storage classes; anything else mixed is shown as text
+    return SQLITE_VALUE_TYPES.get(types.pop(), pa.string()) if len(types) == 1 else pa.string()
+
+
+def rows_to_batch(rows, schema):
+    """RecordBatch of fetched rows with the given schema (arrays, so duplicate column names survive)."""
+    arrays = []
+    for field, values in zip(schema, zip(*rows)):
+        if pa.types.is_string(field.type):
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class QueryBackend(abc.ABC):
+    """Interface every warehouse backend implements.
+
+    Backends stream results as pyarrow RecordBatches. A Snowflake backend maps
+    stream() onto cursor.fetch_arrow_batches() and its own statement timeout.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def stream(self, sql, batch_size=BATCH_SIZE, max_rows=MAX_ROWS, timeout=QUERY_TIMEOUT_SECONDS):
+        """Yield pyarrow.RecordBatch chunks of the result, at most max_rows rows in total."""
+
+    @abc.abstractmethod
+    def tables(self):
+        """Names of the tables queries can use."""
+
+    def close(self):
+        pass
+
+    def schema_text(self):
+        """One 'table(column type, ...)' line per table; changes whenever a table or a column does."""
+        lines = []
+        for table in sorted(self.tables()):
+            schema = list(self.stream(f'SELECT * FROM "{table}" LIMIT 0', max_rows=0))[0].schema
+            lines.append(f"{table}(" + ", ".join(f"{field.name} {field.type}" for field in schema) + ")")
+        return "\n".join(lines)
+
+    def execute(self, sql, max_rows=MAX_ROWS, timeout=QUERY_TIMEOUT_SECONDS):
+        """Run sql and return the (row-limited) result as a DataFrame."""
+        batches = list(self.stream(sql, max_rows=max_rows, timeout=timeout))
+        return pa.Table.from_batches(batches).to_pandas()
+
+
+class DuckDBBackend(QueryBackend):
+    """Embedded DuckDB with every Parquet/CSV file in data_dir exposed as a table."""
+
+    name = "duckdb"
+
+    def __init__(self, database=":memory:", data_dir=DATA_DIR, pool_size=POOL_SIZE):
+        import duckdb
+        self._duckdb = duckdb
+        self._db = duckdb.connect(database)
+        self.register_directory(data_dir)
+        # cursor() gives an independent connection to the same database, one per concurrent query
+        self.pool = ConnectionPool(self._db.cursor, pool_size)
+
+    def register_directory(self, data_dir):
+        for path in local_table_files(data_dir):
+            reader = "read_parquet" if path.endswith(".parquet") else "read_csv_auto"
+            quoted_path = path.replace("'", "''")
+            self._db.execute(f'CREATE OR REPLACE VIEW "{table_name(path)}" AS SELECT * FROM {reader}(\'{quoted_path}\')')
+            logger.info(f"Registered {path} as table {table_name(path)}")
+
+    def tables(self):
+        return [row[0] for row in self._db.execute("SELECT table_name FROM information_schema.tables").fetchall()]
+
+    def stream(self, sql, batch_size=BATCH_SIZE, max_rows=MAX_ROWS, timeout=QUERY_TIMEOUT_SECONDS):
+        with self.pool.connection() as conn:
+            timer = threading.Timer(timeout, conn.interrupt) if timeout else None
+            if timer:
+                timer.start()
+            try:
+                result = conn.execute(sql)
+                # to_arrow_reader replaced fetch_record_batch in newer DuckDB releases
+                if hasattr(result, 'to_arrow_reader'):
+                    reader = result.to_arrow_reader(batch_size)
+                else:
+                    reader = result.fetch_record_batch(batch_size)
+                yield from limit_batches(reader, reader.schema, max_rows)
+            except self._duckdb.InterruptException as e:
+                raise QueryTimeoutError(f"Query exceeded {timeout}s") from e
+            finally:
+                if timer:
+                    timer.cancel()
+
+    def close(self):
+        self.pool.close()
+        self._db.close()
+
+
+class SQLiteBackend(QueryBackend):
+    """SQLite with Parquet/CSV files from data_dir loaded as tables, for environments without DuckDB."""
+
+    name = "sqlite"
+    # How many SQLite VM instructions run between timeout checks
+    PROGRESS_STEPS = 10000
+    # Temporary view used to read the declared types of a query's result columns
+    DECLTYPE_VIEW = "_result_decltypes"
+
+    def __init__(self, database=":memory:", data_dir=DATA_DIR, pool_size=POOL_SIZE):
+        if database == ":memory:":
+            # Shared-cache URI so every pooled connection sees the same in-memory tables
+            self._uri = f"file:warehouse_{id(self)}?mode=memory&cache=shared"
+        else:
+            self._uri = f"file:{database}"
+        # Holds the in-memory database open for the lifetime of the backend
+        self._keeper = self._connect()
+        self.register_directory(data_dir)
+        self.pool = ConnectionPool(self._connect, pool_size)
+
+    def _connect(self):
+        return sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+
+    def register_directory(self, data_dir):
+        for path in local_table_files(data_dir):
+            df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+            df.to_sql(table_name(path), self._keeper, if_exists="replace", index=False)
+            logger.info(f"Loaded {path} into table {table_name(path)} ({len(df):,} rows)")
+
+    def tables(self):
+        return [row[0] for row in self._keeper.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")]
+
+    def _declared_types(self, conn, sql):
+        """Arrow types from the declared types of the result columns; None where SQLite has none."""
+        try:
+            conn.execute(f"CREATE TEMP VIEW {self.DECLTYPE_VIEW} AS {sql.strip().rstrip(';')}")
+            try:
+                return [declared_arrow_type(row[2])
+                        for row in conn.execute(f"PRAGMA table_info({self.DECLTYPE_VIEW})").fetchall()]
+            finally:
+                conn.execute(f"DROP VIEW {self.DECLTYPE_VIEW}")
+        except sqlite3.Error:
+            # Not a plain SELECT; the values decide
+            return None
+
+    def stream(self, sql, batch_size=BATCH_SIZE, max_rows=MAX_ROWS, timeout=QUERY_TIMEOUT_SECONDS):
+        with self.pool.connection() as conn:
+            if timeout:
+                deadline = time.monotonic() + timeout
+                conn.set_progress_handler(lambda: time.monotonic() > deadline, self.PROGRESS_STEPS)
+            try:
+                declared = self._declared_types(conn, sql)
+                cursor = conn.execute(sql)
+                columns = [column[0] for column in cursor.description or []]
+                types = declared if declared and len(declared) == len(columns) else [None] * len(columns)
+
+                # SQLite only types values, so every batch has to share one schema: columns without a
+                # declared type take it from their first non-null values, fetched ahead up to max_rows
+                fetched, fetched_rows = [], 0
+                while None in types and (max_rows is None or fetched_rows < max_rows):
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    fetched.append(rows)
+                    fetched_rows += len(rows)
+                    types = [arrow_type or value_arrow_type(values) for arrow_type, values in zip(types, zip(*rows))]
+                schema = pa.schema([(col, arrow_type or pa.null()) for col, arrow_type in zip(columns, types)])
+
+                rows = itertools.chain(fetched, iter(lambda: cursor.fetchmany(batch_size), []))
+                yield from limit_batches((rows_to_batch(batch, schema) for batch in rows), schema, max_rows)
+            except sqlite3.OperationalError as e:
+                if str(e) == "interrupted":
+                    raise QueryTimeoutError(f"Query exceeded {timeout}s") from e
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+
+    def close(self):
+        self.pool.close()
+        self._keeper.close()
+
+
+BACKENDS = {'duckdb': DuckDBBackend, 'sqlite': SQLiteBackend}
+
+
+def create_backend(kind=QUERY_BACKEND, **kwargs):
+    """Build the configured backend, falling back to SQLite when DuckDB isn't installed."""
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown query backend: {kind}")
+    try:
+        return BACKENDS[kind](**kwargs)
+    except ImportError as e:
+        logger.error(f"Error loading {kind} backend, using SQLite: {str(e)}")
+        return SQLiteBackend(**kwargs)
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    import numpy as np
+
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as data_dir:
+        rng = np.random.default_rng(0)
+        pd.DataFrame({
+            'region': rng.choice(['North', 'South', 'East', 'West'], n_rows),
+            'sales': rng.random(n_rows) * 100,
+            'order_date': pd.date_range('2023-01-01', periods=n_rows, freq='min'),
+        }).to_parquet(os.path.join(data_dir, "orders.parquet"))
+
+        for kind in BACKENDS:
+            start = time.perf_counter()
+            backend = create_backend(kind, data_dir=data_dir)
+            load_seconds = time.perf_counter() - start
+            for sql in ["SELECT region, SUM(sales) AS sales FROM orders GROUP BY region ORDER BY region",
+                        "SELECT * FROM orders"]:
+                start = time.perf_counter()
+                df = backend.execute(sql)
+                print(f"{kind:<7} load {load_seconds:5.2f}s  {sql[:40]:<40} {len(df):>7,} rows "
+                      f"in {(time.perf_counter() - start) * 1000:7.0f}ms")
+            backend.close()
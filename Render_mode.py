@@ -0,0 +1,54 @@
+import plotly.graph_objects as go
+
+# Above this many plotted points line/scatter traces are drawn with WebGL instead of SVG.
+# Same cut-off plotly express uses for render_mode='auto'.
+WEBGL_ROW_THRESHOLD = 1000
+
+
+def use_webgl(n_points, threshold=None):
+    threshold = WEBGL_ROW_THRESHOLD if threshold is None else threshold
+    return n_points > threshold
+
+
+def render_mode(n_points, threshold=None):
+    """render_mode argument for px.line / px.scatter."""
+    return 'webgl' if use_webgl(n_points, threshold) else 'svg'
+
+
+def scatter_trace(n_points=None, threshold=None, **trace_kwargs):
+    """go.Scatter, or go.Scattergl with the same styling when there are many points."""
+    if n_points is None:
+        n_points = len(trace_kwargs.get('x', trace_kwargs.get('y', [])))
+    trace_class = go.Scattergl if use_webgl(n_points, threshold) else go.Scatter
+    return trace_class(**trace_kwargs)
+
+
+def benchmark_render_modes(sizes=(1000, 10000, 50000, 200000), seed=0):
+    """Figure build time and serialized JSON size for SVG and WebGL traces of the same data.
+
+    This only covers the server side; the gain from WebGL is in browser draw time.
+    """
+    import time
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    # Warm up plotly's validators so the first timing isn't dominated by imports
+    go.Figure([go.Scatter(x=[0], y=[0]), go.Scattergl(x=[0], y=[0])]).to_json()
+    results = []
+    for n_points in sizes:
+        x = np.arange(n_points)
+        y = np.cumsum(rng.standard_normal(n_points))
+        for trace_class in (go.Scatter, go.Scattergl):
+            start = time.perf_counter()
+            fig = go.Figure(trace_class(x=x, y=y, mode='lines+markers'))
+            payload = fig.to_json()
+            seconds = time.perf_counter() - start
+            results.append({'points': n_points, 'trace': trace_class.__name__,
+                            'build_ms': seconds * 1000, 'json_mb': len(payload) / 1e6})
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_render_modes():
+        print(f"{row['points']:>8,} {row['trace']:<10} build+serialize {row['build_ms']:8.1f}ms  "
+              f"JSON {row['json_mb']:6.2f} MB")
@@ -0,0 +1,228 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_DIR = "result_cache"
+# In-memory front: DataFrames ready to display, bounded by their memory usage
+MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+# Parquet files on disk; oldest are removed first
+DISK_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 15 * 60
+# Tables that change more or less often than the default, keyed by lower-case table name
+TABLE_TTL_SECONDS = {}
+
+# Upper-cased when normalizing. Function names are left as written: SQLite uses the query text as the
+# name of an unaliased column, so SUM(x) and sum(x) come back with different labels
+SQL_KEYWORDS = {
+    'select', 'from', 'where', 'group', 'by', 'order', 'having', 'limit', 'offset', 'join', 'inner', 'left',
+    'right', 'full', 'outer', 'cross', 'on', 'as', 'and', 'or', 'not', 'in', 'is', 'null', 'like', 'between',
+    'distinct', 'union', 'all', 'with', 'case', 'when', 'then', 'else', 'end', 'asc', 'desc', 'exists',
+    'over', 'partition', 'true', 'false',
+}
+
+# Strings, quoted identifiers, comments, numbers, words, and any other single character
+SQL_TOKEN = re.compile(
+    r"(?P<string>'(?:[^']|'')*')|(?P<quoted>\"(?:[^\"]|\"\")*\")|(?P<comment>--[^\n]*|/\*.*?\*/)"
+    r"|(?P<number>\d+(?:\.\d+)?)|(?P<word>[A-Za-z_][\w$]*)|(?P<space>\s+)|(?P<other>.)",
+    re.DOTALL,
+)
+TABLE_REFERENCE = re.compile(r'\b(?:from|join)\s+((?:"[^"]+"|[\w$]+)(?:\.(?:"[^"]+"|[\w$]+))*)', re.IGNORECASE)
+# Literals and quoted identifiers stand in as \x00<n>\x00 while the rest of the query is rewritten
+PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+IN_LIST = re.compile(r"\bIN \(((?:\x00\d+\x00|\d+(?:\.\d+)?)(?:, (?:\x00\d+\x00|\d+(?:\.\d+)?))*)\)")
+
+
+def normalize_sql(sql):
+    """Canonical form of a query: no comments, single spaces, upper-case keywords, sorted IN literal lists.
+
+    String literals and quoted identifiers are kept exactly as written, and so
+    is the case of unquoted identifiers, which can end up in the column names.
+    """
+    parts, literals = [], []
+    for match in SQL_TOKEN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ('comment', 'space'):
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+        elif kind in ('string', 'quoted'):
+            parts.append(f"\x00{len(literals)}\x00")
+            literals.append(text)
+        elif kind == 'word' and text.lower() in SQL_KEYWORDS:
+            parts.append(text.upper())
+        else:
+            parts.append(text)
+    text = ''.join(parts).strip().rstrip(';').rstrip()
+    # No space inside brackets or before commas, one space after commas
+    text = re.sub(r'\s*,\s*', ', ', re.sub(r'\(\s+', '(', re.sub(r'\s+\)', ')', text)))
+    # WHERE x IN (3, 1, 2) and IN (1, 2, 3) select the same rows; items are whole tokens, so sorting is safe
+    def literal(item):
+        placeholder = PLACEHOLDER.fullmatch(item)
+        return literals[int(placeholder.group(1))] if placeholder else item
+
+    text = IN_LIST.sub(lambda m: 'IN (' + ', '.join(sorted(m.group(1).split(', '), key=literal)) + ')', text)
+    return PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], text)
+
+
+def referenced_tables(sql):
+    return sorted({name.replace('"', '').split('.')[-1].lower() for name in TABLE_REFERENCE.findall(sql)})
+
+
+def ttl_for(tables, default_ttl=DEFAULT_TTL_SECONDS):
+    """The shortest TTL of the tables a query reads."""
+    return min([TABLE_TTL_SECONDS.get(table, default_ttl) for table in tables] or [default_ttl])
+
+
+class ResultCache:
+    """SQL result cache: DataFrames in an in-memory LRU, backed by Parquet files on local disk."""
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, memory_budget=MEMORY_BUDGET_BYTES, disk_budget=DISK_BUDGET_BYTES,
+                 default_ttl=DEFAULT_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.default_ttl = default_ttl
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._memory = OrderedDict()  # key -> (df, expires_at, nbytes)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, sql):
+        return hashlib.sha256(normalize_sql(sql).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _remember(self, key, df, expires_at):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.memory_budget:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[2]
+            while self._memory and self._memory_bytes + nbytes > self.memory_budget:
+                _, (_, _, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted
+                self.stats['evictions'] += 1
+            self._memory[key] = (df, expires_at, nbytes)
+            self._memory_bytes += nbytes
+
+    def get(self, sql):
+        """Return (df, source) where source is 'memory', 'disk' or None on a miss."""
+        key = self.key(sql)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[0], 'memory'
+                self._memory_bytes -= self._memory.pop(key)[2]
+                self.stats['expired'] += 1
+
+        path = self._path(key)
+        try:
+            expires_at = float(pq.read_schema(path).metadata[b'expires_at'])
+        except (OSError, KeyError, TypeError):
+            expires_at = None
+        if expires_at is not None and expires_at > now:
+            df = pq.read_table(path).to_pandas()
+            self._remember(key, df, expires_at)
+            self.stats['disk_hits'] += 1
+            return df, 'disk'
+        if expires_at is not None:
+            self.stats['expired'] += 1
+            self._remove_file(path)
+        self.stats['misses'] += 1
+        return None, None
+
+    def put(self, sql, table, df=None):
+        """Store a query result given as a pyarrow Table (and the DataFrame built from it, if any)."""
+        key = self.key(sql)
+        expires_at = time.time() + ttl_for(referenced_tables(sql), self.default_ttl)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'expires_at'] = str(expires_at).encode()
+        metadata[b'sql'] = normalize_sql(sql).encode('utf-8')
+        path = self._path(key)
+        try:
+            # Write to a temp file first so readers never see a partial Parquet file
+            pq.write_table(table.replace_schema_metadata(metadata), path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self._enforce_disk_budget()
+        except OSError as e:
+            logger.error(f"Error writing cached result: {str(e)}")
+        self._remember(key, df if df is not None else table.to_pandas(), expires_at)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _enforce_disk_budget(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_budget:
+                break
+            self._remove_file(path)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def hit_rate(self):
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses'] + self.stats['expired']
+        return hits / total if total else 0.0
+
+
+def cached_execute(cache, backend, sql, **execute_kwargs):
+    """Run sql through the cache: returns (df, source, seconds) with source 'memory', 'disk' or 'warehouse'."""
+    start = time.perf_counter()
+    df, source = cache.get(sql)
+    if df is None:
+        table = pa.Table.from_batches(list(backend.stream(sql, **execute_kwargs)))
+        df = table.to_pandas()
+        cache.put(sql, table, df)
+        source = 'warehouse'
+    return df, source, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from Query_engine import create_backend
+
+    with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as cache_dir:
+        n_rows = 1000000
+        rng = np.random.default_rng(0)
+        pd.DataFrame({'region': rng.choice(['North', 'South', 'East', 'West'], n_rows),
+                      'sales': rng.random(n_rows) * 100}).to_parquet(os.path.join(data_dir, "orders.parquet"))
+        backend = create_backend(data_dir=data_dir)
+        queries = ["SELECT * FROM orders WHERE region IN ('West', 'North')",
+                   "select *\n  from ORDERS where region in ('North','West');  -- same rows",
+                   "SELECT * FROM orders WHERE region IN ('North', 'West')"]
+        cache = ResultCache(cache_dir)
+        for sql in queries:
+            df, source, seconds = cached_execute(cache, backend, sql)
+            print(f"{source:<9} {len(df):>7,} rows in {seconds * 1000:7.1f}ms")
+        # A new process starts with an empty memory tier and reads the Parquet file
+        df, source, seconds = cached_execute(ResultCache(cache_dir), backend, queries[0])
+        print(f"{source:<9} {len(df):>7,} rows in {seconds * 1000:7.1f}ms")
+        print(f"hit rate {cache.hit_rate():.0%} {cache.stats}")
+        backend.close()
@@ -0,0 +1,125 @@
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share a key."""
+    text = re.sub(r'\s+', ' ', question.strip().lower())
+    return text.rstrip(' ?.!')
+
+
+class SqlCache:
+    """Two-tier question -> SQL cache: exact LRU on normalized text, then FAISS nearest neighbour.
+
+    Embeddings are L2-normalized, so max_distance is a squared L2 distance
+    (0.1 is roughly cosine similarity 0.95).
+    """
+
+    def __init__(self, encoder, max_entries=1000, ttl_seconds=3600, max_distance=0.1, schema_hash=None):
+        self.encoder = encoder
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.schema_hash = schema_hash
+        self.stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._entries = OrderedDict()  # normalized question -> (id, sql, created_at)
+        self._id_to_key = {}
+        self._pending = {}
+        self._next_id = 0
+        dimension = self.encoder.get_sentence_embedding_dimension()
+        self._index = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+
+    def _embed(self, text):
+        return self.encoder.encode([text], normalize_embeddings=True).astype('float32')
+
+    def _remove(self, key):
+        entry_id, _, _ = self._entries.pop(key)
+        del self._id_to_key[entry_id]
+        self._index.remove_ids(np.array([entry_id], dtype='int64'))
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def set_schema_hash(self, schema_hash):
+        """Drop every cached query when the schema the SQL was written against changes."""
+        with self._lock:
+            if schema_hash != self.schema_hash:
+                if self._entries:
+                    logger.info(f"Schema changed, invalidating {len(self._entries)} cached queries")
+                    self.stats['invalidations'] += 1
+                self.schema_hash = schema_hash
+                self._reset()
+
+    def get(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[2]):
+                    self._entries.move_to_end(key)
+                    self.stats['exact_hits'] += 1
+                    return entry[1]
+                self._remove(key)
+
+        embedding = self._embed(key)
+        with self._lock:
+            if self._index.ntotal > 0:
+                distances, ids = self._index.search(embedding, 1)
+                neighbour = self._id_to_key.get(int(ids[0][0]))
+                if neighbour is not None and distances[0][0] <= self.max_distance:
+                    entry_id, sql, created_at = self._entries[neighbour]
+                    if not self._expired(created_at):
+                        self._entries.move_to_end(neighbour)
+                        self.stats['semantic_hits'] += 1
+                        return sql
+                    self._remove(neighbour)
+            if len(self._pending) >= self.max_entries:
+                self._pending.clear()
+            self._pending[key] = embedding
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, question, sql):
+        key = normalize_question(question)
+        with self._lock:
+            embedding = self._pending.pop(key, None)
+        if embedding is None:
+            embedding = self._embed(key)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(embedding, np.array([entry_id], dtype='int64'))
+            self._entries[key] = (entry_id, sql, time.time())
+            self._id_to_key[entry_id] = key
+
+    def hit_rate(self):
+        hits = self.stats['exact_hits'] + self.stats['semantic_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+
+def cached_generate_sql(cache, question, generate_fn):
+    """Return cached SQL for the question, or generate it and remember the result."""
+    sql = cache.get(question)
+    if sql is None:
+        sql = generate_fn(question)
+        if sql:
+            cache.put(question, sql)
+    return sql
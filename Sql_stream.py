@@ -0,0 +1,63 @@
+import re
+
+# The model is done with the SQL once the fenced block is closed, and done with
+# the whole answer once the chart recommendation line has been written out.
+SQL_BLOCK_CLOSED = re.compile(r'```sql\n.*?\n```', re.DOTALL)
+CHART_LINE_DONE = re.compile(r'Chart recommendation: .*?\n')
+
+
+class IncrementalDetokenizer:
+    """Turn token ids into text deltas without re-decoding the whole prefix each step."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.ids = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def push(self, token_id):
+        """Add one token id and return the newly completed text (may be empty)."""
+        self.ids.append(token_id)
+        # Only decode a small window: the last emitted token(s) plus anything pending,
+        # so multi-byte characters and leading-space merges come out right.
+        prefix_text = self.tokenizer.decode(self.ids[self.prefix_offset:self.read_offset])
+        new_text = self.tokenizer.decode(self.ids[self.prefix_offset:])
+        if len(new_text) > len(prefix_text) and not new_text.endswith('�'):
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.ids)
+            return new_text[len(prefix_text):]
+        return ''
+
+
+def sql_block_closed(text):
+    return SQL_BLOCK_CLOSED.search(text) is not None
+
+
+def chart_line_done(text):
+    return CHART_LINE_DONE.search(text) is not None
+
+
+def stream_generate(model, tokenizer, input_tokens, stop_condition=None, on_token=None, **generate_kwargs):
+    """Yield decoded text chunks as ctranslate2 produces tokens.
+
+    Decoding stops at the end token, at max_length, or as soon as
+    stop_condition(text_so_far) returns True. on_token(step), if given, is
+    called for every generated token, e.g. to time prefill and decode.
+    """
+    detokenizer = IncrementalDetokenizer(tokenizer)
+    text = ''
+    step_results = model.generate_tokens(input_tokens, **generate_kwargs)
+    try:
+        for step in step_results:
+            if on_token is not None:
+                on_token(step)
+            delta = detokenizer.push(step.token_id)
+            if not delta:
+                continue
+            text += delta
+            yield delta
+            if stop_condition is not None and stop_condition(text):
+                break
+    finally:
+        # Closing the iterator tells ctranslate2 to stop decoding this request
+        step_results.close()
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+TOP_K = 5
+
+
+def _correlate(x, centered, valid, var):
+    """(slope, r) of every column against x, over the rows where both are present (pandas' pairwise deletion).
+
+    centered holds the columns minus their means with missing cells zeroed, var
+    their variances; x may contain NaN.
+    """
+    x_valid = ~np.isnan(x)
+    if not x_valid.any():
+        return np.full(centered.shape[1], np.nan), np.full(centered.shape[1], np.nan)
+    # Centring x first keeps the sums of squares precise for nanosecond timestamps
+    x = np.where(x_valid, x - x[x_valid].mean(), 0.0)
+    if valid.all() and x_valid.all():
+        n = len(x)
+        cov = (x @ centered) / (n - 1)
+        var_x = (x @ x) / (n - 1)
+        return cov / var_x, cov / np.sqrt(var_x * var)
+
+    # Means and variances of both sides are recomputed over each column's shared rows
+    weights = (valid & x_valid[:, None]).astype('float64')
+    n = weights.sum(axis=0)
+    y = centered * weights
+    sx, sxx, sy, sxy = x @ weights, (x * x) @ weights, y.sum(axis=0), x @ y
+    y *= y
+    syy = y.sum(axis=0)
+    del y, weights
+    cov = (sxy - sx * sy / n) / (n - 1)
+    var_x = (sxx - sx * sx / n) / (n - 1)
+    var_y = (syy - sy * sy / n) / (n - 1)
+    return cov / var_x, cov / np.sqrt(var_x * var_y)
+
+
+def compute_numeric_stats(df, numeric_cols, time_col=None):
+    """Compute every per-column statistic the insight rules need in one vectorized sweep.
+
+    All numeric columns are copied once into a contiguous 2-D float array and
+    reduced along axis 0 together, instead of one pandas call per column per
+    statistic. Returns a dict of pandas Series indexed by column name, plus the
+    correlation matrix as a DataFrame. Returns None when there is nothing to analyze.
+    """
+    numeric_cols = list(numeric_cols)
+    if not numeric_cols or len(df) == 0:
+        return None
+    values = np.ascontiguousarray(df[numeric_cols].to_numpy(dtype='float64', na_value=np.nan))
+    n_rows, n_cols = values.shape
+    valid = ~np.isnan(values)
+    all_valid = bool(valid.all())
+    count = valid.sum(axis=0)
+
+    # Temporaries are kept to one extra 2-D buffer at a time; NaN-aware (copying)
+    # variants are only used when the data actually has missing values.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = values.sum(axis=0) if all_valid else np.nansum(values, axis=0)
+        mean = total / count
+
+        q1, q3 = (np.quantile if all_valid else np.nanquantile)(values, [0.25, 0.75], axis=0)
+        iqr = q3 - q1
+        outliers = ((values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)).sum(axis=0)
+        above_mean = (values > mean).sum(axis=0)
+        below_mean = (values < mean).sum(axis=0)
+
+        centered = values - mean
+        if not all_valid:
+            centered[~valid] = 0.0
+        scratch = centered * centered
+        m2 = scratch.sum(axis=0) / count
+        scratch *= centered
+        m3 = scratch.sum(axis=0) / count
+        del scratch
+        var = m2 * count / (count - 1)
+        std = np.sqrt(var)
+        # Adjusted Fisher-Pearson skew, same as pandas Series.skew
+        skew = np.sqrt(count * (count - 1)) / (count - 2) * m3 / m2 ** 1.5
+        sum_squares = count * (m2 + mean ** 2)
+
+        # Correlation with row position gives the linear-trend slope and R without linregress
+        trend_slope, trend_r = _correlate(np.arange(n_rows, dtype='float64'), centered, valid, var)
+
+        if all_valid and n_rows > 1:
+            corr = (centered.T @ centered) / (n_rows - 1) / np.outer(std, std)
+            corr = pd.DataFrame(corr, index=numeric_cols, columns=numeric_cols)
+        else:
+            corr = df[numeric_cols].corr()
+
+        time_corr = None
+        if time_col is not None:
+            # Datetimes as int64 nanoseconds correlate exactly like pandas' datetime Series.corr
+            times = df[time_col].to_numpy(dtype='datetime64[ns]')
+            time_values = times.astype('int64').astype('float64')
+            time_values[np.isnat(times)] = np.nan
+            _, time_corr = _correlate(time_values, centered, valid, var)
+        del centered
+
+    # Extremes and top values one column at a time so only 1-D temporaries are needed
+    k = min(TOP_K, n_rows)
+    minimum, maximum = np.full(n_cols, np.nan), np.full(n_cols, np.nan)
+    argmin, argmax = np.full(n_cols, -1), np.full(n_cols, -1)
+    top = np.full((max(k, 2), n_cols), np.nan)
+    top_positions = np.full((max(k, 2), n_cols), -1)
+    for j in range(n_cols):
+        if count[j] == 0:
+            continue
+        column = values[:, j] if all_valid else np.where(valid[:, j], values[:, j], -np.inf)
+        argmax[j] = column.argmax()
+        maximum[j] = column[argmax[j]]
+        # Never more than the valid cells, or the -inf fillers would end up in the top values
+        column_k = min(k, int(count[j]))
+        candidates = np.argpartition(column, n_rows - column_k)[n_rows - column_k:]
+        candidates = candidates[np.argsort(-column[candidates], kind='stable')]
+        top[:column_k, j] = column[candidates]
+        top_positions[:column_k, j] = candidates
+        if not all_valid:
+            column[~valid[:, j]] = np.inf
+        argmin[j] = column.argmin()
+        minimum[j] = column[argmin[j]]
+
+    stats = {
+        'count': count, 'sum': total, 'mean': mean, 'var': var, 'std': std, 'skew': skew,
+        'min': minimum, 'max': maximum, 'argmin': argmin, 'argmax': argmax,
+        'q1': q1, 'q3': q3, 'outliers': outliers, 'sum_squares': sum_squares,
+        'above_mean': above_mean, 'below_mean': below_mean,
+        'top1': top[0], 'top2': top[1], 'second_argmax': top_positions[1],
+        'top3_sum': np.nansum(top[:3], axis=0), 'top5_sum': np.nansum(top[:5], axis=0),
+        'trend_slope': trend_slope, 'trend_r': trend_r,
+    }
+    if time_corr is not None:
+        stats['time_corr'] = time_corr
+    stats = {name: pd.Series(column_values, index=numeric_cols) for name, column_values in stats.items()}
+    stats['corr'] = corr
+    return stats
+
+
+def pareto_count(values, share=0.8):
+    """How many of the largest values it takes to reach the given share of the total."""
+    values = np.sort(np.asarray(values, dtype='float64'))[::-1]
+    cumulative = np.cumsum(values)
+    return int(np.searchsorted(cumulative, share * cumulative[-1]) + 1)
@@ -2,38 +2,82 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import re
+import time
 import logging
-import ctranslate2
-import transformers
-from huggingface_hub import snapshot_download
+from Downsample import downsample_line, downsample_scatter, title_with_note
+from Render_mode import render_mode
+from Figure_cache import chart_key, figure_cache
+from Chart import chart_intent, extract_chart_intent
+from Query_engine import create_backend, QueryTimeoutError
+from Result_cache import ResultCache, cached_execute
+from Pipeline import Stage, run_stages, format_timings
+from Column_profile import profile_dataframe
+from Description import analyze_query_results
+from Tracing import tracer, render_trace_panel
+from Model_server import ModelClient, InProcessModel
+
+# Generate through the shared model server (python Model_server.py) instead of loading
+# the 8B model in every Streamlit process
+USE_MODEL_SERVER = True
+
+# Show the model output token by token instead of waiting for the full answer. Streamed requests
+# each decode on their own; only non-streamed plain prompts are micro-batched with other sessions'
+# (Batch_generator.BatchScheduler), so leave this off when many users share one model
+STREAM_RESPONSE = False
+
+# Collapsible per-stage timing/memory panel under each answer
+SHOW_TRACE_PANEL = True
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Cache the model
+# One handle per process: a keep-alive client of the model server, or a model loading in the background
 @st.cache_resource
-def load_model():
+def load_llm():
+    return ModelClient() if USE_MODEL_SERVER else InProcessModel()
+
+@st.cache_resource
+def load_query_backend():
+    return create_backend()
+
+# Results of identical (normalized) SQL are served from memory or local Parquet files
+@st.cache_resource
+def load_result_cache():
+    return ResultCache()
+
+# Per-stage limits for the work that runs concurrently once the result frame exists
+CHART_TIMEOUT_SECONDS = 20
+INSIGHTS_TIMEOUT_SECONDS = 20
+
+def get_model_response(question, prompt, llm):
     try:
-        model_id = "ByteForge/Defog_llama-3-sqlcoder-8b-ct2-int8_float16"
-        model_path = snapshot_download(model_id)
-        model = ctranslate2.Generator(model_path)
-        tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
-        return model, tokenizer
+        full_prompt = prompt + question
+        stats = {}
+        with tracer.span("generate") as span:
+            output_text = llm.generate(prompt=full_prompt, stats=stats)
+            span.set(**stats)
+        return output_text
     except Exception as e:
-        logger.error(f"Failed to load model: {str(e)}")
-        st.error("Failed to load model. Please check the logs for details.")
-        return None, None
+        logger.error(f"Error getting model response: {str(e)}")
+        st.error("Failed to get a response from the model. Please check the logs for details.")
+        return None
 
-def get_model_response(question, prompt, model, tokenizer):
+def stream_model_response(question, prompt, llm, placeholder):
     try:
         full_prompt = prompt + question
-        input_tokens = tokenizer.convert_ids_to_tokens(tokenizer.encode(full_prompt))
-        results = model.generate_batch([input_tokens], max_length=1024, sampling_topk=10)
-        output_text = tokenizer.decode(results[0].sequences_ids[0])
+        output_text = ""
+        stats = {}
+        with tracer.span("generate") as span:
+            # Stop as soon as the chart recommendation line is complete
+            for chunk in llm.stream(prompt=full_prompt, stop='chart_line', stats=stats):
+                output_text += chunk
+                placeholder.code(output_text, language="sql")
+            # Token counts, prefill time and decode rate as measured next to the model
+            span.set(**stats)
         return output_text
     except Exception as e:
-        logger.error(f"Error getting model response: {str(e)}")
+        logger.error(f"Error streaming model response: {str(e)}")
         st.error("Failed to get a response from the model. Please check the logs for details.")
         return None
 
@@ -42,8 +86,8 @@ def get_sql_query_from_response(response):
     return match.group(1) if match else None
 
 def get_chart_recommendation_from_response(response):
-    match = re.search(r'Chart recommendation: (.*?)$', response, re.MULTILINE)
-    return match.group(1) if match else None
+    # ChartIntent(chart_type, modifiers) from the "Chart recommendation:" line, or None
+    return extract_chart_intent(response, require_prefix=True)
 
 def determine_chart_type(df):
     if len(df.columns) == 2:
@@ -55,31 +99,50 @@ def determine_chart_type(df):
         return 'line'
     return None
 
-def generate_chart(df, chart_recommendation):
-    if chart_recommendation is None:
-        chart_type = determine_chart_type(df)
+def build_chart(df, chart_recommendation):
+    """Return (figure, chart_type); figure is None when the chart type isn't supported.
+
+    Doesn't call Streamlit, so it can run in a pipeline worker thread.
+    """
+    intent = chart_intent(chart_recommendation)
+    if intent is None:
+        chart_type, modifiers = determine_chart_type(df), ()
     else:
-        chart_type = chart_recommendation.split('(')[0].strip().lower()
+        chart_type, modifiers = intent
+    horizontal = 'horizontal' in modifiers
+
+    # Same result and chart spec as an earlier call: reuse the serialized figure
+    key = chart_key(__name__, df, intent or chart_type)
+    fig = figure_cache.get(key)
+    if fig is not None:
+        return fig, chart_type
 
     x_column = df.columns[0]
     y_columns = df.columns[1:]
 
     if chart_type == 'grouped bar':
-        fig = px.bar(df, x=x_column, y=y_columns, 
+        fig = px.bar(df, x=y_columns if horizontal else x_column, y=x_column if horizontal else y_columns,
                      title=f"{', '.join(y_columns)} by {x_column}",
-                     template="plotly_white", barmode='group')
-        fig.update_layout(xaxis_title=x_column, yaxis_title="Values")
+                     template="plotly_white", barmode='group', orientation='h' if horizontal else 'v')
+        if horizontal:
+            fig.update_layout(xaxis_title="Values", yaxis_title=x_column)
+        else:
+            fig.update_layout(xaxis_title=x_column, yaxis_title="Values")
 
     elif chart_type == 'bar':
-        fig = px.bar(df, x=x_column, y=y_columns[0],
+        fig = px.bar(df, x=y_columns[0] if horizontal else x_column, y=x_column if horizontal else y_columns[0],
                      title=f"{y_columns[0]} by {x_column}",
-                     template="plotly_white")
-        fig.update_layout(xaxis_title=x_column, yaxis_title=y_columns[0])
+                     template="plotly_white", orientation='h' if horizontal else 'v')
+        if horizontal:
+            fig.update_layout(xaxis_title=y_columns[0], yaxis_title=x_column)
+        else:
+            fig.update_layout(xaxis_title=x_column, yaxis_title=y_columns[0])
 
     elif chart_type == 'line':
-        fig = px.line(df, x=x_column, y=y_columns,
-                      title=f"{', '.join(y_columns)} over {x_column}",
-                      template="plotly_white", markers=True)
+        plot_df = downsample_line(df, x_column, y_columns)
+        fig = px.line(plot_df, x=x_column, y=y_columns,
+                      title=title_with_note(f"{', '.join(y_columns)} over {x_column}", len(df), len(plot_df)),
+                      template="plotly_white", markers=True, render_mode=render_mode(len(plot_df)))
         fig.update_layout(xaxis_title=x_column, yaxis_title="Values")
 
     elif chart_type == 'pie':
@@ -88,9 +151,10 @@ def generate_chart(df, chart_recommendation):
                      template="plotly_white")
 
     elif chart_type == 'scatter':
-        fig = px.scatter(df, x=x_column, y=y_columns[0],
-                         title=f"{y_columns[0]} vs {x_column}",
-                         template="plotly_white")
+        plot_df = downsample_scatter(df, x_column, y_columns[0])
+        fig = px.scatter(plot_df, x=x_column, y=y_columns[0],
+                         title=title_with_note(f"{y_columns[0]} vs {x_column}", len(df), len(plot_df)),
+                         template="plotly_white", render_mode=render_mode(len(plot_df)))
         fig.update_layout(xaxis_title=x_column, yaxis_title=y_columns[0])
 
     elif chart_type == 'histogram':
@@ -100,12 +164,25 @@ def generate_chart(df, chart_recommendation):
         fig.update_layout(xaxis_title=x_column, yaxis_title="Count")
 
     else:
-        st.write(f"Chart type '{chart_type}' not supported or could not be determined. Displaying data in table format:")
-        st.table(df)
-        return
+        return None, chart_type
 
     fig.update_layout(plot_bgcolor="rgba(0,0,0,0)")
-    st.plotly_chart(fig, use_container_width=True)
+    # Serializing into the cache is the JSON payload the browser receives as well
+    with tracer.span("chart_serialize", chart_type=chart_type) as span:
+        span.set(payload_bytes=figure_cache.put(key, fig))
+    return fig, chart_type
+
+def render_chart(placeholder, df, built):
+    fig, chart_type = built
+    if fig is None:
+        with placeholder.container():
+            st.write(f"Chart type '{chart_type}' not supported or could not be determined. Displaying data in table format:")
+            st.table(df)
+    else:
+        placeholder.plotly_chart(fig, use_container_width=True)
+
+def generate_chart(df, chart_recommendation):
+    render_chart(st, df, build_chart(df, chart_recommendation))
 
 # Streamlit app
 def main():
@@ -113,11 +190,17 @@ def main():
 
     st.title("Data Query and Visualization App")
 
-    # Load cached model
-    model, tokenizer = load_model()
-
-    if model is None or tokenizer is None:
+    # The model keeps loading in the background; only a submitted question waits for it
+    llm = load_llm()
+    if llm.status == 'failed':
+        st.error("Failed to load model. Please check the logs for details.")
+        # Drop the failed attempt so the next rerun tries again
+        load_llm.clear()
         st.stop()
+    elif llm.status == 'unreachable':
+        st.warning(f"The model server isn't running at {llm.address}. Start it with `python Model_server.py`.")
+    elif not llm.ready:
+        st.info(f"Model warming up ({llm.status})... you can type your question meanwhile.")
 
     # Your prompt (to be filled)
     prompt = ["Your prompt here"]
@@ -127,37 +210,94 @@ def main():
 
     if st.button("Submit"):
         if question:
-            with st.spinner("Generating SQL query..."):
-                response = get_model_response(question, prompt, model, tokenizer)
-                sql_query = get_sql_query_from_response(response)
-                chart_recommendation = get_chart_recommendation_from_response(response)
-
-            if sql_query:
-                st.subheader("Generated SQL Query:")
-                st.code(sql_query, language="sql")
-
-                with st.spinner("Executing query..."):
-                    # This is where you would run your SQL query on Snowflake
-                    # and get the result_df. For now, we'll use a dummy DataFrame.
-                    result_df = pd.DataFrame({
-                        'Column1': ['A', 'B', 'C'],
-                        'Column2': [10, 20, 30]
-                    })
-
-                if not result_df.empty:
-                    col1, col2 = st.columns(2)
-
-                    with col1:
-                        st.subheader("Query Results:")
-                        st.dataframe(result_df)
-
-                    with col2:
-                        st.subheader("Visualization:")
-                        generate_chart(result_df, chart_recommendation)
+            with st.spinner("Waiting for the model to finish loading..."):
+                model_ready = llm.ready or llm.wait()
+            if not model_ready:
+                st.error("The model is not available. Please check the logs for details.")
+                st.stop()
+            with tracer.trace() as trace_id:
+                sql_start = time.perf_counter()
+                if STREAM_RESPONSE:
+                    response_placeholder = st.empty()
+                    response = stream_model_response(question, prompt, llm, response_placeholder)
+                    response_placeholder.empty()
+                else:
+                    with st.spinner("Generating SQL query..."):
+                        response = get_model_response(question, prompt, llm)
+                timings = [("SQL", time.perf_counter() - sql_start, None)]
+
+                sql_query = get_sql_query_from_response(response) if response else None
+                chart_recommendation = get_chart_recommendation_from_response(response) if response else None
+
+                if sql_query:
+                    st.subheader("Generated SQL Query:")
+                    st.code(sql_query, language="sql")
+
+                    with st.spinner("Executing query..."):
+                        # Local engine for now; a Snowflake QueryBackend plugs in here later
+                        try:
+                            with tracer.span("query") as span:
+                                result_df, source, query_seconds = cached_execute(
+                                    load_result_cache(), load_query_backend(), sql_query)
+                                span.set(source=source, rows=len(result_df),
+                                         result_bytes=int(result_df.memory_usage(deep=True).sum()))
+                        except QueryTimeoutError as e:
+                            st.error(f"The query took too long and was cancelled: {str(e)}")
+                            return
+                        except Exception as e:
+                            logger.error(f"Error executing query: {str(e)}")
+                            st.error("Failed to execute the generated SQL query.")
+                            return
+                    timings.append(("query", query_seconds, "warehouse" if source == 'warehouse' else f"{source} cache"))
+                    timing_placeholder = st.empty()
+                    timing_placeholder.caption(format_timings(timings))
+
+                    if not result_df.empty:
+                        col1, col2 = st.columns(2)
+
+                        with col1:
+                            st.subheader("Query Results:")
+                            st.dataframe(result_df)
+
+                        with col2:
+                            st.subheader("Visualization:")
+                            chart_placeholder = st.empty()
+
+                        st.subheader("Insights:")
+                        insights_placeholder = st.empty()
+
+                        def chart_stage(cancel_event):
+                            with tracer.span("chart_build", rows=len(result_df)) as span:
+                                built = build_chart(result_df, chart_recommendation)
+                                span.set(chart_type=built[1])
+                            return built
+
+                        def insights_stage(cancel_event):
+                            with tracer.span("insights", rows=len(result_df)) as span:
+                                text = analyze_query_results(result_df, question, sql_query, chart_recommendation,
+                                                             profile=profile)
+                                span.set(chars=len(text))
+                            return text
+
+                        # Chart and insights only need the result frame: run them side by side
+                        profile = profile_dataframe(result_df)
+                        results = run_stages([
+                            Stage("chart", chart_stage, chart_placeholder,
+                                  lambda placeholder, built: render_chart(placeholder, result_df, built),
+                                  timeout=CHART_TIMEOUT_SECONDS),
+                            Stage("insights", insights_stage, insights_placeholder,
+                                  lambda placeholder, text: placeholder.markdown(text),
+                                  timeout=INSIGHTS_TIMEOUT_SECONDS),
+                        ])
+                        timings += [(name, result.seconds, None if result.status == 'done' else result.status)
+                                    for name, result in results.items()]
+                        timing_placeholder.caption(format_timings(timings))
+                    else:
+                        st.warning("No results found for the given query.")
                 else:
-                    st.warning("No results found for the given query.")
-            else:
-                st.error("Could not generate a valid SQL query.")
+                    st.error("Could not generate a valid SQL query.")
+                if SHOW_TRACE_PANEL:
+                    render_trace_panel(tracer, trace_id)
         else:
             st.warning("Please enter a question.")
 
@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import tracemalloc
 from scipy import stats
 
 # Import the function to be tested
-from your_module import analyze_query_results  # Replace 'your_module' with the actual module name
+from Description import analyze_query_results
+from Stats_kernel import compute_numeric_stats
 
 # Sample dataframes for testing
 
@@ -22,7 +24,7 @@ df_grouped_bar = pd.DataFrame({
 })
 
 # Line Chart
-dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='M')
+dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='ME')
 df_line = pd.DataFrame({
     'Date': dates,
     'Metric1': np.random.randint(100, 200, size=len(dates)),
@@ -48,7 +50,8 @@ test_cases = [
     (df_line, "How have the metrics changed over time?", "SELECT Date, Metric1, Metric2 FROM table", "Line chart"),
     (df_pie, "What is the distribution of values across categories?", "SELECT Category, Value FROM table", "Pie chart"),
     (df_bar, "What is the average value across categories?", "SELECT AVG(Value) as AvgValue FROM table", "Bar chart (horizontal)"),
-    (df_time_series, "What is the overall trend in the time series?", "SELECT Date, Value FROM table ORDER BY Date", "Line chart")
+    (df_time_series, "What is the overall trend in the time series?", "SELECT Date, Value FROM table ORDER BY Date", "Line chart"),
+    (df_time_series, "How does the value change by month?", "SELECT Date, Value FROM table ORDER BY Date", "Line chart")
 ]
 
 # Run tests
@@ -58,7 +61,10 @@ for df, question, sql_query, chart_recommendation in test_cases:
     print(df)
     print("\nQuestion:", question)
     print("SQL Query:", sql_query)
+    original = df.copy()
     insights = analyze_query_results(df, question, sql_query, chart_recommendation)
+    # The same frame is shown in st.dataframe and charted afterwards, so it must come back untouched
+    assert list(df.columns) == list(original.columns) and df.equals(original), "analyze_query_results modified its input"
     print("\nInsights:")
     print(insights)
     print("-" * 50)
@@ -92,3 +98,41 @@ insights = analyze_query_results(df_variance, "What is the variance in values?",
 print("\nInsights:")
 print(insights)
 print("-" * 50)
+
+# Trend and time correlation with missing values match pandas' pairwise corr
+df_gaps = pd.DataFrame({
+    'Date': pd.date_range(start='2023-01-01', periods=200, freq='D'),
+    'Linear': np.arange(200) * 2.0 + 5,
+    'Noisy': np.random.rand(200) + np.arange(200) / 100,
+})
+df_gaps.loc[::2, 'Linear'] = np.nan
+df_gaps.loc[np.random.choice(200, 60, replace=False), 'Noisy'] = np.nan
+df_gaps.loc[[3, 7, 11], 'Date'] = pd.NaT
+gap_stats = compute_numeric_stats(df_gaps, ['Linear', 'Noisy'], time_col='Date')
+position = pd.Series(np.arange(200, dtype='float64'))
+timestamps = df_gaps['Date'].astype('int64').astype('float64').where(df_gaps['Date'].notna())
+for col in ['Linear', 'Noisy']:
+    expected = pd.DataFrame({'position': position, 'time': timestamps, col: df_gaps[col]}).corr()[col]
+    assert np.isclose(gap_stats['trend_r'][col], expected['position']), col
+    assert np.isclose(gap_stats['time_corr'][col], expected['time']), col
+assert np.isclose(gap_stats['trend_r']['Linear'], 1.0) and np.isclose(gap_stats['trend_slope']['Linear'], 2.0)
+print("\nTrend and time correlation with missing values match DataFrame.corr")
+
+# Peak memory of insight generation on a large result. The copying implementation peaked at ~100 MB
+# on this frame and the current one at ~70 MB; anything above the limit means a full copy crept back in
+n_rows = 1_000_000
+PEAK_MEMORY_LIMIT_MB = 90
+df_large = pd.DataFrame({
+    'Date': pd.date_range(start='2020-01-01', periods=n_rows, freq='min'),
+    'Region': np.random.choice(['north', 'south', 'east', 'west'], n_rows),
+    'Value': np.random.rand(n_rows),
+    'Cost': np.random.rand(n_rows)
+})
+columns_before = list(df_large.columns)
+tracemalloc.start()
+analyze_query_results(df_large, "How does the value change by month?", "SELECT Date, Region, Value, Cost FROM table", "Line chart")
+_, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+assert list(df_large.columns) == columns_before, "analyze_query_results modified its input"
+print(f"\nPeak memory for insights on {n_rows:,} rows: {peak / 1e6:.0f} MB (limit {PEAK_MEMORY_LIMIT_MB} MB)")
+assert peak / 1e6 <= PEAK_MEMORY_LIMIT_MB, "analyze_query_results copies the result frame again"
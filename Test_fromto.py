@@ -0,0 +1,18 @@
+from datetime import date
+
+from Fromto import contains_date_range, find_date_range
+
+cases = [
+    ("Can you schedule a meeting from 3 March to 4 March 2024?", (date(2024, 3, 3), date(2024, 3, 4))),
+    ("What are the available dates between 2024-08-15 and 2024-08-18?", (date(2024, 8, 15), date(2024, 8, 18))),
+    ("Let's block dates from 06-12-2024  -  10-12-2024.", (date(2024, 12, 6), date(2024, 12, 10))),
+    ("Show total sales by region for the last quarter", None),
+    # Characters that str.isdigit() accepts but int() doesn't must not crash the scan
+    ("from ² to 3 March", None),
+    ("between ① and ② March 2024", None),
+]
+for question, expected in cases:
+    assert find_date_range(question, default_year=2024) == expected, (question, find_date_range(question))
+    assert contains_date_range(question) == (expected is not None), question
+
+print("Fromto: date ranges found, non-ASCII digits ignored")
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from Query_engine import BATCH_SIZE, QueryBackend, SQLiteBackend
+
+# SQLite results keep one schema across batches: a column that is NULL for the whole first batch,
+# and a result with no rows, still come back with their real types
+with tempfile.TemporaryDirectory() as data_dir:
+    pd.DataFrame({'Late': [None] * BATCH_SIZE + [1.5], 'Id': range(BATCH_SIZE + 1)}).to_parquet(
+        os.path.join(data_dir, "nulls.parquet"))
+    backend = SQLiteBackend(data_dir=data_dir)
+    df_nulls = backend.execute("SELECT Late, Id FROM nulls")
+    assert len(df_nulls) == BATCH_SIZE + 1 and df_nulls['Late'].iloc[-1] == 1.5
+    df_expr = backend.execute(f"SELECT CASE WHEN Id < {BATCH_SIZE} THEN NULL ELSE Id * 1.5 END AS Late FROM nulls")
+    assert df_expr['Late'].dtype == np.float64
+    df_empty = backend.execute("SELECT Late, Id FROM nulls WHERE Id < 0")
+    assert df_empty.empty and df_empty.dtypes.to_dict() == {'Late': np.float64, 'Id': np.int64}
+    backend.close()
+print("\nSQLite backend: NULL-then-value and empty results keep their column types")
+
+# The interface can't be instantiated, nor can a backend that leaves out stream() or tables()
+for backend_class in (QueryBackend, type('PartialBackend', (QueryBackend,), {'tables': lambda self: []})):
+    try:
+        backend_class()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError(f"{backend_class.__name__} instantiated without implementing stream()")
+print("QueryBackend: stream() and tables() are abstract")
@@ -0,0 +1,41 @@
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+from Result_cache import ResultCache, normalize_sql
+
+# Queries that differ only in layout, comments and keyword case share a cache entry
+same = [
+    ("select Category, sum(Value) from sales where Region in ('b', 'a') -- by region",
+     "SELECT Category, sum(Value)\nFROM sales\nWHERE Region IN ('a','b');"),
+    ("SELECT x FROM t WHERE y IN (3, 1, 2)", "select x from t where y in (1,2,3)"),
+]
+for first, second in same:
+    assert normalize_sql(first) == normalize_sql(second), (first, second)
+
+# Queries that select different rows or name their columns differently must not
+different = [
+    # Commas inside a literal are part of the value
+    ("SELECT s FROM t WHERE s = 'x,y'", "SELECT s FROM t WHERE s = 'x, y'"),
+    # IN-list items are whole literals, even when they contain ', '
+    ("SELECT a FROM t WHERE a IN ('a, b', 'b, a')", "SELECT a FROM t WHERE a IN ('a, a', 'b, b')"),
+    # Column labels follow the identifiers as written
+    ("SELECT Value FROM t", "SELECT value FROM t"),
+    ("SELECT SUM(x) FROM t", "SELECT sum(x) FROM t"),
+    ('SELECT "A,B" FROM t', 'SELECT "A, B" FROM t'),
+]
+for first, second in different:
+    assert normalize_sql(first) != normalize_sql(second), (first, second)
+assert normalize_sql("SELECT s FROM t WHERE s = 'x,y'") == "SELECT s FROM t WHERE s = 'x,y'"
+
+# A hit returns exactly what was stored, under the normalized key
+with tempfile.TemporaryDirectory() as cache_dir:
+    cache = ResultCache(cache_dir)
+    df = pd.DataFrame({'Value': [1, 2]})
+    cache.put("SELECT Value FROM t", pa.Table.from_pandas(df), df)
+    cached, source = cache.get("select Value from t;")
+    assert source == 'memory' and cached.equals(df)
+    assert cache.get("SELECT value FROM t") == (None, None)
+
+print("Result cache: normalization keeps distinct queries apart")
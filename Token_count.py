@@ -1,13 +1,162 @@
-import ctranslate2
-import transformers
-from huggingface_hub import snapshot_download
+"""Token budget for prompts sent to the SQL model.
 
-model_id = "ByteForge/Defog_llama-3-sqlcoder-8b-ct2-int8_float16"
-model_path = snapshot_download(model_id)
-model = ctranslate2.Generator(model_path)
-tokenizer = transformers.AutoTokenizer.from_pretrained(model_id)
+Counts prompt tokens with a cached tokenizer, keeps the schema DDL within the
+context window (dropping the tables least related to the question first),
+sizes max_length from what is left and records prompt/completion token counts
+per request.
 
-prompt = """
+    python Token_count.py   # counts and budgets for the sample schema below
+"""
+import re
+import logging
+import functools
+import threading
+from collections import deque, namedtuple
+
+from Prompt_cache import build_prompt_tokens
+from Model_loader import MODEL_ID, load_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# Llama 3 8B; prompt + completion must fit in this many tokens
+CONTEXT_WINDOW = 8192
+# Completion length when the caller doesn't ask for one
+MAX_COMPLETION_TOKENS = 1024
+# A prompt that leaves less than this for the answer is rejected instead of truncated
+MIN_COMPLETION_TOKENS = 128
+# Slack for tokens merging differently where separately counted pieces meet
+SAFETY_MARGIN_TOKENS = 16
+COUNT_CACHE_SIZE = 4096
+RECENT_REQUESTS = 1000
+
+CREATE_TABLE = re.compile(r'(?=\bCREATE\s+TABLE\b)', re.IGNORECASE)
+TABLE_NAME = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"\[]?([\w.]+)', re.IGNORECASE)
+WORD = re.compile(r'[a-z0-9]+')
+
+# What a request will send: tokens as built by Prompt_cache, plus how the budget shaped them
+PromptPlan = namedtuple('PromptPlan', ['static_tokens', 'tokens', 'prompt_tokens', 'max_length', 'schema_ddl',
+                                       'dropped_tables'])
+
+
+class PromptTooLongError(ValueError):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(model_id=MODEL_ID):
+    """Tokenizer loaded once per process, for callers that only count tokens."""
+    return load_tokenizer(model_id)
+
+
+def split_tables(schema_ddl):
+    """(header, [(table_name, ddl), ...]); header is any text before the first CREATE TABLE."""
+    parts = CREATE_TABLE.split(schema_ddl)
+    header, tables = parts[0], []
+    for part in parts[1:]:
+        match = TABLE_NAME.match(part)
+        tables.append((match.group(1) if match else '', part))
+    return header, tables
+
+
+def _words(text):
+    # Crude singular form so "stadiums" matches the stadium table
+    return {word[:-1] if len(word) > 3 and word.endswith('s') else word for word in WORD.findall(text.lower())}
+
+
+def relevance(question_words, table_name, table_ddl):
+    """Higher for tables whose name, then columns, appear in the question."""
+    name_words = _words(table_name.replace('_', ' '))
+    return 3 * len(question_words & name_words) + len(question_words & (_words(table_ddl) - name_words))
+
+
+class TokenBudget:
+    """Fits prompts into the context window and keeps per-request token counts."""
+
+    def __init__(self, tokenizer, context_window=CONTEXT_WINDOW, max_completion=MAX_COMPLETION_TOKENS,
+                 min_completion=MIN_COMPLETION_TOKENS, margin=SAFETY_MARGIN_TOKENS):
+        self.tokenizer = tokenizer
+        self.context_window = context_window
+        self.max_completion = max_completion
+        self.min_completion = min_completion
+        self.margin = margin
+        # Table DDL repeats across requests, so each piece is tokenized once
+        self.count_tokens = functools.lru_cache(maxsize=COUNT_CACHE_SIZE)(self._count_tokens)
+        self.recent = deque(maxlen=RECENT_REQUESTS)
+        self.totals = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'trimmed': 0,
+                       'hit_max_length': 0}
+        self._lock = threading.Lock()
+
+    def _count_tokens(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def max_length(self, prompt_tokens, requested=None):
+        """Completion tokens left after the prompt, capped at requested (or max_completion)."""
+        available = self.context_window - prompt_tokens - self.margin
+        if available < self.min_completion:
+            raise PromptTooLongError(f"Prompt of {prompt_tokens} tokens leaves {max(available, 0)} of the "
+                                     f"{self.context_window}-token context window for the answer "
+                                     f"(at least {self.min_completion} needed)")
+        return min(available, requested or self.max_completion)
+
+    def fit_schema(self, schema_ddl, question, requested=None):
+        """(schema_ddl, dropped_table_names) leaving room for the question and the completion.
+
+        The schema is returned untouched when it fits. Otherwise tables are kept
+        in order of relevance to the question while they fit, and written back
+        in their original order.
+        """
+        static_tokens, question_tokens = build_prompt_tokens(self.tokenizer, "", question)
+        available = (self.context_window - self.margin - (requested or self.max_completion)
+                     - len(static_tokens) - len(question_tokens))
+        if self.count_tokens(schema_ddl) <= available:
+            return schema_ddl, []
+
+        header, tables = split_tables(schema_ddl)
+        available -= self.count_tokens(header)
+        question_words = _words(question)
+        ranked = sorted(range(len(tables)), key=lambda i: -relevance(question_words, *tables[i]))
+        kept = set()
+        for i in ranked:
+            tokens = self.count_tokens(tables[i][1])
+            if tokens <= available:
+                kept.add(i)
+                available -= tokens
+        if not kept:
+            raise PromptTooLongError(f"No table of the schema fits the {self.context_window}-token context window "
+                                     f"next to the question")
+        dropped = [name for i, (name, _) in enumerate(tables) if i not in kept]
+        logger.info(f"Schema trimmed to fit the context window, dropped {len(dropped)} tables: {', '.join(dropped)}")
+        return header + "".join(ddl for i, (_, ddl) in enumerate(tables) if i in kept), dropped
+
+    def plan(self, prompt=None, schema_ddl=None, question=None, max_length=None):
+        """PromptPlan for a raw prompt, or for a schema + question split around the cached schema prefix."""
+        dropped = []
+        if schema_ddl is not None:
+            schema_ddl, dropped = self.fit_schema(schema_ddl, question, max_length)
+            static_tokens, tokens = build_prompt_tokens(self.tokenizer, schema_ddl, question)
+        else:
+            static_tokens, tokens = None, self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(prompt))
+        prompt_tokens = len(tokens) + len(static_tokens or ())
+        return PromptPlan(static_tokens, tokens, prompt_tokens, self.max_length(prompt_tokens, max_length),
+                          schema_ddl, dropped)
+
+    def record(self, plan, completion_tokens):
+        """Keep one request's counts; returns them as a dict for stats and spans."""
+        counts = {'prompt_tokens': plan.prompt_tokens, 'completion_tokens': completion_tokens,
+                  'max_length': plan.max_length, 'dropped_tables': len(plan.dropped_tables)}
+        with self._lock:
+            self.recent.append(counts)
+            self.totals['requests'] += 1
+            self.totals['prompt_tokens'] += plan.prompt_tokens
+            self.totals['completion_tokens'] += completion_tokens
+            self.totals['trimmed'] += bool(plan.dropped_tables)
+            # Answers that ran into max_length were probably cut off
+            self.totals['hit_max_length'] += completion_tokens >= plan.max_length
+        return counts
+
+
+if __name__ == "__main__":
+    schema_ddl = """
 CREATE TABLE stadium (
     stadium_id number,
     location text,
@@ -37,14 +186,17 @@ CREATE TABLE singer_in_concert (
     concert_id number,
     singer_id text
 )
--- Using valid SQLite, answer the following questions for the tables provided above.
--- What is the maximum, the average, and the minimum capacity of stadiums ? (Generate 1 Sql query. No explanation needed)
-answer:
 """
+    question = "What is the maximum, the average, and the minimum capacity of stadiums ?"
 
-# Encode the prompt to get token IDs
-input_ids = tokenizer.encode(prompt, return_tensors='pt')
-# Count the number of tokens
-num_tokens = input_ids.size(-1)
+    budget = TokenBudget(get_tokenizer())
+    plan = budget.plan(schema_ddl=schema_ddl, question=question)
+    print(f"Schema prefix tokens (cached): {len(plan.static_tokens)}")
+    print(f"Question tokens (per call): {len(plan.tokens)}")
+    print(f"Number of tokens: {plan.prompt_tokens}, max_length {plan.max_length} of {budget.context_window}")
 
-print(f"Number of tokens: {num_tokens}")
+    # The same request against a window too small for the whole schema
+    small = TokenBudget(budget.tokenizer, context_window=plan.prompt_tokens, min_completion=32)
+    plan = small.plan(schema_ddl=schema_ddl, question=question, max_length=48)
+    print(f"{small.context_window}-token window: {plan.prompt_tokens} prompt tokens, max_length {plan.max_length}, "
+          f"dropped {plan.dropped_tables}")
@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Finished spans kept in memory for the panel and the exports
+MAX_SPANS = 10000
+TRACE_LOG = "traces.jsonl"
+METRIC_PREFIX = "sql_app"
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Set by Tracer.trace(); spans started in the same context (including pipeline workers) share it
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+def peak_rss_bytes():
+    """Process high-water mark of resident memory, or None where getrusage isn't available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Span:
+    """Wall time, CPU time of the running thread, memory high-water mark and free-form attributes of one stage."""
+
+    __slots__ = ('name', 'trace_id', 'start', 'wall_seconds', 'cpu_seconds', 'peak_rss_bytes',
+                 'rss_growth_bytes', 'status', 'attrs', '_wall_start', '_cpu_start', '_rss_start')
+
+    def __init__(self, name, trace_id, attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = dict(attrs)
+        self.status = 'ok'
+        self.start = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._rss_start = peak_rss_bytes()
+
+    def set(self, **attrs):
+        """Attach payload sizes, row/token counts and the like."""
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        # Work done in native threads (ctranslate2, DuckDB) isn't counted here
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        self.peak_rss_bytes = peak_rss_bytes()
+        self.rss_growth_bytes = (self.peak_rss_bytes - self._rss_start) if self._rss_start is not None else None
+
+    def to_dict(self):
+        return {'trace_id': self.trace_id, 'name': self.name, 'start': self.start, 'status': self.status,
+                'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+                'peak_rss_bytes': self.peak_rss_bytes, 'rss_growth_bytes': self.rss_growth_bytes, **self.attrs}
+
+
+class Tracer:
+    """Collects spans from every session in a bounded in-memory buffer."""
+
+    def __init__(self, max_spans=MAX_SPANS, enabled=True):
+        self.enabled = enabled
+        self._spans = deque(maxlen=max_spans)
+        # name -> [count, wall seconds, cpu seconds] since start; never shrinks, unlike the buffer
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, trace_id=None):
+        """Group the spans of one request under a shared id."""
+        trace_id = trace_id or uuid.uuid4().hex[:12]
+        token = current_trace.set(trace_id)
+        try:
+            yield trace_id
+        finally:
+            current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, current_trace.get(), attrs)
+        try:
+            yield span
+        except BaseException:
+            span.status = 'error'
+            raise
+        finally:
+            span.finish()
+            with self._lock:
+                self._spans.append(span)
+                totals = self._totals.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += span.wall_seconds
+                totals[2] += span.cpu_seconds
+
+    def spans(self, trace_id=None, name=None):
+        with self._lock:
+            spans = list(self._spans)
+        return [span for span in spans
+                if (trace_id is None or span.trace_id == trace_id) and (name is None or span.name == name)]
+
+    def to_frame(self, trace_id=None):
+        return pd.DataFrame([span.to_dict() for span in self.spans(trace_id)])
+
+    def summary(self):
+        """Per-stage count and wall-time quantiles over the buffered spans."""
+        df = self.to_frame()
+        if df.empty:
+            return df
+        grouped = df.groupby('name', sort=False)
+        summary = grouped['wall_seconds'].quantile(list(QUANTILES)).unstack()
+        summary.columns = [f"p{int(q * 100)}_seconds" for q in QUANTILES]
+        summary.insert(0, 'count', grouped.size())
+        summary['mean_cpu_seconds'] = grouped['cpu_seconds'].mean()
+        return summary.sort_values(f"p{int(QUANTILES[1] * 100)}_seconds", ascending=False)
+
+    def export_jsonl(self, path=TRACE_LOG, trace_id=None):
+        """Append spans as JSON lines; returns how many were written."""
+        spans = self.spans(trace_id)
+        with open(path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        return len(spans)
+
+    def prometheus_text(self, prefix=METRIC_PREFIX):
+        """Prometheus text exposition: wall-time quantiles over the buffer plus running totals per stage."""
+        df = self.to_frame()
+        with self._lock:
+            totals = {name: list(values) for name, values in self._totals.items()}
+        lines = [f"# HELP {prefix}_stage_seconds Wall time per pipeline stage.",
+                 f"# TYPE {prefix}_stage_seconds summary"]
+        cpu_lines = [f"# HELP {prefix}_stage_cpu_seconds_total CPU time of the calling thread per pipeline stage.",
+                     f"# TYPE {prefix}_stage_cpu_seconds_total counter"]
+        for name in sorted(totals):
+            count, wall, cpu = totals[name]
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            if not df.empty:
+                recent = df.loc[df['name'] == name, 'wall_seconds']
+                for q in QUANTILES if len(recent) else ():
+                    lines.append(f'{prefix}_stage_seconds{{stage="{label}",quantile="{q}"}} {recent.quantile(q):.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{label}"}} {wall:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{label}"}} {count}')
+            cpu_lines.append(f'{prefix}_stage_cpu_seconds_total{{stage="{label}"}} {cpu:.6f}')
+        lines += cpu_lines
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines += [f"# HELP {prefix}_peak_rss_bytes Resident memory high-water mark of the process.",
+                      f"# TYPE {prefix}_peak_rss_bytes gauge",
+                      f"{prefix}_peak_rss_bytes {peak}"]
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+# Shared by every module in this process
+tracer = Tracer(enabled=os.environ.get("SQL_APP_TRACING", "1") != "0")
+
+
+def render_trace_panel(tracer=tracer, trace_id=None):
+    """Collapsible Streamlit panel with this request's spans, recent quantiles and the exports."""
+    import streamlit as st
+
+    with st.expander("Performance", expanded=False):
+        spans = tracer.to_frame(trace_id)
+        if spans.empty:
+            st.caption("No spans recorded yet.")
+            return
+        spans = spans.drop(columns=['trace_id', 'start'])
+        spans['wall_ms'] = spans.pop('wall_seconds') * 1000
+        spans['cpu_ms'] = spans.pop('cpu_seconds') * 1000
+        spans['peak_rss_mb'] = spans.pop('peak_rss_bytes').astype(float) / 1e6
+        spans['rss_growth_mb'] = spans.pop('rss_growth_bytes').astype(float) / 1e6
+        st.dataframe(spans, use_container_width=True)
+        st.caption("Recent requests")
+        st.dataframe(tracer.summary(), use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Spans (JSON lines)",
+                               "\n".join(json.dumps(span.to_dict(), default=str) for span in tracer.spans()),
+                               file_name=TRACE_LOG, mime="application/jsonl")
+        with col2:
+            st.download_button("Metrics (Prometheus)", tracer.prometheus_text(), file_name="metrics.prom",
+                               mime="text/plain")
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    demo = Tracer()
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        with demo.trace():
+            with demo.span("query") as span:
+                df = pd.DataFrame(rng.random((20000, 5)))
+                span.set(rows=len(df), bytes=int(df.memory_usage().sum()))
+            with demo.span("insights"):
+                df.describe()
+
+    overhead = Tracer()
+    n = 100000
+    start = time.perf_counter()
+    for _ in range(n):
+        with overhead.span("noop"):
+            pass
+    print(f"span overhead: {(time.perf_counter() - start) * 1e6 / n:.1f} us")
+    print(demo.summary())
+    print(demo.prometheus_text())